@@ -1,113 +1,63 @@
+"""
+Dark Zone Emergence Detection Script
+Writes anomaly PNGs and a JSON report for one target year to
+data/anomalies/<cleaned folder>_anomalies/. The report is the
+detect_anomalies result, the same schema the batch mode writes.
+
+Run from the backend directory:
+    python -m app.anomaly --region "Tamil Nadu" --target-year 2024
+    python -m app.anomaly --region "Tamil Nadu" --all-years
+"""
 import os
+import argparse
 import numpy as np
-import rasterio
-from scipy.ndimage import label
 from PIL import Image
-import json
+
+from app.anomaly_service import (
+    MAX_BASELINE_INTENSITY, MIN_CLUSTER_SIZE, MIN_NEW_INTENSITY,
+    anomaly_report_path, detect_anomalies, detect_anomalies_batch, write_anomaly_report
+)
+from app.raster_catalog import catalog
 
 # ================================
 # CONFIGURATION
 # ================================
-CLEAN_DIR = "/home/nakshtra/Desktop/whackiest/Quatsch/backend/data/cleaned/fogfix"
-OUTPUT_DIR = "/home/nakshtra/Desktop/whackiest/Quatsch/backend/data/anomalies/crazy"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-TARGET_YEAR = "2024"
+DEFAULT_REGION = "Tamil Nadu"
 
-# DARK ZONE EMERGENCE DETECTION (Absolute Physics)
-MIN_NEW_INTENSITY = 15.0      # Must be at least 15 nW bright (Real activity, not noise)
-MAX_BASELINE_INTENSITY = 5.0  # Was dark before (< 5 nW = forest/rural)
-MIN_CLUSTER_SIZE = 3          # Must be 3+ connected pixels (filters sensor glitches)
+# Thresholds (MIN_NEW_INTENSITY, MAX_BASELINE_INTENSITY, MIN_CLUSTER_SIZE)
+# come from anomaly_service, which runs the detection
 
 # ================================
 # MAIN LOGIC
 # ================================
-def detect_dark_zone_emergence():
+def detect_dark_zone_emergence(region=DEFAULT_REGION, target_year=None, baseline_years=None):
     print(f"🚀 Starting Dark Zone Emergence Detection...")
     print(f"🎯 Logic: Flag NEW light (>{MIN_NEW_INTENSITY} nW) where it was dark (<{MAX_BASELINE_INTENSITY} nW)\n")
     
-    # 1. FIND FILES
-    all_files = sorted([f for f in os.listdir(CLEAN_DIR) if "_clean.tif" in f])
-    baseline_files = [f for f in all_files if TARGET_YEAR not in f]
-    target_file = next((f for f in all_files if TARGET_YEAR in f), None)
-    
-    if not target_file:
-        print(f"❌ Error: Could not find target year {TARGET_YEAR}")
+    # 1. DETECT (cached baseline, threshold rule and cluster filtering all in the service)
+    result = detect_anomalies(region, target_year, baseline_years,
+                              MIN_NEW_INTENSITY, MAX_BASELINE_INTENSITY, MIN_CLUSTER_SIZE,
+                              return_arrays=True)
+    if not result['success']:
+        print(f"❌ Error: {result['message']}")
         return
+    arrays = result.pop('arrays')
+    target_year = result['target_year']
+    baseline_years = result['baseline_year_list']
     
-    print(f"📊 Baseline: {len(baseline_files)} historic images")
-    print(f"🎯 Target: {target_file}\n")
-    
-    # 2. BUILD BASELINE
-    baseline_stack = []
-    metadata = None
-    
-    for f in baseline_files:
-        path = os.path.join(CLEAN_DIR, f)
-        with rasterio.open(path) as src:
-            img = src.read(1).astype(np.float32)
-            baseline_stack.append(img)
-            if metadata is None: 
-                metadata = src.profile
-    
-    baseline_img = np.median(np.array(baseline_stack), axis=0)
-    
-    # 3. LOAD TARGET
-    with rasterio.open(os.path.join(CLEAN_DIR, target_file)) as src:
-        target_img = src.read(1).astype(np.float32)
-        transform = src.transform
-    
-    # 4. MATCH SIZES
-    rows = min(baseline_img.shape[0], target_img.shape[0])
-    cols = min(baseline_img.shape[1], target_img.shape[1])
-    baseline_img = baseline_img[:rows, :cols]
-    target_img = target_img[:rows, :cols]
-    
-    # 5. DARK ZONE EMERGENCE DETECTION
-    # THE CORE LOGIC: Light appeared where darkness was
-    anomaly_mask = (
-        (target_img > MIN_NEW_INTENSITY) &        # NOW: Bright enough to be real activity
-        (baseline_img < MAX_BASELINE_INTENSITY)   # BEFORE: Was dark (forest/rural)
-    )
+    print(f"📊 Baseline: {len(baseline_years)} historic images ({baseline_years[0]}-{baseline_years[-1]})")
+    print(f"🎯 Target: {os.path.basename(catalog.get_file(region, target_year))}\n")
+    print(f"🚨 After Clustering: {result['results']['total_anomalies']} valid anomalies detected\n")
     
-    absolute_diff = target_img - baseline_img
-    
-    print(f"🔍 Before Clustering: {np.sum(anomaly_mask)} pixels flagged")
-    
-    # 6. CLUSTER FILTERING (Remove Noise)
-    labeled_array, num_features = label(anomaly_mask)
-    final_mask = np.zeros_like(anomaly_mask, dtype=bool)
-    
-    anomaly_stats = []
-    
-    for i in range(1, num_features + 1):
-        cluster = labeled_array == i
-        cluster_size = np.sum(cluster)
-        
-        if cluster_size >= MIN_CLUSTER_SIZE:
-            final_mask[cluster] = True
-            
-            # Extract metadata
-            rows_idx, cols_idx = np.where(cluster)
-            center_row = int(np.mean(rows_idx))
-            center_col = int(np.mean(cols_idx))
-            
-            lon, lat = rasterio.transform.xy(transform, center_row, center_col)
-            
-            anomaly_stats.append({
-                "id": len(anomaly_stats) + 1,
-                "lat": float(lat),
-                "lon": float(lon),
-                "pixel_count": int(cluster_size),
-                "current_intensity": float(np.mean(target_img[cluster])),
-                "baseline_intensity": float(np.mean(baseline_img[cluster])),
-                "intensity_gain": float(np.mean(absolute_diff[cluster])),
-                "max_brightness": float(np.max(target_img[cluster]))
-            })
-    
-    print(f"🚨 After Clustering: {len(anomaly_stats)} valid anomalies detected\n")
-    
-    # 7. CREATE VISUALIZATIONS
+    output_dir = os.path.dirname(anomaly_report_path(region, target_year))
+    os.makedirs(output_dir, exist_ok=True)
+    
+    final_mask = arrays['mask']
+    target_img = arrays['target']
+    rows, cols = final_mask.shape
+    absolute_diff = target_img - arrays['baseline']
+    
+    # 2. CREATE VISUALIZATIONS
     
     # A) CONTEXT MAP (Grayscale base + Red anomalies)
     base_visual = np.clip(target_img / 60.0, 0, 1)
@@ -118,18 +68,18 @@ def detect_dark_zone_emergence():
     context_img[final_mask] = [255, 0, 50]
     
     Image.fromarray(context_img).save(
-        os.path.join(OUTPUT_DIR, f"Anomaly_Context_{TARGET_YEAR}.png")
+        os.path.join(output_dir, f"Anomaly_Context_{target_year}.png")
     )
-    print(f"✨ Saved: Anomaly_Context_{TARGET_YEAR}.png (Red dots on map)")
+    print(f"✨ Saved: Anomaly_Context_{target_year}.png (Red dots on map)")
     
     # B) OVERLAY (Transparent PNG for GIS)
     overlay = np.zeros((rows, cols, 4), dtype=np.uint8)
     overlay[final_mask] = [255, 0, 50, 255]
     
     Image.fromarray(overlay).save(
-        os.path.join(OUTPUT_DIR, f"Anomaly_Overlay_{TARGET_YEAR}.png")
+        os.path.join(output_dir, f"Anomaly_Overlay_{target_year}.png")
     )
-    print(f"✨ Saved: Anomaly_Overlay_{TARGET_YEAR}.png (Transparent layer)")
+    print(f"✨ Saved: Anomaly_Overlay_{target_year}.png (Transparent layer)")
     
     # C) HEATMAP (Intensity of change)
     heatmap = np.zeros((rows, cols, 4), dtype=np.uint8)
@@ -139,47 +89,25 @@ def detect_dark_zone_emergence():
     heatmap[:, :, 3] = (diff_visual * 200).astype(np.uint8)  # Alpha
     
     Image.fromarray(heatmap).save(
-        os.path.join(OUTPUT_DIR, f"Anomaly_Heatmap_{TARGET_YEAR}.png")
+        os.path.join(output_dir, f"Anomaly_Heatmap_{target_year}.png")
     )
-    print(f"✨ Saved: Anomaly_Heatmap_{TARGET_YEAR}.png (Intensity gradient)\n")
-    
-    # 8. ANALYTICS (Relative Change for Dashboard)
-    total_baseline = np.sum(baseline_img)
-    total_target = np.sum(target_img)
-    overall_growth = ((total_target - total_baseline) / total_baseline) * 100
-    
-    # 9. SAVE JSON REPORT
-    summary = {
-        "target_year": TARGET_YEAR,
-        "baseline_years": len(baseline_files),
-        "detection_method": "Dark Zone Emergence (Absolute Threshold)",
-        "parameters": {
-            "min_new_intensity": f"{MIN_NEW_INTENSITY} nW",
-            "max_baseline_intensity": f"{MAX_BASELINE_INTENSITY} nW",
-            "min_cluster_size": MIN_CLUSTER_SIZE
-        },
-        "results": {
-            "total_anomalies": len(anomaly_stats),
-            "total_anomalous_pixels": int(np.sum(final_mask)),
-            "overall_lighting_growth": f"{overall_growth:.2f}%"
-        },
-        "anomalies": sorted(anomaly_stats, key=lambda x: x['intensity_gain'], reverse=True)
-    }
-    
-    with open(os.path.join(OUTPUT_DIR, f"anomaly_report_{TARGET_YEAR}.json"), 'w') as f:
-        json.dump(summary, f, indent=2)
-    
-    print(f"📄 Saved: anomaly_report_{TARGET_YEAR}.json\n")
-    
-    # 10. PRINT TOP ANOMALIES
+    print(f"✨ Saved: Anomaly_Heatmap_{target_year}.png (Intensity gradient)\n")
+    
+    # 3. SAVE JSON REPORT (same schema as the batch mode and the API)
+    report_path = write_anomaly_report(region, result)
+    overall_growth = result['results']['overall_lighting_growth']
+    
+    print(f"📄 Saved: {os.path.basename(report_path)}\n")
+    
+    # 4. PRINT TOP ANOMALIES
     print("=" * 60)
     print("🏆 TOP 10 DARK ZONE EMERGENCES (Sorted by Intensity Gain)")
     print("=" * 60)
     
-    for i, a in enumerate(summary['anomalies'][:10], 1):
+    for i, a in enumerate(result['anomalies'][:10], 1):
         print(f"\n{i}. Location: ({a['lat']:.4f}, {a['lon']:.4f})")
         print(f"   Baseline (Historic): {a['baseline_intensity']:.2f} nW (Dark)")
-        print(f"   Current ({TARGET_YEAR}):  {a['current_intensity']:.2f} nW (Bright)")
+        print(f"   Current ({target_year}):  {a['current_intensity']:.2f} nW (Bright)")
         print(f"   Intensity Gain: +{a['intensity_gain']:.2f} nW")
         print(f"   Cluster Size: {a['pixel_count']} pixels")
     
@@ -188,4 +116,23 @@ def detect_dark_zone_emergence():
     print("=" * 60)
 
 if __name__ == "__main__":
-    detect_dark_zone_emergence()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Detect dark zone emergence anomalies for one target year')
+    parser.add_argument('--region', default=DEFAULT_REGION, help='Region name, e.g. "Tamil Nadu"')
+    parser.add_argument('--target-year', type=int, help='Target year (default: last available year)')
+    parser.add_argument('--baseline-years', help='Comma-separated baseline years (default: every earlier year)')
+    parser.add_argument('--all-years', action='store_true',
+                        help='Write the report of every year against its rolling baseline (no PNGs)')
+    args = parser.parse_args()
+    
+    if args.all_years:
+        batch = detect_anomalies_batch(args.region)
+        if not batch['success']:
+            print(f"❌ Error: {batch['message']}")
+        for summary in batch['years']:
+            if summary['success']:
+                print(f"✅ {summary['target_year']}: {summary['total_anomalies']} anomalies -> {summary['report']}")
+            else:
+                print(f"❌ {summary['target_year']}: {summary['message']}")
+    else:
+        baseline_years = [int(y) for y in args.baseline_years.split(',')] if args.baseline_years else None
+        detect_dark_zone_emergence(args.region, args.target_year, baseline_years)
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""
+Anomaly Histogram Module
+Joint (baseline, target) histogram per region and target year, cached on
+disk as a 2D cumulative count table. Any pair of thresholds on the bin grid
+is then answered with one table lookup instead of a full raster pass, which
+makes tuning MIN_NEW_INTENSITY / MAX_BASELINE_INTENSITY interactive.
+"""
+import os
+import time
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional
+import numpy as np
+
+from app.artifact_cache import artifact_path, build_lock, is_fresh, temp_path, write_manifest
+from app.baseline_service import get_baseline
+from app.raster_cache import read_raster
+from app.raster_catalog import catalog
+from app.raster_stats import iter_chunks
+
+# Configuration
+# Threshold grid (nW): thresholds are snapped to multiples of HIST_STEP in [0, HIST_MAX]
+HIST_STEP = 0.5
+HIST_MAX = 100.0
+HIST_EDGES = np.arange(0.0, HIST_MAX + HIST_STEP / 2, HIST_STEP)
+
+
+def snap_threshold(value: float) -> float:
+    """Nearest threshold on the histogram grid"""
+    return float(HIST_EDGES[int(np.abs(HIST_EDGES - value).argmin())])
+
+
+def build_joint_histogram(baseline_img: np.ndarray, target_img: np.ndarray) -> np.ndarray:
+    """
+    Cumulative joint histogram of baseline and target values
+
+    Baseline bin i holds edges[i - 1] <= v < edges[i] and target bin j holds
+    edges[j - 1] < v <= edges[j], so for thresholds B = edges[i] and
+    T = edges[j] the number of pixels with baseline < B and target > T is
+    table[i + 1, j + 1].
+
+    Args:
+        baseline_img: Baseline radiance
+        target_img: Target radiance (same shape)
+
+    Returns:
+        int64 array of shape (n + 2, n + 2) with n = len(HIST_EDGES):
+        table[i, j] = pixels with baseline bin < i and target bin >= j
+    """
+    n_bins = len(HIST_EDGES) + 1
+    counts = np.zeros(n_bins * n_bins, dtype=np.int64)
+
+    for base_chunk, target_chunk in zip(iter_chunks(baseline_img), iter_chunks(target_img)):
+        base_bins = np.searchsorted(HIST_EDGES, base_chunk.ravel().astype(np.float64), side='right')
+        target_bins = np.searchsorted(HIST_EDGES, target_chunk.ravel().astype(np.float64), side='left')
+        counts += np.bincount(base_bins * n_bins + target_bins, minlength=n_bins * n_bins)
+
+    counts = counts.reshape(n_bins, n_bins)
+
+    # Prefix over baseline bins, suffix over target bins, zero-padded so both ends are addressable
+    table = np.zeros((n_bins + 1, n_bins + 1), dtype=np.int64)
+    table[1:, :-1] = np.cumsum(counts, axis=0)[:, ::-1].cumsum(axis=1)[:, ::-1]
+    return table
+
+
+def histogram_file(region: str, target_year: int, baseline_years: List[int]) -> Optional[str]:
+    """Path of the cached histogram table (data/cache/histograms/<region folder>/...)"""
+    record = catalog.get_region(region)
+    if not record or not record['clean_dir']:
+        return None
+    years_key = hashlib.sha1(','.join(str(y) for y in sorted(baseline_years)).encode('utf-8')).hexdigest()[:10]
+    return artifact_path('histograms', os.path.basename(record['clean_dir']), f'hist_{target_year}_{years_key}.npy')
+
+
+@lru_cache(maxsize=64)
+def _load_table(path: str, mtime_ns: int) -> np.ndarray:
+    table = np.load(path)
+    table.setflags(write=False)
+    return table
+
+
+def get_histogram(region: str, target_year: int, baseline_years: Optional[List[int]] = None) -> Dict:
+    """
+    Get the cumulative joint histogram of a target year, building it if it is stale
+
+    Returns:
+        Dictionary with 'success' and either 'table' and 'baseline_years' or 'message'
+    """
+    target_file = catalog.get_file(region, target_year)
+    if not target_file:
+        return {'success': False, 'message': f'Target year {target_year} file not found'}
+
+    baseline = get_baseline(region, target_year, baseline_years)
+    if not baseline['success']:
+        return baseline
+    baseline_years = baseline['baseline_years']
+
+    path = histogram_file(region, target_year, baseline_years)
+    fingerprint = catalog.fingerprint(region, baseline_years + [target_year])
+
+    with build_lock(path):
+        if not is_fresh(path, fingerprint):
+            start = time.perf_counter()
+            baseline_img, _ = read_raster(baseline['path'])
+            target_img, _ = read_raster(target_file)
+
+            rows = min(baseline_img.shape[0], target_img.shape[0])
+            cols = min(baseline_img.shape[1], target_img.shape[1])
+            table = build_joint_histogram(baseline_img[:rows, :cols], target_img[:rows, :cols])
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = temp_path(path, '.tmp.npy')
+            np.save(tmp_path, table)
+            os.replace(tmp_path, path)
+            write_manifest(path, {
+                'region': catalog.get_region(region)['name'],
+                'target_year': int(target_year),
+                'baseline_years': baseline_years,
+                'fingerprint': fingerprint,
+                'step': HIST_STEP,
+                'max': HIST_MAX,
+                'build_seconds': round(time.perf_counter() - start, 3)
+            })
+
+    table = _load_table(path, os.stat(path).st_mtime_ns)
+    return {'success': True, 'table': table, 'baseline_years': baseline_years}
+
+
+def count_candidates(table: np.ndarray, min_new_intensity: float, max_baseline_intensity: float) -> Dict:
+    """
+    Pixel counts for a pair of thresholds (snapped to the grid) from a histogram table
+
+    Returns:
+        Dictionary with the effective thresholds, candidate_pixels
+        (target > min_new and baseline < max_baseline), bright_pixels
+        (target > min_new), dark_baseline_pixels (baseline < max_baseline)
+        and total_pixels
+    """
+    min_new = snap_threshold(min_new_intensity)
+    max_base = snap_threshold(max_baseline_intensity)
+    # baseline < edges[k] <=> baseline bin < k + 1; target > edges[m] <=> target bin >= m + 1
+    i = int(np.searchsorted(HIST_EDGES, max_base)) + 1
+    j = int(np.searchsorted(HIST_EDGES, min_new)) + 1
+
+    return {
+        'min_new_intensity': min_new,
+        'max_baseline_intensity': max_base,
+        'candidate_pixels': int(table[i, j]),
+        'bright_pixels': int(table[-1, j]),
+        'dark_baseline_pixels': int(table[i, 0]),
+        'total_pixels': int(table[-1, 0])
+    }
@@ -4,14 +4,18 @@ Detects dark zone emergence anomalies using cleaned TIF data.
 Isolated module to keep anomaly detection logic separate.
 """
 import os
+import json
 import numpy as np
-import rasterio
-from scipy.ndimage import label
-from typing import Dict, List, Optional, Tuple
-import re
+from typing import Dict, List, Optional
+from app.anomaly_histogram import count_candidates, get_histogram
+from app.baseline_service import build_rolling_baselines, default_baseline_years, get_baseline
+from app.cluster_stats import cluster_statistics
+from app.raster_cache import read_raster
+from app.raster_catalog import catalog, relative_data_path
+from app.result_cache import result_cache
 
 # Configuration
-BASE_CLEAN_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'cleaned')
+BASE_ANOMALY_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'anomalies')
 
 # DARK ZONE EMERGENCE DETECTION PARAMETERS (from anomaly.py)
 MIN_NEW_INTENSITY = 15.0      # Must be at least 15 nW bright (Real activity, not noise)
@@ -19,94 +23,70 @@ MAX_BASELINE_INTENSITY = 5.0  # Was dark before (< 5 nW = forest/rural)
 MIN_CLUSTER_SIZE = 3          # Must be 3+ connected pixels (filters sensor glitches)
 
 
-def find_cleaned_data_dir(region: str) -> Optional[str]:
+def detect_anomalies(region: str, target_year: Optional[int] = None,
+                     baseline_years: Optional[List[int]] = None,
+                     min_new_intensity: float = MIN_NEW_INTENSITY,
+                     max_baseline_intensity: float = MAX_BASELINE_INTENSITY,
+                     min_cluster_size: int = MIN_CLUSTER_SIZE,
+                     return_arrays: bool = False) -> Dict:
     """
-    Find the cleaned data directory for a given region.
-    Looks for folders matching "NightLights_Bright_*Region*" (with or without "_cleaned" suffix)
+    Detect dark zone emergence anomalies for a region.
+    Results are cached until one of the TIFs involved changes.
     
     Args:
-        region: Region name (e.g., "Tamil Nadu", "Maharashtra")
+        region: Region name
+        target_year: Year to detect anomalies in (default: last available year)
+        baseline_years: Years whose median is the baseline (default: every year before target_year)
+        min_new_intensity: Target pixels must be brighter than this (nW)
+        max_baseline_intensity: Baseline pixels must be darker than this (nW)
+        min_cluster_size: Smallest cluster (pixels) reported as an anomaly
+        return_arrays: Also return 'arrays' ({'mask', 'target', 'baseline'}:
+                       the final anomaly mask and the cropped rasters it was
+                       detected on) for rendering. Bypasses the result cache.
     
     Returns:
-        Path to cleaned data directory or None if not found
-    """
-    if not os.path.exists(BASE_CLEAN_DIR):
-        return None
-    
-    # Normalize region name for matching
-    region_normalized = region.replace(' ', '_').replace('-', '_').lower()
-    
-    # Look for matching directories
-    for folder_name in os.listdir(BASE_CLEAN_DIR):
-        folder_path = os.path.join(BASE_CLEAN_DIR, folder_name)
-        
-        if not os.path.isdir(folder_path):
-            continue
-        
-        # Check if folder matches the pattern
-        folder_lower = folder_name.lower()
-        # Match folders with "nightlights_bright" (with or without "_cleaned" suffix)
-        if 'nightlights_bright' in folder_lower:
-            # Check if region name is in folder name
-            if region_normalized in folder_lower or any(
-                word in folder_lower for word in region_normalized.split('_')
-            ):
-                return folder_path
-    
-    return None
-
-
-def get_available_years_from_dir(data_dir: str) -> List[int]:
+        Dictionary with anomaly detection results
     """
-    Get list of available years from TIF files in the directory
-    
-    Args:
-        data_dir: Path to directory containing cleaned TIF files
+    available_years = catalog.years(region)
+    if target_year is None and available_years:
+        target_year = available_years[-1]
     
-    Returns:
-        List of years found
-    """
-    if not os.path.exists(data_dir):
-        return []
+    if baseline_years is None and target_year is not None:
+        baseline_years = default_baseline_years(available_years, target_year)
+    baseline_years = sorted(set(baseline_years or []))
     
-    years = []
-    year_pattern = re.compile(r'(\d{4})')
+    thresholds = {
+        'min_new_intensity': float(min_new_intensity),
+        'max_baseline_intensity': float(max_baseline_intensity),
+        'min_cluster_size': int(min_cluster_size)
+    }
     
-    for filename in os.listdir(data_dir):
-        if filename.endswith('_clean.tif'):
-            match = year_pattern.search(filename)
-            if match:
-                year = int(match.group(1))
-                if year not in years:
-                    years.append(year)
+    if return_arrays:
+        # Arrays are not cacheable, so this runs the detection uncached
+        return _detect_anomalies(region, target_year, baseline_years, **thresholds, return_arrays=True)
     
-    return sorted(years)
+    return result_cache.cached(
+        'anomalies',
+        {'region': region, 'target_year': target_year, 'baseline_years': baseline_years, **thresholds},
+        catalog.fingerprint(region, baseline_years + [target_year]),
+        lambda: _detect_anomalies(region, target_year, baseline_years, **thresholds)
+    )
 
 
-def detect_anomalies(region: str) -> Dict:
-    """
-    Detect dark zone emergence anomalies for a region.
-    Uses the last available year as target year.
-    
-    Args:
-        region: Region name
+def _detect_anomalies(region: str, target_year: Optional[int], baseline_years: List[int],
+                      min_new_intensity: float, max_baseline_intensity: float, min_cluster_size: int,
+                      return_arrays: bool = False) -> Dict:
+    """Uncached anomaly detection (see detect_anomalies)"""
+    # Get available years from the catalog
+    available_years = catalog.years(region)
     
-    Returns:
-        Dictionary with anomaly detection results
-    """
-    # Find cleaned data directory
-    clean_dir = find_cleaned_data_dir(region)
-    
-    if not clean_dir:
+    if not available_years:
         return {
             'success': False,
             'message': f'No cleaned data found for region: {region}',
             'anomalies': []
         }
     
-    # Get available years
-    available_years = get_available_years_from_dir(clean_dir)
-    
     if len(available_years) < 2:
         return {
             'success': False,
@@ -114,14 +94,7 @@ def detect_anomalies(region: str) -> Dict:
             'anomalies': []
         }
     
-    # Use the last year as target year
-    target_year = available_years[-1]
-    target_year_str = str(target_year)
-    
-    # Find all cleaned TIF files
-    all_files = sorted([f for f in os.listdir(clean_dir) if f.endswith('_clean.tif')])
-    baseline_files = [f for f in all_files if target_year_str not in f]
-    target_file = next((f for f in all_files if target_year_str in f), None)
+    target_file = catalog.get_file(region, target_year)
     
     if not target_file:
         return {
@@ -130,33 +103,20 @@ def detect_anomalies(region: str) -> Dict:
             'anomalies': []
         }
     
-    if len(baseline_files) == 0:
-        return {
-            'success': False,
-            'message': 'No baseline files found for comparison',
-            'anomalies': []
-        }
-    
     try:
-        # Build baseline from historical data
-        baseline_stack = []
-        metadata = None
-        
-        for f in baseline_files:
-            path = os.path.join(clean_dir, f)
-            with rasterio.open(path) as src:
-                img = src.read(1).astype(np.float32)
-                baseline_stack.append(img)
-                if metadata is None:
-                    metadata = src.profile
+        # Median of the earlier years, cached on disk until one of them changes
+        baseline = get_baseline(region, target_year, baseline_years)
+        if not baseline['success']:
+            return {
+                'success': False,
+                'message': baseline['message'],
+                'anomalies': []
+            }
         
-        baseline_img = np.median(np.array(baseline_stack), axis=0)
+        baseline_img, _ = read_raster(baseline['path'])
         
         # Load target year data
-        target_path = os.path.join(clean_dir, target_file)
-        with rasterio.open(target_path) as src:
-            target_img = src.read(1).astype(np.float32)
-            transform = src.transform
+        target_img, transform = read_raster(target_file)
         
         # Match sizes
         rows = min(baseline_img.shape[0], target_img.shape[0])
@@ -167,61 +127,48 @@ def detect_anomalies(region: str) -> Dict:
         # DARK ZONE EMERGENCE DETECTION
         # Core logic: Light appeared where darkness was
         anomaly_mask = (
-            (target_img > MIN_NEW_INTENSITY) &        # NOW: Bright enough to be real activity
-            (baseline_img < MAX_BASELINE_INTENSITY)   # BEFORE: Was dark (forest/rural)
+            (target_img > min_new_intensity) &        # NOW: Bright enough to be real activity
+            (baseline_img < max_baseline_intensity)   # BEFORE: Was dark (forest/rural)
         )
         
-        absolute_diff = target_img - baseline_img
-        
-        # Cluster filtering (Remove Noise)
-        labeled_array, num_features = label(anomaly_mask)
-        final_mask = np.zeros_like(anomaly_mask, dtype=bool)
-        
-        anomaly_stats = []
+        # Cluster filtering (Remove Noise), all clusters summarized in one pass
+        final_mask, clusters = cluster_statistics(
+            anomaly_mask, target_img, baseline_img, transform, min_cluster_size
+        )
         
-        for i in range(1, num_features + 1):
-            cluster = labeled_array == i
-            cluster_size = np.sum(cluster)
-            
-            if cluster_size >= MIN_CLUSTER_SIZE:
-                final_mask[cluster] = True
-                
-                # Extract metadata
-                rows_idx, cols_idx = np.where(cluster)
-                center_row = int(np.mean(rows_idx))
-                center_col = int(np.mean(cols_idx))
-                
-                lon, lat = rasterio.transform.xy(transform, center_row, center_col)
-                
-                anomaly_stats.append({
-                    "id": len(anomaly_stats) + 1,
-                    "lat": round(float(lat), 6),
-                    "lon": round(float(lon), 6),
-                    "pixel_count": int(cluster_size),
-                    "current_intensity": round(float(np.mean(target_img[cluster])), 2),
-                    "baseline_intensity": round(float(np.mean(baseline_img[cluster])), 2),
-                    "intensity_gain": round(float(np.mean(absolute_diff[cluster])), 2),
-                    "max_brightness": round(float(np.max(target_img[cluster])), 2)
-                })
+        anomaly_stats = [
+            {
+                "id": cluster['id'],
+                "lat": round(cluster['lat'], 6),
+                "lon": round(cluster['lon'], 6),
+                "pixel_count": cluster['pixel_count'],
+                "current_intensity": round(cluster['current_intensity'], 2),
+                "baseline_intensity": round(cluster['baseline_intensity'], 2),
+                "intensity_gain": round(cluster['intensity_gain'], 2),
+                "max_brightness": round(cluster['max_brightness'], 2)
+            }
+            for cluster in clusters
+        ]
         
         # Calculate overall growth
         total_baseline = np.sum(baseline_img)
         total_target = np.sum(target_img)
-        overall_growth = ((total_target - total_baseline) / total_baseline) * 100 if total_baseline > 0 else 0
+        overall_growth = float(((total_target - total_baseline) / total_baseline) * 100) if total_baseline > 0 else 0.0
         
         # Sort anomalies by intensity gain (highest first)
         anomaly_stats_sorted = sorted(anomaly_stats, key=lambda x: x['intensity_gain'], reverse=True)
         
-        return {
+        result = {
             'success': True,
             'region': region,
             'target_year': target_year,
-            'baseline_years': len(baseline_files),
+            'baseline_years': len(baseline['baseline_years']),
+            'baseline_year_list': baseline['baseline_years'],
             'detection_method': 'Dark Zone Emergence (Absolute Threshold)',
             'parameters': {
-                'min_new_intensity': f'{MIN_NEW_INTENSITY} nW',
-                'max_baseline_intensity': f'{MAX_BASELINE_INTENSITY} nW',
-                'min_cluster_size': MIN_CLUSTER_SIZE
+                'min_new_intensity': f'{min_new_intensity} nW',
+                'max_baseline_intensity': f'{max_baseline_intensity} nW',
+                'min_cluster_size': min_cluster_size
             },
             'results': {
                 'total_anomalies': len(anomaly_stats_sorted),
@@ -230,6 +177,9 @@ def detect_anomalies(region: str) -> Dict:
             },
             'anomalies': anomaly_stats_sorted
         }
+        if return_arrays:
+            result['arrays'] = {'mask': final_mask, 'target': target_img, 'baseline': baseline_img}
+        return result
         
     except Exception as e:
         return {
@@ -239,6 +189,146 @@ def detect_anomalies(region: str) -> Dict:
         }
 
 
+def anomaly_report_path(region: str, target_year: int) -> Optional[str]:
+    """
+    Path of the persisted anomaly report of a target year
+    (data/anomalies/<cleaned folder>_anomalies/anomaly_report_<year>.json)
+    """
+    record = catalog.get_region(region)
+    if not record or not record['clean_dir']:
+        return None
+    folder = f"{os.path.basename(record['clean_dir'])}_anomalies"
+    return os.path.join(BASE_ANOMALY_DIR, folder, f'anomaly_report_{target_year}.json')
+
 
+def write_anomaly_report(region: str, result: Dict) -> str:
+    """
+    Persist a detect_anomalies result as the report of its target year
+    
+    The batch mode and the anomaly.py script both write reports through
+    here, so every report has the same schema.
+    
+    Returns:
+        Path of the written report
+    """
+    report_path = anomaly_report_path(region, result['target_year'])
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(result, f, indent=2)
+    return report_path
 
 
+def detect_anomalies_batch(region: str) -> Dict:
+    """
+    Detect anomalies for every year of a region against its rolling baseline
+    
+    All stale baselines are built in one strip pass that reads each year
+    once, each year's result goes into the result cache, and a report per
+    year is written next to the other anomaly outputs.
+    
+    Args:
+        region: Region name
+    
+    Returns:
+        Dictionary with one summary per target year
+    """
+    available_years = catalog.years(region)
+    
+    if len(available_years) < 2:
+        return {
+            'success': False,
+            'message': f'Insufficient data: Need at least 2 years, found {len(available_years)}',
+            'years': []
+        }
+    
+    try:
+        baselines = build_rolling_baselines(region)
+        summaries = []
+        
+        for target_year in available_years[1:]:
+            if not baselines[target_year]['success']:
+                summaries.append({'target_year': target_year, 'success': False,
+                                  'message': baselines[target_year]['message']})
+                continue
+            
+            result = detect_anomalies(region, target_year)
+            if not result['success']:
+                summaries.append({'target_year': target_year, 'success': False, 'message': result['message']})
+                continue
+            
+            report_path = write_anomaly_report(region, result)
+            
+            summaries.append({
+                'target_year': target_year,
+                'success': True,
+                'baseline_years': result['baseline_years'],
+                'report': relative_data_path(report_path),
+                **result['results']
+            })
+        
+        return {
+            'success': True,
+            'region': region,
+            'years': summaries
+        }
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Error during batch anomaly detection: {str(e)}',
+            'years': []
+        }
+
+
+def explore_thresholds(region: str, target_year: Optional[int] = None,
+                       baseline_years: Optional[List[int]] = None,
+                       min_new_intensity: float = MIN_NEW_INTENSITY,
+                       max_baseline_intensity: float = MAX_BASELINE_INTENSITY) -> Dict:
+    """
+    Count candidate anomaly pixels for a pair of thresholds without labeling clusters
+    
+    Counts come from the cached joint histogram (see anomaly_histogram), so
+    thresholds are snapped to its grid; cluster filtering only happens once
+    the thresholds are passed to detect_anomalies.
+    
+    Args:
+        region: Region name
+        target_year: Year to detect anomalies in (default: last available year)
+        baseline_years: Years whose median is the baseline (default: every year before target_year)
+        min_new_intensity: Target pixels must be brighter than this (nW)
+        max_baseline_intensity: Baseline pixels must be darker than this (nW)
+    
+    Returns:
+        Dictionary with the effective thresholds and pixel counts
+    """
+    available_years = catalog.years(region)
+    if not available_years:
+        return {
+            'success': False,
+            'message': f'No cleaned data found for region: {region}'
+        }
+    
+    if target_year is None:
+        target_year = available_years[-1]
+    
+    try:
+        histogram = get_histogram(region, target_year, baseline_years)
+        if not histogram['success']:
+            return {
+                'success': False,
+                'message': histogram['message']
+            }
+        
+        return {
+            'success': True,
+            'region': region,
+            'target_year': target_year,
+            'baseline_year_list': histogram['baseline_years'],
+            'counts': count_candidates(histogram['table'], min_new_intensity, max_baseline_intensity)
+        }
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Error during threshold exploration: {str(e)}'
+        }
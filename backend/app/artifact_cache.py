@@ -0,0 +1,123 @@
+"""
+Artifact Cache Module
+Helpers for derived rasters cached under data/cache (baselines, etc.).
+Each artifact has a JSON manifest sidecar recording the fingerprint of the
+inputs it was built from; an artifact is fresh while that fingerprint matches.
+"""
+import os
+import json
+import threading
+from typing import Dict, Optional
+import numpy as np
+import rasterio
+
+# Configuration
+BASE_ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'cache')
+
+# GeoTIFF creation options for cached rasters
+ARTIFACT_PROFILE = {
+    'driver': 'GTiff',
+    'tiled': True,
+    'blockxsize': 256,
+    'blockysize': 256,
+    'compress': 'deflate'
+}
+
+# Serializes builds of the same artifact within the process
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+
+
+def artifact_path(kind: str, region_folder: str, filename: str) -> str:
+    """
+    Path of a cached artifact, e.g. data/cache/baselines/<region folder>/<filename>
+    """
+    return os.path.join(BASE_ARTIFACT_DIR, kind, region_folder, filename)
+
+
+def temp_path(path: str, suffix: str = '.tmp') -> str:
+    """
+    Temporary sibling of a file for an atomic write (write, then os.replace);
+    unique per process and thread so concurrent builders never share it
+    """
+    return f'{path}.{os.getpid()}.{threading.get_ident()}{suffix}'
+
+
+def manifest_path(path: str) -> str:
+    """Manifest sidecar of an artifact"""
+    return os.path.splitext(path)[0] + '.json'
+
+
+def read_manifest(path: str) -> Optional[Dict]:
+    """Manifest of an artifact, or None if it is missing or unreadable"""
+    try:
+        with open(manifest_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(path: str, fingerprint: str) -> bool:
+    """True if the artifact exists and was built from inputs with this fingerprint"""
+    manifest = read_manifest(path)
+    return (
+        manifest is not None and
+        manifest.get('fingerprint') == fingerprint and
+        os.path.exists(path)
+    )
+
+
+def write_manifest(path: str, manifest: Dict) -> None:
+    """Write the manifest sidecar atomically (after the artifact itself)"""
+    target = manifest_path(path)
+    tmp_path = temp_path(target)
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, target)
+
+
+def build_lock(path: str) -> threading.Lock:
+    """Lock shared by every build of the same artifact path"""
+    with _build_locks_guard:
+        return _build_locks.setdefault(path, threading.Lock())
+
+
+def raster_profile(template: Dict, dtype: str = 'float32', nodata=None) -> Dict:
+    """
+    Creation profile for a cached raster with the grid of a template profile
+
+    Args:
+        template: Profile of a source raster (crs, transform, width, height)
+        dtype: Output data type
+        nodata: Output nodata value
+
+    Returns:
+        Profile for rasterio.open(..., 'w', **profile)
+    """
+    profile = dict(ARTIFACT_PROFILE)
+    profile.update({
+        'count': 1,
+        'dtype': dtype,
+        'nodata': nodata,
+        'crs': template.get('crs'),
+        'transform': template['transform'],
+        'width': template['width'],
+        'height': template['height']
+    })
+
+    # Small rasters cannot use 256 x 256 tiles
+    if profile['width'] < 256 or profile['height'] < 256:
+        profile['tiled'] = False
+        profile.pop('blockxsize')
+        profile.pop('blockysize')
+
+    return profile
+
+
+def write_raster(path: str, data: np.ndarray, profile: Dict) -> None:
+    """Write a single-band raster atomically (temp file + rename)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = temp_path(path)
+    with rasterio.open(tmp_path, 'w', **profile) as dst:
+        dst.write(data.astype(profile['dtype'], copy=False), 1)
+    os.replace(tmp_path, path)
@@ -0,0 +1,251 @@
+"""
+Baseline Service Module
+Builds and caches the per-pixel median baseline used by anomaly detection.
+One float32 GeoTIFF is kept per region, target year and set of baseline
+years, and rebuilt only when one of its input TIFs changes. Appending a new
+year therefore only creates the baseline for the new target year.
+The median is built strip by strip within BASELINE_MAX_BYTES.
+"""
+import os
+import time
+import hashlib
+from contextlib import ExitStack
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from typing import Dict, List, Optional
+
+from app.artifact_cache import artifact_path, build_lock, is_fresh, raster_profile, temp_path, write_manifest
+from app.raster_catalog import catalog
+from app.year_cube import cube_view
+
+# Configuration
+# Memory budget for one strip of the median build (bytes)
+BASELINE_MAX_BYTES = int(os.environ.get('BASELINE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+def default_baseline_years(available_years: List[int], target_year: int) -> List[int]:
+    """Years used as baseline when none are given: every year before the target"""
+    return [year for year in available_years if year < target_year]
+
+
+def baseline_file(region: str, target_year: int, baseline_years: List[int]) -> Optional[str]:
+    """
+    Path of the cached baseline raster for a region, target year and baseline years
+
+    Returns:
+        Path under data/cache/baselines, or None if the region has no cleaned data
+    """
+    record = catalog.get_region(region)
+    if not record or not record['clean_dir']:
+        return None
+
+    years_key = hashlib.sha1(','.join(str(y) for y in sorted(baseline_years)).encode('utf-8')).hexdigest()[:10]
+    filename = f'baseline_{target_year}_{years_key}.tif'
+    return artifact_path('baselines', os.path.basename(record['clean_dir']), filename)
+
+
+def median_strip_rows(width: int, n_years: int, block_rows: int, max_bytes: int = BASELINE_MAX_BYTES) -> int:
+    """
+    Rows per strip so that one strip of the median build fits in max_bytes
+
+    A strip needs the stacked years, np.median's partitioned copy of them and
+    the float32 result. Strips are rounded down to whole internal blocks when
+    at least one block fits.
+    """
+    bytes_per_row = width * 4 * (2 * n_years + 1)
+    rows = max(1, max_bytes // bytes_per_row)
+    if rows >= block_rows:
+        rows -= rows % block_rows
+    return int(rows)
+
+
+def build_median_baselines(paths: List[str], outputs: Dict[str, int], max_bytes: int = BASELINE_MAX_BYTES) -> Dict:
+    """
+    Write per-pixel medians of leading subsets of the given rasters strip by strip
+
+    Every year is read once per row strip (aligned to the internal blocks);
+    for each output, the median over the first n years of the strip is taken
+    and written straight to that output, so peak memory stays near max_bytes
+    whatever the raster size. Each output equals np.median over its full stack.
+
+    Args:
+        paths: Cleaned TIFs in year order (same grid)
+        outputs: Output GeoTIFF path -> number of leading paths in its median
+        max_bytes: Memory budget for one strip
+
+    Returns:
+        Dictionary with 'shape' and 'strip_rows'
+
+    Raises:
+        ValueError: If the rasters do not share the same shape
+    """
+    sources = [rasterio.open(path) for path in paths]
+    tmp_paths = {out_path: temp_path(out_path) for out_path in outputs}
+    destinations = []
+    try:
+        first = sources[0]
+        height, width = first.height, first.width
+        for src in sources[1:]:
+            if (src.height, src.width) != (height, width):
+                raise ValueError(
+                    f'Baseline rasters differ in size: {os.path.basename(src.name)} is '
+                    f'{src.height}x{src.width}, expected {height}x{width}'
+                )
+
+        strip_rows = median_strip_rows(width, len(sources), first.block_shapes[0][0], max_bytes)
+        profile = raster_profile(first.profile)
+
+        for out_path, tmp_path in tmp_paths.items():
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            destinations.append((rasterio.open(tmp_path, 'w', **profile), outputs[out_path]))
+
+        # Years with a current year cube are sliced from it instead of decoded
+        views = [cube_view(path) for path in paths]
+
+        stack = np.empty((len(sources), min(strip_rows, height), width), dtype=np.float32)
+        for row in range(0, height, strip_rows):
+            rows = min(strip_rows, height - row)
+            window = Window(0, row, width, rows)
+            for i, src in enumerate(sources):
+                if views[i] is not None:
+                    stack[i, :rows] = views[i][0][row:row + rows]
+                else:
+                    stack[i, :rows] = src.read(1, window=window)
+            for dst, n_years in destinations:
+                dst.write(np.median(stack[:n_years, :rows], axis=0).astype(np.float32, copy=False), 1, window=window)
+    finally:
+        for src in sources:
+            src.close()
+        for dst, _ in destinations:
+            dst.close()
+
+    for out_path, tmp_path in tmp_paths.items():
+        os.replace(tmp_path, out_path)
+
+    return {'shape': [height, width], 'strip_rows': strip_rows}
+
+
+def build_median_baseline(paths: List[str], out_path: str, max_bytes: int = BASELINE_MAX_BYTES) -> Dict:
+    """Write the per-pixel median of the given rasters (see build_median_baselines)"""
+    return build_median_baselines(paths, {out_path: len(paths)}, max_bytes)
+
+
+def _resolve_baseline_years(region: str, target_year: int, baseline_years: Optional[List[int]]) -> Dict:
+    """Validate the baseline years of a target year (default: every earlier year)"""
+    available_years = catalog.years(region)
+    if not available_years:
+        return {'success': False, 'message': f'No cleaned data found for region: {region}'}
+
+    if baseline_years is None:
+        baseline_years = default_baseline_years(available_years, target_year)
+    baseline_years = sorted(set(baseline_years))
+
+    missing = [year for year in baseline_years if year not in available_years]
+    if missing:
+        return {'success': False, 'message': f'No data found for baseline years: {missing}'}
+
+    if target_year in baseline_years:
+        return {'success': False, 'message': 'The target year cannot be one of the baseline years'}
+
+    if not baseline_years:
+        return {'success': False, 'message': 'No baseline files found for comparison'}
+
+    return {'success': True, 'baseline_years': baseline_years}
+
+
+def _manifest(region: str, target_year: int, baseline_years: List[int], fingerprint: str,
+              build: Dict, seconds: float) -> Dict:
+    return {
+        'region': catalog.get_region(region)['name'],
+        'target_year': int(target_year),
+        'baseline_years': baseline_years,
+        'fingerprint': fingerprint,
+        'strip_rows': build['strip_rows'],
+        'build_seconds': round(seconds, 3)
+    }
+
+
+def get_baseline(region: str, target_year: int, baseline_years: Optional[List[int]] = None) -> Dict:
+    """
+    Get the median baseline for a target year, building it if it is missing or stale
+
+    Args:
+        region: Region name
+        target_year: Year the baseline is compared against
+        baseline_years: Years to take the median over (default: all years before target_year)
+
+    Returns:
+        Dictionary with 'success' and either 'path' and 'baseline_years' or 'message'
+    """
+    resolved = _resolve_baseline_years(region, target_year, baseline_years)
+    if not resolved['success']:
+        return resolved
+    baseline_years = resolved['baseline_years']
+
+    path = baseline_file(region, target_year, baseline_years)
+    fingerprint = catalog.fingerprint(region, baseline_years)
+
+    with build_lock(path):
+        if not is_fresh(path, fingerprint):
+            start = time.perf_counter()
+            paths = [catalog.get_file(region, year) for year in baseline_years]
+            build = build_median_baseline(paths, path)
+            write_manifest(path, _manifest(region, target_year, baseline_years, fingerprint,
+                                           build, time.perf_counter() - start))
+
+    return {'success': True, 'path': path, 'baseline_years': baseline_years}
+
+
+def build_rolling_baselines(region: str, target_years: Optional[List[int]] = None) -> Dict[int, Dict]:
+    """
+    Make sure the default (rolling) baseline of every target year is fresh
+
+    Stale baselines are built together: each year is read once per strip and
+    the medians of every target's preceding years are written side by side.
+
+    Args:
+        region: Region name
+        target_years: Target years (default: every year that has an earlier year)
+
+    Returns:
+        Target year -> get_baseline-style result
+    """
+    available_years = catalog.years(region)
+    if target_years is None:
+        target_years = available_years[1:]
+
+    results = {}
+    jobs = {}
+    for target_year in sorted(set(target_years)):
+        resolved = _resolve_baseline_years(region, target_year, None)
+        if not resolved['success']:
+            results[target_year] = resolved
+            continue
+        years = resolved['baseline_years']
+        jobs[target_year] = (baseline_file(region, target_year, years), catalog.fingerprint(region, years), years)
+        results[target_year] = {'success': True, 'path': jobs[target_year][0], 'baseline_years': years}
+
+    if not jobs:
+        return results
+
+    with ExitStack() as stack:
+        # Locks are always taken in path order so concurrent builds cannot deadlock
+        for path in sorted(path for path, _, _ in jobs.values()):
+            stack.enter_context(build_lock(path))
+
+        stale = {year: job for year, job in jobs.items() if not is_fresh(job[0], job[1])}
+        if stale:
+            start = time.perf_counter()
+            input_years = sorted(set(year for _, _, years in stale.values() for year in years))
+            paths = [catalog.get_file(region, year) for year in input_years]
+
+            # Rolling baselines are always a prefix of the sorted input years
+            outputs = {path: len(years) for path, _, years in stale.values()}
+            build = build_median_baselines(paths, outputs)
+
+            for target_year, (path, fingerprint, years) in stale.items():
+                write_manifest(path, _manifest(region, target_year, years, fingerprint,
+                                               build, time.perf_counter() - start))
+
+    return results
@@ -0,0 +1,142 @@
+"""
+Extractor Benchmark
+Times the point extraction in tif_extractor against the original per-pixel
+loop. The vectorized path (full read + stride) must produce byte-identical
+points; the decimated path (extract_tif_to_json) is timed end to end.
+
+With --metrics-region, also times the cold per-year statistics pass of the
+metrics table (decode + reduce every year) through map_workers at several
+thread counts, to check the METRICS_WORKERS speedup on the host.
+
+Run from the backend directory:
+    python -m app.benchmark_extractor [path/to/file.tif]
+    python -m app.benchmark_extractor --metrics-region "Tamil Nadu" --workers 1,2,4
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+import rasterio
+
+from app.metrics_store import _file_stats, map_workers
+from app.raster_cache import raster_cache
+from app.raster_catalog import catalog
+from app.tif_extractor import extract_tif_to_json, extract_points
+
+# ================================
+# CONFIGURATION
+# ================================
+BASE_RAW_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'raw')
+DEFAULT_FILE = os.path.join(BASE_RAW_DIR, 'NightLights_Bright_Maharashtra', 'VIIRS_LOG_Maharashtra_2024_01.tif')
+
+SAMPLE_RATES = [1, 2, 5, 10, 15]
+REPEATS = 3
+METRICS_WORKER_COUNTS = [1, 2, 4, 8]
+
+
+def legacy_data_points(filepath, sample_rate):
+    """Original nested-loop extraction, kept as the reference implementation"""
+    with rasterio.open(filepath) as src:
+        data = src.read(1).astype(np.float32)
+        data_points = []
+
+        for row in range(0, src.height, sample_rate):
+            for col in range(0, src.width, sample_rate):
+                lon, lat = src.xy(row, col)
+                value = float(data[row, col])
+
+                if value > 0:
+                    data_points.append({
+                        'lat': round(lat, 6),
+                        'lon': round(lon, 6),
+                        'value': round(value, 4)
+                    })
+
+    return data_points
+
+
+def vectorized_data_points(filepath, sample_rate):
+    """Full read + stride through extract_points"""
+    with rasterio.open(filepath) as src:
+        data = src.read(1).astype(np.float32)
+        lats, lons, values = extract_points(data, src.transform, sample_rate)
+
+    return [
+        {'lat': lat, 'lon': lon, 'value': value}
+        for lat, lon, value in zip(lats.tolist(), lons.tolist(), values.tolist())
+    ]
+
+
+def best_of(fn, repeats):
+    """Returns (best wall time in seconds, last result)"""
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_benchmark(filepath):
+    print(f"\n⏱️  BENCHMARK: {os.path.basename(filepath)}")
+    print("=" * 86)
+    print(f"{'sample_rate':>11} | {'points':>9} | {'loop (s)':>9} | {'vector (s)':>10} | "
+          f"{'decimated (s)':>13} | {'speedup':>8} | identical")
+    print("-" * 86)
+
+    for sample_rate in SAMPLE_RATES:
+        loop_time, legacy_points = best_of(lambda: legacy_data_points(filepath, sample_rate), 1)
+        vector_time, points = best_of(lambda: vectorized_data_points(filepath, sample_rate), REPEATS)
+        decimated_time, _ = best_of(lambda: extract_tif_to_json(filepath, sample_rate=sample_rate), REPEATS)
+
+        identical = (
+            json.dumps(legacy_points, sort_keys=True) ==
+            json.dumps(points, sort_keys=True)
+        )
+
+        print(f"{sample_rate:>11} | {len(points):>9,} | {loop_time:>9.3f} | {vector_time:>10.3f} | "
+              f"{decimated_time:>13.3f} | {loop_time / vector_time:>7.1f}x | {'yes' if identical else 'NO'}")
+
+    print("=" * 86)
+
+
+def run_metrics_benchmark(region, worker_counts):
+    paths = [catalog.get_file(region, year) for year in catalog.years(region)]
+    if not paths:
+        print(f"❌ Error: No cleaned data found for region {region}")
+        return
+
+    def cold_stats(workers):
+        # Decoding is part of the work being parallelized, so start cold
+        raster_cache.clear()
+        return map_workers(_file_stats, paths, workers)
+
+    print(f"\n⏱️  METRICS BENCHMARK: {region}, {len(paths)} years, {os.cpu_count()} core(s)")
+    print("=" * 52)
+    print(f"{'workers':>7} | {'time (s)':>9} | {'speedup':>8} | identical")
+    print("-" * 52)
+
+    base_time, base_stats = best_of(lambda: cold_stats(1), REPEATS)
+    for workers in worker_counts:
+        elapsed, stats = (base_time, base_stats) if workers == 1 else best_of(lambda: cold_stats(workers), REPEATS)
+        identical = json.dumps(stats, sort_keys=True, default=str) == json.dumps(base_stats, sort_keys=True, default=str)
+        print(f"{workers:>7} | {elapsed:>9.3f} | {base_time / elapsed:>7.2f}x | {'yes' if identical else 'NO'}")
+
+    print("=" * 52)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark point extraction and the metrics pass')
+    parser.add_argument('file', nargs='?', help='TIF for the extractor benchmark (default: Maharashtra 2024)')
+    parser.add_argument('--metrics-region', help='Also time map_workers over every year of this region')
+    parser.add_argument('--workers', default=','.join(str(w) for w in METRICS_WORKER_COUNTS),
+                        help='Comma-separated thread counts for the metrics benchmark')
+    args = parser.parse_args()
+
+    # The extractor benchmark runs unless only the metrics benchmark was asked for
+    if args.file or not args.metrics_region:
+        run_benchmark(args.file or DEFAULT_FILE)
+    if args.metrics_region:
+        run_metrics_benchmark(args.metrics_region, [int(w) for w in args.workers.split(',')])
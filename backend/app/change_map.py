@@ -0,0 +1,172 @@
+"""
+Change Map Module
+Per-pixel change classification between two years of a region, cached as a
+tiled uint8 GeoTIFF under data/cache/change_maps/<region folder>/:
+    0 stable       |year2 - year1| <= SIGNIFICANT_CHANGE_NW
+    1 new_lit      brighter by more than the threshold, dark (not lit) in year1
+    2 intensified  brighter by more than the threshold, already lit in year1
+    3 dimmed       darker by more than the threshold, still lit in year2
+    4 lost_light   darker by more than the threshold, dark (not lit) in year2
+
+The map is built once per year pair with windowed reads; the difference
+statistics of the pair (mean, spread, extremes, class counts) are stored in
+its manifest so comparisons never rebuild the float difference.
+"""
+import os
+import time
+from typing import Dict, Optional
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from app.artifact_cache import artifact_path, build_lock, is_fresh, raster_profile, read_manifest, temp_path, write_manifest
+from app.raster_catalog import catalog
+from app.raster_stats import SECTOR_BINS, RasterStatsAccumulator
+from app.year_cube import cube_view
+
+# Configuration
+# Significant change threshold (nW): bins are < -10, [-10, 10] and > 10
+SIGNIFICANT_CHANGE_NW = 10.0
+CHANGE_EDGES = [np.nextafter(-SIGNIFICANT_CHANGE_NW, -np.inf), SIGNIFICANT_CHANGE_NW]
+
+# Class codes of the change raster, in code order
+CHANGE_CLASSES = ['stable', 'new_lit', 'intensified', 'dimmed', 'lost_light']
+
+# Rows read per strip while building (one row of 256 x 256 output tiles)
+CHANGE_STRIP_ROWS = 256
+
+
+def change_file(region: str, year1: int, year2: int) -> Optional[str]:
+    """Path of the cached change raster of a year pair, or None"""
+    record = catalog.get_region(region)
+    if not record or not record['clean_dir']:
+        return None
+    return artifact_path('change_maps', os.path.basename(record['clean_dir']), f'change_{year1}_{year2}.tif')
+
+
+def classify_change(img1: np.ndarray, img2: np.ndarray) -> np.ndarray:
+    """Change class code (see CHANGE_CLASSES) of every pixel between two aligned arrays"""
+    diff = img2 - img1
+    lit1 = img1 > SECTOR_BINS[0]
+    lit2 = img2 > SECTOR_BINS[0]
+
+    classes = np.zeros(diff.shape, dtype=np.uint8)
+    brighter = diff > SIGNIFICANT_CHANGE_NW
+    darker = diff < -SIGNIFICANT_CHANGE_NW
+    classes[brighter & ~lit1] = 1
+    classes[brighter & lit1] = 2
+    classes[darker & lit2] = 3
+    classes[darker & ~lit2] = 4
+    return classes
+
+
+def difference_stats(diff_acc: RasterStatsAccumulator) -> Dict:
+    """
+    Summary of a (year2 - year1) difference
+
+    Args:
+        diff_acc: Accumulator over the difference with CHANGE_EDGES
+
+    Returns:
+        Dictionary with mean_change, max_increase, max_decrease, std_dev and
+        the brightened, darkened and unchanged pixel counts
+    """
+    # Areas of significant change: brighter (> +10 nW) and darker (< -10 nW)
+    darkened_pixels = int(diff_acc.counts[0])
+    brightened_pixels = int(diff_acc.counts[2])
+    return {
+        'mean_change': float(round(diff_acc.mean, 2)),
+        'max_increase': float(round(diff_acc.max, 2)),
+        'max_decrease': float(round(diff_acc.min, 2)),
+        'std_dev': float(round(diff_acc.std, 2)),
+        'brightened_pixels': brightened_pixels,
+        'darkened_pixels': darkened_pixels,
+        'unchanged_pixels': int(diff_acc.total - brightened_pixels - darkened_pixels)
+    }
+
+
+def build_change_map(path1: str, path2: str, out_path: str) -> Dict:
+    """
+    Write the change raster of two cleaned TIFs strip by strip
+
+    Both rasters are cropped to their common shape; the grid of the first is kept.
+
+    Returns:
+        Dictionary with 'shape', 'difference_stats' and 'classes' (class -> pixel count)
+    """
+    tmp_path = temp_path(out_path)
+    with rasterio.open(path1) as src1, rasterio.open(path2) as src2:
+        height = min(src1.height, src2.height)
+        width = min(src1.width, src2.width)
+        profile = raster_profile(dict(src1.profile, width=width, height=height), dtype='uint8')
+
+        # Years with a current year cube are sliced from it instead of decoded
+        views = [cube_view(path1), cube_view(path2)]
+
+        diff_acc = RasterStatsAccumulator(CHANGE_EDGES)
+        class_counts = np.zeros(len(CHANGE_CLASSES), dtype=np.int64)
+
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with rasterio.open(tmp_path, 'w', **profile) as dst:
+            for row in range(0, height, CHANGE_STRIP_ROWS):
+                window = Window(0, row, width, min(CHANGE_STRIP_ROWS, height - row))
+                strips = [
+                    view[0][row:row + window.height, :width] if view is not None else src.read(1, window=window)
+                    for view, src in zip(views, (src1, src2))
+                ]
+                diff_acc.update(strips[1] - strips[0])
+                classes = classify_change(strips[0], strips[1])
+                class_counts += np.bincount(classes.ravel(), minlength=len(CHANGE_CLASSES))
+                dst.write(classes, 1, window=window)
+    os.replace(tmp_path, out_path)
+
+    return {
+        'shape': [height, width],
+        'difference_stats': difference_stats(diff_acc),
+        'classes': {name: int(count) for name, count in zip(CHANGE_CLASSES, class_counts)}
+    }
+
+
+def get_change_map(region: str, year1: int, year2: int) -> Dict:
+    """
+    Get the change raster of a year pair, building it if it is missing or stale
+
+    Args:
+        region: Region name
+        year1: Earlier year of the comparison
+        year2: Later year of the comparison
+
+    Returns:
+        Dictionary with 'success' and either 'path', 'shape', 'difference_stats'
+        and 'classes' or 'message'
+    """
+    for year in (year1, year2):
+        if not catalog.get_file(region, year):
+            return {'success': False, 'message': f'No data found for year {year}'}
+
+    path = change_file(region, year1, year2)
+    fingerprint = catalog.fingerprint(region, [year1, year2])
+
+    with build_lock(path):
+        if not is_fresh(path, fingerprint):
+            start = time.perf_counter()
+            build = build_change_map(catalog.get_file(region, year1), catalog.get_file(region, year2), path)
+            write_manifest(path, {
+                'region': catalog.get_region(region)['name'],
+                'year1': int(year1),
+                'year2': int(year2),
+                'fingerprint': fingerprint,
+                'shape': build['shape'],
+                'difference_stats': build['difference_stats'],
+                'classes': build['classes'],
+                'build_seconds': round(time.perf_counter() - start, 3)
+            })
+
+    manifest = read_manifest(path)
+    return {
+        'success': True,
+        'path': path,
+        'shape': manifest['shape'],
+        'difference_stats': manifest['difference_stats'],
+        'classes': manifest['classes']
+    }
@@ -2,10 +2,23 @@
 Data Utilities Module
 Utility functions for data processing and normalization.
 """
+import json
 import numpy as np
 from typing import List, Dict
 
 
+class NpEncoder(json.JSONEncoder):
+    """JSON encoder for numpy types"""
+    def default(self, obj):
+        if isinstance(obj, np.integer):
+            return int(obj)
+        if isinstance(obj, np.floating):
+            return float(obj)
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        return super(NpEncoder, self).default(obj)
+
+
 def normalize_growth_timeline(timeline: List[Dict], target_annual_growth: float = 4.5) -> List[Dict]:
     """
     Normalize growth timeline to ensure realistic, consistent growth rates.
@@ -0,0 +1,156 @@
+"""
+Difference Image Module
+Server-rendered difference heatmaps for the compare view. The float
+difference (year2 - year1) of two cleaned TIFs is drawn at full resolution
+with a diverging colormap (blue = darker, red = brighter) and cached as a
+PNG under data/cache/diff_images/<region folder>/.
+
+Images are rendered on first request from /api/compare/diff, never while a
+comparison is computed. A WebP copy is only written when its .webp URL is
+requested, and is kept only when it comes out smaller than the PNG.
+"""
+import os
+import io
+import time
+from typing import Dict, Optional
+from urllib.parse import quote
+import numpy as np
+from PIL import Image, features
+
+from app.artifact_cache import artifact_path, build_lock, is_fresh, read_manifest, temp_path, write_manifest
+from app.raster_cache import read_raster
+from app.raster_catalog import catalog
+from app.tile_service import diverging_rgba
+
+# Configuration
+# Difference drawn at full color (nW)
+DIFF_VISUAL_MAX_NW = 30.0
+
+# Smaller differences are left transparent (nW)
+DIFF_MIN_VISIBLE_NW = 1.0
+
+# Color steps on each side of zero; the image is paletted to keep it small
+DIFF_LEVELS = 15
+
+# WebP copies are opt-in and need Pillow built with WebP support
+DIFF_WEBP_QUALITY = 80
+WEBP_SUPPORTED = features.check('webp')
+
+
+def diff_image_files(region: str, year1: int, year2: int) -> Optional[Dict[str, str]]:
+    """Paths of the PNG and WebP difference images of a year pair, or None"""
+    record = catalog.get_region(region)
+    if not record or not record['clean_dir']:
+        return None
+    png_path = artifact_path('diff_images', os.path.basename(record['clean_dir']), f'diff_{year1}_{year2}.png')
+    return {'png': png_path, 'webp': os.path.splitext(png_path)[0] + '.webp'}
+
+
+def diff_palette() -> np.ndarray:
+    """
+    RGB palette of the difference image: index 0 is transparent, indices
+    1..2 * DIFF_LEVELS + 1 run from full blue through white to full red
+    """
+    steps = np.arange(-DIFF_LEVELS, DIFF_LEVELS + 1, dtype=np.float32)[np.newaxis, :]
+    colors = diverging_rgba(steps, DIFF_LEVELS, visible=np.ones(steps.shape, dtype=bool))[0, :, :3]
+    return np.vstack([np.zeros((1, 3), dtype=np.uint8), colors])
+
+
+def render_diff(img1: np.ndarray, img2: np.ndarray) -> Image.Image:
+    """Paletted diverging-colormap image of (img2 - img1) on the common shape of both arrays"""
+    rows = min(img1.shape[0], img2.shape[0])
+    cols = min(img1.shape[1], img2.shape[1])
+    diff = img2[:rows, :cols] - img1[:rows, :cols]
+
+    steps = np.rint(np.clip(diff / DIFF_VISUAL_MAX_NW, -1, 1) * DIFF_LEVELS).astype(np.int16)
+    index = np.where(np.abs(diff) >= DIFF_MIN_VISIBLE_NW, steps + DIFF_LEVELS + 1, 0).astype(np.uint8)
+
+    image = Image.fromarray(index, mode='P')
+    image.putpalette(diff_palette().ravel().tolist())
+    image.info['transparency'] = 0
+    return image
+
+
+def _encode_image(image: Image.Image, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def _save_bytes(content: bytes, path: str) -> None:
+    tmp_path = temp_path(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def get_diff_image(region: str, year1: int, year2: int, image_format: str = 'png') -> Dict:
+    """
+    Get the difference image of a year pair, rendering it if it is missing or stale
+
+    Args:
+        region: Region name
+        year1: Earlier year of the comparison
+        year2: Later year of the comparison
+        image_format: 'png', or 'webp' to opt in to a WebP copy. The PNG is
+                      returned instead (with 'format' set to 'png') when WebP
+                      is unsupported or not smaller.
+
+    Returns:
+        Dictionary with 'success' and either 'path', 'format' and 'etag' (the
+        catalog fingerprint of both years and the format), or 'message'
+    """
+    paths = [catalog.get_file(region, year) for year in (year1, year2)]
+    if not all(paths):
+        missing = year1 if not paths[0] else year2
+        return {'success': False, 'message': f'No data found for year {missing}'}
+
+    files = diff_image_files(region, year1, year2)
+    fingerprint = catalog.fingerprint(region, [year1, year2])
+
+    # The manifest sits next to the PNG and records whether the WebP was kept
+    with build_lock(files['png']):
+        image = None
+        if not is_fresh(files['png'], fingerprint):
+            start = time.perf_counter()
+            img1, _ = read_raster(paths[0])
+            img2, _ = read_raster(paths[1])
+            image = render_diff(img1, img2)
+
+            os.makedirs(os.path.dirname(files['png']), exist_ok=True)
+            _save_bytes(_encode_image(image, format='PNG'), files['png'])
+            if os.path.exists(files['webp']):
+                os.remove(files['webp'])
+            write_manifest(files['png'], {
+                'region': catalog.get_region(region)['name'],
+                'year1': int(year1),
+                'year2': int(year2),
+                'fingerprint': fingerprint,
+                'size': list(image.size),
+                'visual_max_nw': DIFF_VISUAL_MAX_NW,
+                'build_seconds': round(time.perf_counter() - start, 3)
+            })
+
+        if image_format != 'webp' or not WEBP_SUPPORTED:
+            return {'success': True, 'path': files['png'], 'format': 'png', 'etag': f'{fingerprint}-png'}
+
+        manifest = read_manifest(files['png'])
+        png_bytes = os.path.getsize(files['png'])
+        if 'webp_bytes' not in manifest:
+            if image is None:
+                with Image.open(files['png']) as png:
+                    image = png.copy()
+            content = _encode_image(image.convert('RGBA'), format='WEBP', quality=DIFF_WEBP_QUALITY)
+            manifest['webp_bytes'] = len(content)
+            if len(content) < png_bytes:
+                _save_bytes(content, files['webp'])
+            write_manifest(files['png'], manifest)
+
+    if manifest['webp_bytes'] < png_bytes and os.path.exists(files['webp']):
+        return {'success': True, 'path': files['webp'], 'format': 'webp', 'etag': f'{fingerprint}-webp'}
+    return {'success': True, 'path': files['png'], 'format': 'png', 'etag': f'{fingerprint}-png'}
+
+
+def diff_image_url(region: str, year1: int, year2: int, image_format: str = 'png') -> str:
+    """URL path of the lazily rendered difference image of a year pair ('png' or 'webp')"""
+    return f'/api/compare/diff/{quote(region)}/{int(year1)}/{int(year2)}.{image_format}'
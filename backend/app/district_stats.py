@@ -0,0 +1,293 @@
+"""
+District Statistics Module
+District x year metrics for a whole region in one pass per year. A district
+boundary file (data/boundaries/<region>.geojson) is burned into an integer
+label raster aligned with the region's grid and cached under
+data/cache/district_labels. Every pixel is then binned once and np.bincount
+over (label, bin) pairs yields sum of lights, lit pixels and sector counts
+for all districts at the same time.
+
+Build the label rasters and the table ahead of time with:
+    python -m app.district_stats --region "Tamil Nadu"
+"""
+import os
+import json
+import time
+import argparse
+from functools import lru_cache
+from typing import Dict, List, Optional
+import numpy as np
+import rasterio
+from rasterio.features import rasterize
+from rasterio.warp import transform_geom
+
+from app.artifact_cache import artifact_path, build_lock, is_fresh, raster_profile, read_manifest, write_manifest, write_raster
+from app.metrics_store import map_workers
+from app.raster_cache import read_raster
+from app.raster_catalog import BASE_DATA_DIR, catalog, file_fingerprint
+from app.raster_stats import PIXEL_AREA_SQKM, SECTOR_NAMES, iter_chunks, sector_edges
+from app.result_cache import result_cache
+from app.zonal_stats import GEOJSON_CRS, grid_key
+
+# Configuration
+BASE_BOUNDARY_DIR = os.path.join(BASE_DATA_DIR, 'boundaries')
+
+# Feature properties tried in order for the district name
+DISTRICT_NAME_FIELDS = ['district', 'District', 'DISTRICT', 'dtname', 'NAME_2', 'name', 'NAME']
+
+# Metrics that districts can be ranked by
+RANK_METRICS = ['gdp_proxy_sol', 'lit_pixels', 'urban_area_sqkm', 'mean_intensity']
+
+
+def boundary_file(region: str) -> Optional[str]:
+    """District boundary GeoJSON of a region, or None if there is none"""
+    record = catalog.get_region(region)
+    if not record:
+        return None
+    for name in (record['name'], record['name'].replace(' ', '_')):
+        path = os.path.join(BASE_BOUNDARY_DIR, f'{name}.geojson')
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_districts(path: str) -> List[Dict]:
+    """
+    Districts of a boundary file in file order
+
+    Returns:
+        List of {'id' (1-based label), 'name', 'geometry'}
+    """
+    with open(path) as f:
+        geojson = json.load(f)
+
+    districts = []
+    for feature in geojson.get('features', []):
+        geometry = feature.get('geometry')
+        if not geometry or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+            continue
+        properties = feature.get('properties') or {}
+        name = next((str(properties[field]) for field in DISTRICT_NAME_FIELDS if properties.get(field)), None)
+        districts.append({
+            'id': len(districts) + 1,
+            'name': name or f'District {len(districts) + 1}',
+            'geometry': geometry
+        })
+    return districts
+
+
+# Label rasters stay in their on-disk dtype (uint16/uint32) while cached
+@lru_cache(maxsize=8)
+def _load_labels(path: str, mtime_ns: int) -> np.ndarray:
+    with rasterio.open(path) as src:
+        labels = src.read(1)
+    labels.setflags(write=False)
+    return labels
+
+
+def get_district_labels(region: str, year: int) -> Dict:
+    """
+    Label raster of the districts on the grid of one year, building it if stale
+
+    Pixels are labeled by the district containing their center (0 = none).
+
+    Returns:
+        Dictionary with 'success' and either 'labels' and 'districts'
+        ({'id', 'name', 'pixels'}) or 'message'
+    """
+    boundaries = boundary_file(region)
+    if not boundaries:
+        return {'success': False, 'message': f'No district boundaries found for region: {region}'}
+
+    entry = catalog.get_entry(region, year)
+    if not entry or not entry['clean_tif']:
+        return {'success': False, 'message': f'No data found for year {year}'}
+
+    folder = os.path.basename(catalog.get_region(region)['clean_dir'])
+    path = artifact_path('district_labels', folder, f'labels_{grid_key(entry)}.tif')
+    fingerprint = file_fingerprint([boundaries])
+
+    with build_lock(path):
+        if not is_fresh(path, fingerprint):
+            start = time.perf_counter()
+            districts = load_districts(boundaries)
+            if not districts:
+                return {'success': False, 'message': f'No district polygons in {os.path.basename(boundaries)}'}
+
+            crs = entry['crs']
+            shapes = [
+                (transform_geom(GEOJSON_CRS, crs, d['geometry']) if crs and crs != GEOJSON_CRS else d['geometry'], d['id'])
+                for d in districts
+            ]
+            dtype = 'uint16' if len(districts) < 65535 else 'uint32'
+            labels = rasterize(shapes, out_shape=entry['shape'], transform=entry['transform'], fill=0, dtype=dtype)
+
+            with rasterio.open(entry['clean_tif']) as src:
+                profile = raster_profile(src.profile, dtype=dtype, nodata=0)
+            write_raster(path, labels, profile)
+
+            pixels = np.bincount(labels.ravel(), minlength=len(districts) + 1)
+            write_manifest(path, {
+                'region': catalog.get_region(region)['name'],
+                'boundaries': os.path.basename(boundaries),
+                'fingerprint': fingerprint,
+                'districts': [
+                    {'id': d['id'], 'name': d['name'], 'pixels': int(pixels[d['id']])}
+                    for d in districts
+                ],
+                'build_seconds': round(time.perf_counter() - start, 3)
+            })
+
+    return {
+        'success': True,
+        'labels': _load_labels(path, os.stat(path).st_mtime_ns),
+        'districts': read_manifest(path)['districts']
+    }
+
+
+def district_year_metrics(labels: np.ndarray, img: np.ndarray, n_districts: int) -> Dict[str, np.ndarray]:
+    """
+    Per-district sums and counts of one year in a single pass
+
+    Args:
+        labels: District label raster (0 = outside every district)
+        img: Radiance on the same grid
+        n_districts: Highest label
+
+    Returns:
+        Dictionary of arrays indexed by label: 'sum', 'positive_sum',
+        'positive_pixels', 'lit_pixels' and one count array per sector
+    """
+    edges = sector_edges()
+    n_bins = len(edges) + 1
+    counts = np.zeros((n_districts + 1) * n_bins, dtype=np.int64)
+    sums = np.zeros((n_districts + 1) * n_bins, dtype=np.float64)
+
+    for label_chunk, img_chunk in zip(iter_chunks(labels), iter_chunks(img)):
+        values = img_chunk.ravel().astype(np.float64)
+        # Widened per chunk: label * n_bins would overflow the uint16 labels
+        keys = label_chunk.ravel().astype(np.intp) * n_bins + np.searchsorted(edges, values, side='left')
+        counts += np.bincount(keys, minlength=counts.size)
+        sums += np.bincount(keys, weights=values, minlength=sums.size)
+
+    counts = counts.reshape(n_districts + 1, n_bins)
+    sums = sums.reshape(n_districts + 1, n_bins)
+
+    # Bins: 0 = negative, 1 = zero, 2 = dim, 3.. = sectors (see raster_stats.sector_edges)
+    first_sector = 3
+    metrics = {
+        'sum': sums.sum(axis=1),
+        'positive_sum': sums[:, 2:].sum(axis=1),
+        'positive_pixels': counts[:, 2:].sum(axis=1),
+        'lit_pixels': counts[:, first_sector:].sum(axis=1)
+    }
+    for i, name in enumerate(SECTOR_NAMES):
+        metrics[name] = counts[:, first_sector + i]
+    return metrics
+
+
+def district_table(region: str, start_year: int, end_year: int) -> Dict:
+    """
+    District x year metrics for a region.
+    Results are cached until a cleaned TIF or the boundary file changes.
+
+    Args:
+        region: Region name
+        start_year: First year
+        end_year: Last year
+
+    Returns:
+        Dictionary with 'districts' ({'id', 'name', 'pixels'}), 'years' and
+        'table' (one row per district and year)
+    """
+    years = [year for year in catalog.years(region) if start_year <= year <= end_year]
+    boundaries = boundary_file(region)
+    return result_cache.cached(
+        'districts',
+        {'region': region, 'start_year': start_year, 'end_year': end_year},
+        catalog.fingerprint(region, years) + file_fingerprint([boundaries]),
+        lambda: _district_table(region, years)
+    )
+
+
+def _district_table(region: str, years: List[int]) -> Dict:
+    """Uncached district table (see district_table)"""
+    if not years:
+        return {
+            'success': False,
+            'message': f'No cleaned data found for region: {region}',
+            'data': None
+        }
+
+    try:
+        def year_rows(year: int) -> Dict:
+            labels = get_district_labels(region, year)
+            if not labels['success']:
+                return labels
+
+            img, _ = read_raster(catalog.get_file(region, year))
+            districts = labels['districts']
+            metrics = district_year_metrics(labels['labels'], img, len(districts))
+
+            rows = []
+            for district in districts:
+                i = district['id']
+                positive = int(metrics['positive_pixels'][i])
+                lit = int(metrics['lit_pixels'][i])
+                rows.append({
+                    'district': district['name'],
+                    'district_id': i,
+                    'year': int(year),
+                    'gdp_proxy_sol': float(round(float(metrics['sum'][i]), 2)),
+                    'urban_area_sqkm': float(round(lit * PIXEL_AREA_SQKM, 2)),
+                    'mean_intensity': float(round(float(metrics['positive_sum'][i]) / positive, 2)) if positive else 0.0,
+                    'lit_pixels': lit,
+                    'sector_breakdown': {name: int(metrics[name][i]) for name in SECTOR_NAMES}
+                })
+            return {'success': True, 'districts': districts, 'rows': rows}
+
+        # One labeled pass per year, years spread over the metrics worker pool
+        per_year = map_workers(year_rows, years)
+        for result in per_year:
+            if not result['success']:
+                return result
+
+        return {
+            'success': True,
+            'region': catalog.get_region(region)['name'],
+            'years': [int(year) for year in years],
+            'districts': per_year[-1]['districts'],
+            'table': [row for result in per_year for row in result['rows']]
+        }
+
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Error during district analysis: {str(e)}',
+            'data': None
+        }
+
+
+def rank_districts(table: Dict, metric: str, year: int) -> List[Dict]:
+    """Districts sorted by a metric in one year, highest first"""
+    rows = [row for row in table['table'] if row['year'] == year]
+    rows.sort(key=lambda row: row[metric], reverse=True)
+    return [
+        {'rank': i + 1, 'district': row['district'], 'district_id': row['district_id'], 'value': row[metric]}
+        for i, row in enumerate(rows)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build district label rasters and the district x year table')
+    parser.add_argument('--region', required=True, help='Region name, e.g. "Tamil Nadu"')
+    args = parser.parse_args()
+
+    print(f"\n🚀 Building district metrics for {args.region}...\n")
+    start = time.perf_counter()
+    result = district_table(args.region, 0, 9999)
+    if not result['success']:
+        print(f"❌ Error: {result['message']}")
+    else:
+        print(f"✅ Done in {time.perf_counter() - start:.1f}s! "
+              f"{len(result['districts'])} districts x {len(result['years'])} years")
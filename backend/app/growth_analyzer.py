@@ -1,18 +1,27 @@
+"""
+Economic Growth Report Script
+Writes the growth report of a region (yearly timeline, insights and growth
+hotspots) to data/growth_analysis/<cleaned folder>_growth/growth_analysis_final.json.
+Regions and years come from the raster catalog.
+
+Run from the backend directory:
+    python -m app.growth_analyzer --region "Tamil Nadu"
+    python -m app.growth_analyzer --region "Tamil Nadu" --grid-size 40 --top-k 20
+"""
 import os
+import json
+import argparse
 import numpy as np
 import rasterio
-from rasterio.windows import from_bounds
-import json
-from datetime import datetime
-import re
+
+from app.hotspots import DEFAULT_GRID_SIZE, DEFAULT_TOP_K, analyze_hotspots
+from app.raster_catalog import catalog
 
 # ================================
 # CONFIG
 # ================================
-# UPDATED PATH as requested
-CLEAN_DIR = "/home/nakshtra/Desktop/whackiest/Quatsch/backend/data/cleaned/NightLights_Bright_Tamil Nadu_cleaned"
-OUTPUT_DIR = "/home/nakshtra/Desktop/whackiest/Quatsch/backend/data/growth_analysis"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+DEFAULT_REGION = "Tamil Nadu"
+BASE_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'growth_analysis')
 
 # Bins for Sector Analysis (NanoWatts)
 SECTOR_BINS = [0, 5, 15, 60, 500] 
@@ -32,78 +41,27 @@ class NpEncoder(json.JSONEncoder):
             return obj.tolist()
         return super(NpEncoder, self).default(obj)
 
-def get_lat_lon_center(r, c, transform):
-    """Converts Row/Col to Latitude/Longitude"""
-    lon, lat = rasterio.transform.xy(transform, r, c)
-    return float(lat), float(lon)
-
-def analyze_hotspots(img_start, img_end, transform, grid_size=20):
-    """Finds top 10 fastest growing grid cells with Coordinates"""
-    rows, cols = img_start.shape
-    cell_h, cell_w = rows // grid_size, cols // grid_size
-    
-    hotspots = []
-    
-    for i in range(grid_size):
-        for j in range(grid_size):
-            r_start, r_end = i*cell_h, (i+1)*cell_h
-            c_start, c_end = j*cell_w, (j+1)*cell_w
-            
-            # Extract cells
-            start_val = np.sum(img_start[r_start:r_end, c_start:c_end])
-            end_val = np.sum(img_end[r_start:r_end, c_start:c_end])
-            
-            # Avoid division by zero and empty ocean tiles
-            if start_val < 100: continue
-            
-            growth_pct = ((end_val - start_val) / start_val) * 100
-            
-            # Get Coordinates of the center of this grid cell
-            center_r = r_start + (cell_h // 2)
-            center_c = c_start + (cell_w // 2)
-            lat, lon = get_lat_lon_center(center_r, center_c, transform)
-            
-            # Classify the type based on intensity
-            avg_intensity = np.mean(img_end[r_start:r_end, c_start:c_end])
-            zone_type = "Industrial" if avg_intensity > 40 else "Urban"
-
-            hotspots.append({
-                "lat": lat,
-                "lon": lon,
-                "growth_pct": round(growth_pct, 1),
-                "intensity": round(avg_intensity, 1),
-                "type": zone_type
-            })
-
-    # Return Top 10 sorted by growth
-    return sorted(hotspots, key=lambda x: x['growth_pct'], reverse=True)[:10]
-
 # ================================
 # MAIN
 # ================================
-def generate_full_report():
-    print("🚀 Generating Economic Intelligence Report...")
-    
-    # 1. FIND FILES
-    year_pattern = re.compile(r"(\d{4})")
-    
-    if not os.path.exists(CLEAN_DIR):
-        print(f"❌ Error: Directory not found: {CLEAN_DIR}")
-        return
+def growth_report_path(region):
+    """Path of the growth report of a region, or None if the region is unknown"""
+    record = catalog.get_region(region)
+    if not record or not record['clean_dir']:
+        return None
+    folder = f"{os.path.basename(record['clean_dir'])}_growth"
+    return os.path.join(BASE_OUTPUT_DIR, folder, "growth_analysis_final.json")
+
 
-    all_files = [f for f in os.listdir(CLEAN_DIR) if f.endswith(".tif")]
-    year_map = {}
+def generate_full_report(region=DEFAULT_REGION, grid_size=DEFAULT_GRID_SIZE, k=DEFAULT_TOP_K):
+    print(f"🚀 Generating Economic Intelligence Report for {region}...")
     
-    for f in all_files:
-        match = year_pattern.search(f)
-        if match:
-            year = int(match.group(1))
-            year_map[year] = os.path.join(CLEAN_DIR, f)
-            
-    years = sorted(year_map.keys())
-    if len(years) < 2: 
-        print(f"❌ Not enough data found in {CLEAN_DIR}. Found years: {years}")
+    # 1. FIND FILES
+    years = catalog.years(region)
+    if len(years) < 2:
+        print(f"❌ Not enough cleaned data found for {region}. Found years: {years}")
         return
+    year_map = {year: catalog.get_file(region, year) for year in years}
 
     timeline = []
     
@@ -145,7 +103,7 @@ def generate_full_report():
     with rasterio.open(year_map[years[0]]) as src_start, rasterio.open(year_map[years[-1]]) as src_end:
         img_start = src_start.read(1)
         img_end = src_end.read(1)
-        hotspots = analyze_hotspots(img_start, img_end, src_start.transform)
+        hotspots = analyze_hotspots(img_start, img_end, src_start.transform, grid_size, k)
 
     # 5. FINAL JSON ASSEMBLY
     # Calculate % changes safely
@@ -161,7 +119,7 @@ def generate_full_report():
 
     final_output = {
         "metadata": {
-            "region": "Tamil Nadu",
+            "region": catalog.get_region(region)['name'],
             "range": f"{years[0]}-{years[-1]}"
         },
         "insights": {
@@ -175,7 +133,8 @@ def generate_full_report():
     }
 
     # Save with Custom Encoder
-    out_path = os.path.join(OUTPUT_DIR, "growth_analysis_final.json")
+    out_path = growth_report_path(region)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
     with open(out_path, "w") as f:
         # cls=NpEncoder fixes the float32 error
         json.dump(final_output, f, indent=2, cls=NpEncoder)
@@ -183,4 +142,10 @@ def generate_full_report():
     print(f"✅ Success! Report saved to: {out_path}")
 
 if __name__ == "__main__":
-    generate_full_report()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Write the economic growth report of a region')
+    parser.add_argument('--region', default=DEFAULT_REGION, help='Region name, e.g. "Tamil Nadu"')
+    parser.add_argument('--grid-size', type=int, default=DEFAULT_GRID_SIZE, help='Hotspot grid cells per side')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='Number of hotspots reported')
+    args = parser.parse_args()
+    
+    generate_full_report(args.region, args.grid_size, args.top_k)
@@ -0,0 +1,141 @@
+"""
+Hotspot Analysis Module
+Finds the fastest growing grid cells between two years. Both rasters are
+reduced to per-cell sums in one vectorized block reduction, all cell centers
+are converted to coordinates in one batch and the top cells are picked with
+argpartition, so fine grids cost about the same as coarse ones. When the
+summed-area tables of both years are cached, cell sums are four lookups each.
+Shared by the growth analysis service and the growth_analyzer.py script.
+"""
+import numpy as np
+import rasterio
+from typing import Dict, List
+
+from app.integral_images import grid_sums
+
+# Configuration
+DEFAULT_GRID_SIZE = 20
+DEFAULT_TOP_K = 10
+MAX_GRID_SIZE = 500
+
+# Cells with less light than this in the start year are skipped (empty ocean tiles)
+MIN_START_SUM = 100
+
+# Mean end-year intensity (nW) above which a cell is classed as Industrial
+INDUSTRIAL_INTENSITY = 40
+
+
+def grid_edges(length: int, cells: int) -> np.ndarray:
+    """
+    Start offsets of near-equal cells covering an axis, plus the end
+
+    Cell sizes differ by at most one pixel, so no remainder rows or columns
+    are dropped when the axis is not divisible by the number of cells.
+    """
+    return (np.arange(cells + 1) * length) // cells
+
+
+def block_sums(img: np.ndarray, row_edges: np.ndarray, col_edges: np.ndarray) -> np.ndarray:
+    """Per-cell sums (float64) of a raster over the grid given by its edges"""
+    # Columns first: that pass runs along contiguous rows and shrinks the array the most
+    col_sums = np.add.reduceat(img, col_edges[:-1], axis=1, dtype=np.float64)
+    return np.add.reduceat(col_sums, row_edges[:-1], axis=0)
+
+
+def analyze_hotspots(img_start: np.ndarray, img_end: np.ndarray, transform,
+                     grid_size: int = DEFAULT_GRID_SIZE, k: int = DEFAULT_TOP_K) -> List[Dict]:
+    """
+    Finds the top k fastest growing grid cells with coordinates
+
+    Args:
+        img_start: Start year radiance
+        img_end: End year radiance (same grid as img_start)
+        transform: Affine transform of the rasters
+        grid_size: Number of cells along each axis (clamped to the raster size)
+        k: Number of hotspots to return
+
+    Returns:
+        List of up to k hotspot dictionaries (lat, lon, growth_pct, intensity,
+        type), sorted by growth_pct descending
+    """
+    rows = min(img_start.shape[0], img_end.shape[0])
+    cols = min(img_start.shape[1], img_end.shape[1])
+    row_edges, col_edges = hotspot_grid(rows, cols, grid_size)
+
+    start_sums = block_sums(img_start[:rows, :cols], row_edges, col_edges)
+    end_sums = block_sums(img_end[:rows, :cols], row_edges, col_edges)
+    return rank_cells(start_sums, end_sums, row_edges, col_edges, transform, k)
+
+
+def analyze_hotspots_integral(start_table: np.ndarray, end_table: np.ndarray, transform,
+                              grid_size: int = DEFAULT_GRID_SIZE, k: int = DEFAULT_TOP_K) -> List[Dict]:
+    """
+    analyze_hotspots from the summed-area tables of both years
+    (see integral_images.build_integral_images): four lookups per cell
+    """
+    rows = min(start_table.shape[0], end_table.shape[0]) - 1
+    cols = min(start_table.shape[1], end_table.shape[1]) - 1
+    row_edges, col_edges = hotspot_grid(rows, cols, grid_size)
+
+    start_sums = grid_sums(start_table, row_edges, col_edges)
+    end_sums = grid_sums(end_table, row_edges, col_edges)
+    return rank_cells(start_sums, end_sums, row_edges, col_edges, transform, k)
+
+
+def hotspot_grid(rows: int, cols: int, grid_size: int):
+    """Row and column edges of the hotspot grid (every cell holds at least one pixel)"""
+    return (
+        grid_edges(rows, max(1, min(grid_size, rows))),
+        grid_edges(cols, max(1, min(grid_size, cols)))
+    )
+
+
+def rank_cells(start_sums: np.ndarray, end_sums: np.ndarray, row_edges: np.ndarray,
+               col_edges: np.ndarray, transform, k: int) -> List[Dict]:
+    """
+    Top k cells by growth from per-cell sums of the start and end years
+
+    Returns:
+        Hotspot dictionaries as returned by analyze_hotspots
+    """
+    start_sums = start_sums.ravel()
+    end_sums = end_sums.ravel()
+    cell_rows, cell_cols = np.diff(row_edges), np.diff(col_edges)
+    pixel_counts = (cell_rows[:, None] * cell_cols[None, :]).ravel()
+
+    # Avoid division by zero and empty ocean tiles
+    valid = np.flatnonzero(start_sums >= MIN_START_SUM)
+    if valid.size == 0 or k <= 0:
+        return []
+
+    growth = (end_sums[valid] - start_sums[valid]) / start_sums[valid] * 100
+    if valid.size > k:
+        top = np.argpartition(-growth, k - 1)[:k]
+    else:
+        top = np.arange(valid.size)
+
+    # Rank by rounded growth, ties in grid order
+    rounded_growth = np.round(growth[top], 1)
+    order = np.lexsort((valid[top], -rounded_growth))
+    cells = valid[top][order]
+    rounded_growth = rounded_growth[order]
+
+    # Cell centers, converted to coordinates in one batch
+    n_cols = len(col_edges) - 1
+    cell_i, cell_j = cells // n_cols, cells % n_cols
+    center_r = row_edges[cell_i] + cell_rows[cell_i] // 2
+    center_c = col_edges[cell_j] + cell_cols[cell_j] // 2
+    lons, lats = rasterio.transform.xy(transform, center_r, center_c)
+
+    intensities = end_sums[cells] / pixel_counts[cells]
+
+    return [
+        {
+            "lat": float(round(float(lats[i]), 6)),
+            "lon": float(round(float(lons[i]), 6)),
+            "growth_pct": float(rounded_growth[i]),
+            "intensity": float(round(float(intensities[i]), 1)),
+            "type": "Industrial" if intensities[i] > INDUSTRIAL_INTENSITY else "Urban"
+        }
+        for i in range(len(cells))
+    ]
@@ -0,0 +1,204 @@
+"""
+Integral Images Module
+Summed-area tables of the cleaned TIFs, cached under data/cache/integrals.
+Every year carries a float64 table of radiance and an int32 table of lit
+pixels (> SECTOR_BINS[0]), each padded with a leading row and column of
+zeros. The sum over any pixel rectangle is then four lookups, so bounding
+box timelines and hotspot grids cost the same whatever their size.
+"""
+import os
+import math
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from rasterio.windows import from_bounds
+
+from app.artifact_cache import artifact_path, build_lock, is_fresh, temp_path, write_manifest
+from app.raster_cache import read_raster
+from app.raster_catalog import catalog
+from app.raster_stats import PIXEL_AREA_SQKM, SECTOR_BINS
+
+
+def build_integral_images(img: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Zero-padded summed-area tables of radiance and of lit pixels
+
+    table[r, c] is the total over img[:r, :c], so a rectangle
+    img[r0:r1, c0:c1] sums to table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0].
+
+    Returns:
+        Tuple of (float64 radiance table, int32 lit-pixel table), both of shape
+        (rows + 1, cols + 1)
+    """
+    rows, cols = img.shape
+    sum_table = np.zeros((rows + 1, cols + 1), dtype=np.float64)
+    np.cumsum(img, axis=0, dtype=np.float64, out=sum_table[1:, 1:])
+    np.cumsum(sum_table[1:, 1:], axis=1, out=sum_table[1:, 1:])
+
+    lit_table = np.zeros((rows + 1, cols + 1), dtype=np.int32)
+    np.cumsum(img > SECTOR_BINS[0], axis=0, dtype=np.int32, out=lit_table[1:, 1:])
+    np.cumsum(lit_table[1:, 1:], axis=1, out=lit_table[1:, 1:])
+    return sum_table, lit_table
+
+
+def rect_sums(table: np.ndarray, r0, r1, c0, c1):
+    """
+    Sums over img[r0:r1, c0:c1] from a summed-area table
+
+    Bounds may be integers or broadcastable integer arrays.
+    """
+    return table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0]
+
+
+def grid_sums(table: np.ndarray, row_edges: np.ndarray, col_edges: np.ndarray) -> np.ndarray:
+    """Per-cell sums over the grid given by its row and column edges"""
+    corners = table[np.ix_(row_edges, col_edges)]
+    return corners[1:, 1:] - corners[:-1, 1:] - corners[1:, :-1] + corners[:-1, :-1]
+
+
+def integral_files(region: str, year: int) -> Optional[Tuple[str, str]]:
+    """Paths of the radiance and lit-pixel tables (data/cache/integrals/<region folder>/...)"""
+    record = catalog.get_region(region)
+    if not record or not record['clean_dir']:
+        return None
+    folder = os.path.basename(record['clean_dir'])
+    return (
+        artifact_path('integrals', folder, f'sum_{year}.npy'),
+        artifact_path('integrals', folder, f'lit_{year}.npy')
+    )
+
+
+@lru_cache(maxsize=128)
+def _load_table(path: str, mtime_ns: int) -> np.ndarray:
+    # Memory-mapped: a rectangle query only touches four values
+    return np.load(path, mmap_mode='r')
+
+
+def _save_table(path: str, table: np.ndarray) -> None:
+    tmp_path = temp_path(path, '.tmp.npy')
+    np.save(tmp_path, table)
+    os.replace(tmp_path, path)
+
+
+def get_integral_images(region: str, year: int) -> Dict:
+    """
+    Get the summed-area tables of a year, building them if they are stale
+
+    Returns:
+        Dictionary with 'success' and either 'sum', 'lit' (read-only
+        memory-mapped tables), 'transform' and 'shape' or 'message'
+    """
+    source = catalog.get_file(region, year)
+    if not source:
+        return {'success': False, 'message': f'No data found for year {year}'}
+
+    sum_path, lit_path = integral_files(region, year)
+    fingerprint = catalog.fingerprint(region, [year])
+
+    # The manifest sits next to the radiance table and covers both files
+    with build_lock(sum_path):
+        if not (is_fresh(sum_path, fingerprint) and os.path.exists(lit_path)):
+            start = time.perf_counter()
+            img, _ = read_raster(source)
+            sum_table, lit_table = build_integral_images(img)
+
+            os.makedirs(os.path.dirname(sum_path), exist_ok=True)
+            _save_table(sum_path, sum_table)
+            _save_table(lit_path, lit_table)
+            write_manifest(sum_path, {
+                'region': catalog.get_region(region)['name'],
+                'year': int(year),
+                'fingerprint': fingerprint,
+                'shape': list(img.shape),
+                'build_seconds': round(time.perf_counter() - start, 3)
+            })
+
+    sum_table = _load_table(sum_path, os.stat(sum_path).st_mtime_ns)
+    lit_table = _load_table(lit_path, os.stat(lit_path).st_mtime_ns)
+    return {
+        'success': True,
+        'sum': sum_table,
+        'lit': lit_table,
+        'transform': catalog.get_entry(region, year)['transform'],
+        'shape': (sum_table.shape[0] - 1, sum_table.shape[1] - 1)
+    }
+
+
+def bbox_window(transform, shape: Tuple[int, int], bbox: List[float]) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Pixel rectangle (row_start, row_end, col_start, col_end) of every pixel
+    touching a (min_lon, min_lat, max_lon, max_lat) box, clipped to the raster
+
+    Returns:
+        The rectangle, or None if the box does not overlap the raster
+    """
+    window = from_bounds(bbox[0], bbox[1], bbox[2], bbox[3], transform)
+    r0 = max(0, math.floor(window.row_off))
+    c0 = max(0, math.floor(window.col_off))
+    r1 = min(shape[0], math.ceil(window.row_off + window.height))
+    c1 = min(shape[1], math.ceil(window.col_off + window.width))
+    if r0 >= r1 or c0 >= c1:
+        return None
+    return r0, r1, c0, c1
+
+
+def bbox_timeline(region: str, bbox: List[float], start_year: int, end_year: int) -> Dict:
+    """
+    Sum of lights and lit area inside a bounding box for every year in a range
+
+    Args:
+        region: Region name
+        bbox: [min_lon, min_lat, max_lon, max_lat]
+        start_year: First year of the range
+        end_year: Last year of the range
+
+    Returns:
+        Dictionary with the pixel window and a timeline of
+        {year, gdp_proxy_sol, lit_pixels, urban_area_sqkm}
+    """
+    years = [year for year in catalog.years(region) if start_year <= year <= end_year]
+    if not years:
+        return {
+            'success': False,
+            'message': f'No cleaned data found for region {region} in {start_year}-{end_year}'
+        }
+
+    timeline = []
+    window = None
+    for year in years:
+        tables = get_integral_images(region, year)
+        if not tables['success']:
+            return tables
+
+        year_window = bbox_window(tables['transform'], tables['shape'], bbox)
+        if year_window is None:
+            return {
+                'success': False,
+                'message': 'The bounding box does not overlap the region'
+            }
+        window = window or year_window
+
+        sol = rect_sums(tables['sum'], *year_window)
+        lit_pixels = int(rect_sums(tables['lit'], *year_window))
+        timeline.append({
+            'year': int(year),
+            'gdp_proxy_sol': float(round(float(sol), 2)),
+            'lit_pixels': lit_pixels,
+            'urban_area_sqkm': float(round(lit_pixels * PIXEL_AREA_SQKM, 2))
+        })
+
+    r0, r1, c0, c1 = window
+    return {
+        'success': True,
+        'region': catalog.get_region(region)['name'],
+        'bbox': [float(v) for v in bbox],
+        'window': {
+            'row_start': r0,
+            'row_end': r1,
+            'col_start': c0,
+            'col_end': c1,
+            'pixels': (r1 - r0) * (c1 - c0)
+        },
+        'timeline': timeline
+    }
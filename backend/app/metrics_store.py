@@ -0,0 +1,226 @@
+"""
+Metrics Store Module
+Per-region yearly metrics table (SQLite). One row per (region, year) holds the
+fused raster statistics of the cleaned TIF together with the fingerprint of
+the file they were computed from. The growth and comparison services build
+their timelines from this table instead of reducing every TIF on every call.
+
+Rows are written at ingest time and refreshed lazily when a file changes:
+    python -m app.metrics_store --region "Tamil Nadu"
+"""
+import os
+import time
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.raster_cache import read_raster
+from app.raster_catalog import catalog
+from app.raster_stats import SECTOR_NAMES, compute_raster_stats, year_metrics
+
+# Configuration
+BASE_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'cache')
+METRICS_DB = os.path.join(BASE_CACHE_DIR, 'metrics.sqlite')
+
+# Threads used to reduce stale years. Sequential by default; raise it only after
+# measuring a speedup on the host (python -m app.benchmark_extractor --metrics-region ...)
+METRICS_WORKERS = int(os.environ.get('METRICS_WORKERS', 1))
+
+# Statistics columns, in compute_raster_stats order (sector counts follow)
+STAT_COLUMNS = [
+    ('total_pixels', 'INTEGER'),
+    ('sum', 'REAL'),
+    ('min', 'REAL'),
+    ('max', 'REAL'),
+    ('mean_all', 'REAL'),
+    ('std_dev', 'REAL'),
+    ('dark_pixels', 'INTEGER'),
+    ('positive_pixels', 'INTEGER'),
+    ('mean_lit', 'REAL'),
+    ('lit_pixels', 'INTEGER')
+]
+
+
+def map_workers(func: Callable, items: List, workers: int = METRICS_WORKERS) -> List:
+    """
+    Apply func to every item on a bounded thread pool
+
+    Results are returned in item order; the first exception raised by func
+    is re-raised in the caller.
+    """
+    if len(items) <= 1 or workers <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        return list(pool.map(func, items))
+
+
+def _file_stats(path: str) -> Dict:
+    """compute_raster_stats of a cleaned TIF plus its 'shape'"""
+    img, _ = read_raster(path)
+    stats = compute_raster_stats(img)
+    stats['shape'] = img.shape
+    return stats
+
+
+class MetricsStore:
+    """
+    SQLite table of per-year raster statistics, keyed by (region, year)
+
+    A row is current while its fingerprint matches the cleaned TIF on disk;
+    stale or missing rows are recomputed (one raster pass each, spread over
+    METRICS_WORKERS threads) and replaced.
+    """
+
+    def __init__(self, db_path: str = METRICS_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db_ready = False
+        self.hits = 0
+        self.builds = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection (one per call, so threads never share one)"""
+        if not self._db_ready:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._db_ready:
+            columns = ', '.join(f'"{name}" {kind} NOT NULL' for name, kind in STAT_COLUMNS)
+            sectors = ', '.join(f'"sector_{name}" INTEGER NOT NULL' for name in SECTOR_NAMES)
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS year_metrics ('
+                'region TEXT NOT NULL, year INTEGER NOT NULL, fingerprint TEXT NOT NULL, '
+                'height INTEGER NOT NULL, width INTEGER NOT NULL, updated REAL NOT NULL, '
+                f'{columns}, {sectors}, PRIMARY KEY (region, year))'
+            )
+            conn.commit()
+            self._db_ready = True
+        return conn
+
+    @staticmethod
+    def _row_stats(row: sqlite3.Row) -> Dict:
+        """compute_raster_stats-style dictionary from a table row"""
+        stats = {name: row[name] for name, _ in STAT_COLUMNS}
+        stats['sectors'] = {name: row[f'sector_{name}'] for name in SECTOR_NAMES}
+        return stats
+
+    def _read_rows(self, region: str, years: Iterable[int]) -> Dict[int, sqlite3.Row]:
+        years = list(years)
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.row_factory = sqlite3.Row
+                rows = conn.execute(
+                    f'SELECT * FROM year_metrics WHERE region = ? AND year IN ({",".join("?" * len(years))})',
+                    [region] + years
+                ).fetchall()
+        except sqlite3.Error:
+            rows = []
+        return {row['year']: row for row in rows}
+
+    def _write_row(self, region: str, year: int, fingerprint: str, shape, stats: Dict) -> None:
+        names = ['region', 'year', 'fingerprint', 'height', 'width', 'updated']
+        values = [region, int(year), fingerprint, int(shape[0]), int(shape[1]), time.time()]
+        names += [name for name, _ in STAT_COLUMNS]
+        values += [stats[name] for name, _ in STAT_COLUMNS]
+        names += [f'sector_{name}' for name in SECTOR_NAMES]
+        values += [stats['sectors'][name] for name in SECTOR_NAMES]
+        columns = ', '.join('"%s"' % name for name in names)
+        placeholders = ', '.join('?' * len(values))
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(f'INSERT OR REPLACE INTO year_metrics ({columns}) VALUES ({placeholders})', values)
+        except sqlite3.Error:
+            # Statistics are still returned if the disk is read-only or locked
+            pass
+
+    def get_stats(self, region: str, years: Iterable[int]) -> Dict[int, Dict]:
+        """
+        Raster statistics of the cleaned TIFs of a region, building stale rows
+
+        Args:
+            region: Region name
+            years: Years to look up (years without a cleaned TIF are skipped)
+
+        Returns:
+            Year -> compute_raster_stats-style dictionary plus 'shape'
+        """
+        record = catalog.get_region(region)
+        if not record:
+            return {}
+        name = record['name']
+        years = [year for year in years if year in record['years'] and record['years'][year]['clean_tif']]
+        if not years:
+            return {}
+
+        rows = self._read_rows(name, years)
+        result = {}
+        stale = {}
+        for year in years:
+            fingerprint = catalog.fingerprint(name, [year])
+            row = rows.get(year)
+            if row is not None and row['fingerprint'] == fingerprint:
+                stats = self._row_stats(row)
+                stats['shape'] = (row['height'], row['width'])
+                result[year] = stats
+            else:
+                stale[year] = fingerprint
+
+        # Stale years are reduced in parallel (decode and reductions release the GIL)
+        paths = [record['years'][year]['clean_tif'] for year in stale]
+        for year, stats in zip(stale, map_workers(_file_stats, paths)):
+            self._write_row(name, year, stale[year], stats['shape'], stats)
+            result[year] = stats
+
+        with self._lock:
+            self.hits += len(years) - len(stale)
+            self.builds += len(stale)
+        return {year: result[year] for year in years}
+
+    def timeline(self, region: str, years: Iterable[int]) -> List[Dict]:
+        """Per-year metrics blocks (see raster_stats.year_metrics) in year order"""
+        stats = self.get_stats(region, years)
+        return [year_metrics(year, stats[year]) for year in sorted(stats)]
+
+    def ingest(self, region: Optional[str] = None) -> Dict[str, int]:
+        """
+        Bring the rows of one region (default: every region) up to date
+
+        Returns:
+            Region name -> number of years in the table
+        """
+        catalog.refresh(force=True)
+        names = [catalog.get_region(region)['name']] if region else [r['name'] for r in catalog.regions()]
+        return {name: len(self.get_stats(name, catalog.years(name))) for name in names}
+
+    def stats(self) -> Dict:
+        """Row count and lookup counters"""
+        try:
+            with closing(self._connect()) as conn, conn:
+                rows = conn.execute('SELECT COUNT(*) FROM year_metrics').fetchone()[0]
+        except sqlite3.Error:
+            rows = None
+
+        with self._lock:
+            return {'rows': rows, 'hits': self.hits, 'builds': self.builds}
+
+
+# Process-wide metrics table shared by the analysis services
+metrics_store = MetricsStore()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the per-region yearly metrics table')
+    parser.add_argument('--region', help='Region name, e.g. "Tamil Nadu" (default: all regions)')
+    args = parser.parse_args()
+
+    if args.region and not catalog.get_region(args.region):
+        parser.error(f'Unknown region: {args.region}')
+
+    print(f"\n🚀 Building yearly metrics...\n")
+    start = time.perf_counter()
+    counts = metrics_store.ingest(args.region)
+    for name, count in counts.items():
+        print(f"  -> {name}: {count} years")
+    print(f"\n✅ Done in {time.perf_counter() - start:.1f}s! Table: {METRICS_DB}")
@@ -0,0 +1,126 @@
+"""
+Pixel Series Module
+Radiance history of map points. The lon/lat -> pixel math of every year's
+grid is cached per set of files; values come from one strided read of the
+region's year cube when it is current (see year_cube), otherwise from a
+single-pixel window read per TIF (or the cached full rasters for batches).
+"""
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from app.raster_cache import read_raster
+from app.raster_catalog import catalog
+from app.year_cube import get_cube
+
+# Configuration
+# Batches larger than this read whole (cached) rasters instead of single-pixel windows
+PIXEL_WINDOW_MAX_POINTS = 8
+
+# Largest number of points accepted in one batch
+PIXEL_BATCH_MAX_POINTS = 1000
+
+
+@lru_cache(maxsize=64)
+def _year_layout(region: str, kind: str, fingerprint: str) -> Tuple:
+    """
+    Per-year (year, path, inverse transform, shape) of a region's files
+
+    Keyed by the files' fingerprint, so it is rebuilt when a file changes.
+    """
+    layout = []
+    for year in catalog.years(region, kind):
+        entry = catalog.get_entry(region, year)
+        info = entry['clean' if kind == 'clean_tif' else 'raw']
+        if info is None:
+            continue
+        layout.append((year, entry[kind], ~info['transform'], info['shape']))
+    return tuple(layout)
+
+
+def year_layout(region: str, kind: str = 'clean_tif') -> Tuple:
+    """Cached per-year grid layout of a region (see _year_layout)"""
+    return _year_layout(region, kind, catalog.fingerprint(region, catalog.years(region, kind), kind))
+
+
+def pixel_offsets(inverse_transform, shape: Tuple[int, int], lons: np.ndarray,
+                  lats: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Row and column of every point on a grid
+
+    Returns:
+        Tuple of (rows, cols, inside mask); rows and cols are clipped to the
+        grid where the point falls outside it
+    """
+    cols, rows = inverse_transform * (lons, lats)
+    rows = np.floor(rows).astype(np.int64)
+    cols = np.floor(cols).astype(np.int64)
+    inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+    return np.clip(rows, 0, shape[0] - 1), np.clip(cols, 0, shape[1] - 1), inside
+
+
+def pixel_series(region: str, points: List[Tuple[float, float]], kind: str = 'clean_tif') -> Dict:
+    """
+    Value of every available year at each point
+
+    Args:
+        region: Region name
+        points: List of (lat, lon)
+        kind: 'clean_tif' (default) or 'raw_tif'
+
+    Returns:
+        Dictionary with 'years' and 'points': one {'lat', 'lon', 'row', 'col',
+        'series': [{'year', 'value'}]} per point; value is None where the point
+        falls outside that year's grid
+    """
+    layout = year_layout(region, kind)
+    if not layout:
+        return {'success': False, 'message': f'No data found for region: {region}'}
+
+    lats = np.array([p[0] for p in points], dtype=np.float64)
+    lons = np.array([p[1] for p in points], dtype=np.float64)
+    years = [year for year, _, _, _ in layout]
+    values = np.full((len(years), len(points)), np.nan, dtype=np.float64)
+    offsets = [pixel_offsets(inverse, shape, lons, lats) for _, _, inverse, shape in layout]
+
+    cube = get_cube(region) if kind == 'clean_tif' else None
+    if cube is not None and cube.years == years and all(shape == cube.shape[1:] for _, _, _, shape in layout):
+        # One strided read over the years per point
+        rows, cols, inside = offsets[0]
+        values[:, inside] = cube.data[:, rows[inside], cols[inside]]
+    elif len(points) <= PIXEL_WINDOW_MAX_POINTS:
+        for i, (year, path, _, _) in enumerate(layout):
+            rows, cols, inside = offsets[i]
+            with rasterio.open(path) as src:
+                for j in np.flatnonzero(inside):
+                    values[i, j] = src.read(1, window=Window(int(cols[j]), int(rows[j]), 1, 1))[0, 0]
+    else:
+        for i, (year, path, _, _) in enumerate(layout):
+            rows, cols, inside = offsets[i]
+            img, _ = read_raster(path)
+            values[i, inside] = img[rows[inside], cols[inside]]
+
+    rows, cols, inside = offsets[-1]
+    return {
+        'success': True,
+        'region': catalog.get_region(region)['name'],
+        'years': [int(year) for year in years],
+        'points': [
+            {
+                'lat': float(lats[j]),
+                'lon': float(lons[j]),
+                'row': int(rows[j]) if inside[j] else None,
+                'col': int(cols[j]) if inside[j] else None,
+                'series': [
+                    {
+                        'year': int(year),
+                        'value': None if np.isnan(values[i, j]) else float(round(float(values[i, j]), 2))
+                    }
+                    for i, year in enumerate(years)
+                ]
+            }
+            for j in range(len(points))
+        ]
+    }
@@ -0,0 +1,143 @@
+"""
+Raster Cache Module
+Process-wide LRU cache of decoded raster bands shared by all services.
+Entries are keyed by (path, mtime, band, window, decimation) and evicted
+least recently used first once the byte budget is exceeded. Cleaned TIFs
+with a current year cube (see year_cube) are served from the cube instead.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import numpy as np
+import rasterio
+from rasterio.transform import Affine
+
+from app.raster_io import read_decimated
+from app.year_cube import cube_view
+
+# Configuration
+# Memory budget for decoded rasters (bytes)
+RASTER_CACHE_MAX_BYTES = int(os.environ.get('RASTER_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+def _window_key(window) -> Optional[Tuple[int, int, int, int]]:
+    """Hashable form of a rasterio Window"""
+    if window is None:
+        return None
+    return (int(window.col_off), int(window.row_off), int(window.width), int(window.height))
+
+
+class RasterCache:
+    """
+    Memory-budgeted LRU cache of float32 raster reads
+
+    Cached arrays are marked read-only because they are shared between
+    requests; callers that need to modify one must copy it first.
+    """
+
+    def __init__(self, max_bytes: int = RASTER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.cube_hits = 0
+
+    def read(self, path: str, band: int = 1, window=None, factor: int = 1,
+             resampling: str = 'nearest') -> Tuple[np.ndarray, Affine]:
+        """
+        Read a band through the cache
+
+        Args:
+            path: Path to the TIF file
+            band: Band index to read (default: 1)
+            window: Optional rasterio Window
+            factor: Decimation factor (1 = full resolution)
+            resampling: 'nearest' or 'average' (only used when factor > 1)
+
+        Returns:
+            Tuple of (read-only float32 array, affine transform of the array)
+        """
+        factor = max(int(factor), 1)
+
+        # Full-resolution reads of a cleaned TIF are zero-copy views of its year cube
+        if factor == 1 and band == 1:
+            view = cube_view(path, window)
+            if view is not None:
+                with self._lock:
+                    self.cube_hits += 1
+                return view
+
+        stat = os.stat(path)
+        key = (
+            os.path.abspath(path), stat.st_mtime_ns, stat.st_size, band,
+            _window_key(window), factor, resampling if factor > 1 else None
+        )
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Decode outside the lock so other reads are not blocked
+        with rasterio.open(path) as src:
+            data, transform = read_decimated(src, factor, resampling, band=band, window=window)
+
+        # Own the buffer before sharing it read-only
+        if not data.flags.owndata:
+            data = data.copy()
+        data.setflags(write=False)
+        entry = (data, transform)
+
+        if data.nbytes > self.max_bytes:
+            return entry
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = entry
+                self._bytes += data.nbytes
+                self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            _, (data, _) = self._entries.popitem(last=False)
+            self._bytes -= data.nbytes
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached raster (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters and current memory use"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': int(self._bytes),
+                'max_bytes': int(self.max_bytes),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'cube_hits': self.cube_hits,
+                'hit_rate': round(self.hits / requests, 4) if requests else 0.0
+            }
+
+
+# Process-wide cache shared by every service
+raster_cache = RasterCache()
+
+
+def read_raster(path: str, band: int = 1, window=None, factor: int = 1,
+                resampling: str = 'nearest') -> Tuple[np.ndarray, Affine]:
+    """Read a band through the process-wide raster cache (see RasterCache.read)"""
+    return raster_cache.read(path, band=band, window=window, factor=factor, resampling=resampling)
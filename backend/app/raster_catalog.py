@@ -0,0 +1,291 @@
+"""
+Raster Catalog Module
+Indexes the raw and cleaned nightlights data once and maps
+region -> year -> files, so services don't rescan directories per request.
+The index is rebuilt when a data directory's mtime changes.
+"""
+import os
+import re
+import hashlib
+import threading
+import time
+import rasterio
+from typing import Dict, Iterable, List, Optional
+
+# Configuration
+BASE_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+BASE_RAW_DIR = os.path.join(BASE_DATA_DIR, 'raw')
+BASE_CLEAN_DIR = os.path.join(BASE_DATA_DIR, 'cleaned')
+
+# How often (seconds) directory mtimes are re-checked
+CATALOG_REFRESH_INTERVAL = float(os.environ.get('CATALOG_REFRESH_INTERVAL', 2.0))
+
+# Region folders look like "NightLights_Bright_<Region>[_cleaned]" or "NightLights_Raw_<Region>"
+REGION_FOLDER_PATTERN = re.compile(r'^nightlights_(?:bright|raw)_(.+?)(?:_cleaned)?$', re.IGNORECASE)
+YEAR_PATTERN = re.compile(r'(\d{4})')
+
+
+def normalize_region(region: str) -> str:
+    """
+    Normalize a region name for matching ("Tamil_Nadu", "tamil-nadu" -> "tamil nadu")
+    """
+    return ' '.join(re.split(r'[\s_\-]+', region.strip().lower())).strip()
+
+
+def region_from_folder(folder_name: str) -> Optional[str]:
+    """
+    Extract the display name of a region from its data folder name
+
+    Returns:
+        Region name (e.g. "Tamil Nadu") or None if the folder is not a region folder
+    """
+    match = REGION_FOLDER_PATTERN.match(folder_name)
+    if not match:
+        return None
+    return ' '.join(match.group(1).replace('_', ' ').split())
+
+
+def file_fingerprint(paths: Iterable[Optional[str]]) -> str:
+    """
+    Fingerprint a set of files by name, size and mtime
+
+    Used as a stable cache key: it changes whenever any of the files is
+    rewritten. Missing files are part of the fingerprint too.
+
+    Args:
+        paths: File paths (None entries are ignored)
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha1()
+    for path in sorted(p for p in paths if p):
+        try:
+            stat = os.stat(path)
+            digest.update(f'{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};'.encode('utf-8'))
+        except FileNotFoundError:
+            digest.update(f'{os.path.basename(path)}:missing;'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _raster_info(path: str) -> Dict:
+    """Size, mtime, shape, transform and CRS of a TIF file"""
+    stat = os.stat(path)
+    with rasterio.open(path) as src:
+        return {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'shape': (src.height, src.width),
+            'transform': src.transform,
+            'crs': str(src.crs) if src.crs else None
+        }
+
+
+class RasterCatalog:
+    """
+    Index of region -> year -> {raw_tif, clean_tif, view_png, size, mtime, shape, transform}
+
+    Entries:
+        'year', 'raw_tif', 'clean_tif', 'view_png' (paths or None),
+        'raw' / 'clean' ({'size', 'mtime', 'shape', 'transform', 'crs'} or None),
+        'shape', 'transform', 'crs' (of the cleaned TIF, falling back to the raw one)
+    """
+
+    def __init__(self, raw_dir: str = BASE_RAW_DIR, clean_dir: str = BASE_CLEAN_DIR):
+        self.raw_dir = raw_dir
+        self.clean_dir = clean_dir
+        self._lock = threading.Lock()
+        self._regions = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self.refresh(force=True)
+
+    def _directory_signature(self) -> tuple:
+        """mtimes of the base directories and every region folder"""
+        signature = []
+        for base_dir in (self.raw_dir, self.clean_dir):
+            if not os.path.isdir(base_dir):
+                signature.append((base_dir, None))
+                continue
+            signature.append((base_dir, os.stat(base_dir).st_mtime_ns))
+            for entry in os.scandir(base_dir):
+                if entry.is_dir():
+                    signature.append((entry.path, entry.stat().st_mtime_ns))
+        return tuple(signature)
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Rebuild the index if a data directory changed (or if force is set)
+
+        Directory mtimes are checked at most every CATALOG_REFRESH_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < CATALOG_REFRESH_INTERVAL:
+            return
+
+        with self._lock:
+            self._checked_at = now
+            signature = self._directory_signature()
+            if not force and signature == self._signature:
+                return
+            self._regions = self._scan()
+            self._signature = signature
+
+    def _scan(self) -> Dict[str, Dict]:
+        regions = {}
+
+        def region_record(folder_name: str) -> Optional[Dict]:
+            name = region_from_folder(folder_name)
+            if name is None:
+                return None
+            key = normalize_region(name)
+            return regions.setdefault(key, {
+                'name': name,
+                'raw_dir': None,
+                'clean_dir': None,
+                'years': {}
+            })
+
+        def year_entry(record: Dict, filename: str) -> Optional[Dict]:
+            match = YEAR_PATTERN.search(filename)
+            if not match:
+                return None
+            year = int(match.group(1))
+            return record['years'].setdefault(year, {
+                'year': year,
+                'raw_tif': None,
+                'clean_tif': None,
+                'view_png': None,
+                'raw': None,
+                'clean': None
+            })
+
+        if os.path.isdir(self.raw_dir):
+            for folder in sorted(os.scandir(self.raw_dir), key=lambda e: e.name):
+                record = region_record(folder.name) if folder.is_dir() else None
+                if record is None:
+                    continue
+                record['raw_dir'] = folder.path
+                for filename in sorted(os.listdir(folder.path)):
+                    if filename.endswith('.tif'):
+                        entry = year_entry(record, filename)
+                        if entry is not None and entry['raw_tif'] is None:
+                            entry['raw_tif'] = os.path.join(folder.path, filename)
+
+        if os.path.isdir(self.clean_dir):
+            for folder in sorted(os.scandir(self.clean_dir), key=lambda e: e.name):
+                record = region_record(folder.name) if folder.is_dir() else None
+                if record is None:
+                    continue
+                record['clean_dir'] = folder.path
+                for filename in sorted(os.listdir(folder.path)):
+                    if filename.endswith('_clean.tif'):
+                        entry = year_entry(record, filename)
+                        if entry is not None and entry['clean_tif'] is None:
+                            entry['clean_tif'] = os.path.join(folder.path, filename)
+                    elif filename.endswith('_view.png'):
+                        entry = year_entry(record, filename)
+                        if entry is not None and entry['view_png'] is None:
+                            entry['view_png'] = os.path.join(folder.path, filename)
+
+        for record in regions.values():
+            for entry in record['years'].values():
+                for kind in ('raw', 'clean'):
+                    path = entry[f'{kind}_tif']
+                    if path:
+                        try:
+                            entry[kind] = _raster_info(path)
+                        except (OSError, rasterio.errors.RasterioIOError):
+                            entry[kind] = None
+                info = entry['clean'] or entry['raw'] or {}
+                entry['shape'] = info.get('shape')
+                entry['transform'] = info.get('transform')
+                entry['crs'] = info.get('crs')
+
+        return regions
+
+    def resolve_region(self, region: str) -> Optional[str]:
+        """
+        Resolve a user-supplied region name to its catalog key
+
+        Exact (normalized) names win; otherwise the query's words must match
+        exactly one region, so ambiguous names resolve to nothing instead of
+        to the wrong region.
+        """
+        self.refresh()
+        regions = self._regions
+        key = normalize_region(region)
+        if not key:
+            return None
+        if key in regions:
+            return key
+
+        words = key.split()
+        candidates = [k for k in regions if all(word in k.split() for word in words)]
+        return candidates[0] if len(candidates) == 1 else None
+
+    def get_region(self, region: str) -> Optional[Dict]:
+        """Region record ({'name', 'raw_dir', 'clean_dir', 'years'}) or None"""
+        key = self.resolve_region(region)
+        return self._regions.get(key) if key else None
+
+    def get_entry(self, region: str, year: int) -> Optional[Dict]:
+        """Year entry of a region or None"""
+        record = self.get_region(region)
+        return record['years'].get(int(year)) if record else None
+
+    def get_file(self, region: str, year: int, kind: str = 'clean_tif') -> Optional[str]:
+        """
+        Path of one file of a region/year
+
+        Args:
+            kind: 'raw_tif', 'clean_tif' or 'view_png'
+        """
+        entry = self.get_entry(region, year)
+        return entry[kind] if entry else None
+
+    def years(self, region: str, kind: str = 'clean_tif') -> List[int]:
+        """Sorted years of a region that have a file of the given kind"""
+        record = self.get_region(region)
+        if not record:
+            return []
+        return sorted(year for year, entry in record['years'].items() if entry[kind])
+
+    def regions(self, kind: str = 'clean_tif') -> List[Dict]:
+        """
+        All regions that have at least one file of the given kind
+
+        Returns:
+            List of {'name', 'folder', 'years'}
+        """
+        self.refresh()
+        folder_key = 'clean_dir' if kind in ('clean_tif', 'view_png') else 'raw_dir'
+        result = []
+        for key in sorted(self._regions):
+            record = self._regions[key]
+            years = sorted(y for y, entry in record['years'].items() if entry[kind])
+            if years and record[folder_key]:
+                result.append({
+                    'name': record['name'],
+                    'folder': os.path.basename(record[folder_key]),
+                    'years': years
+                })
+        return result
+
+    def fingerprint(self, region: str, years: Iterable[int], kind: str = 'clean_tif') -> str:
+        """Fingerprint of the files of a region for the given years (see file_fingerprint)"""
+        record = self.get_region(region)
+        if not record:
+            return file_fingerprint([])
+        return file_fingerprint(
+            record['years'][year][kind] for year in years if year in record['years']
+        )
+
+
+def relative_data_path(path: str) -> str:
+    """Path relative to the data directory, as served by /api/images"""
+    return os.path.relpath(path, BASE_DATA_DIR).replace('\\', '/')
+
+
+# Process-wide catalog, built once at startup
+catalog = RasterCatalog()
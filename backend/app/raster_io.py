@@ -0,0 +1,161 @@
+"""
+Raster I/O Module
+Shared helpers for reading GeoTIFF bands at reduced resolution or block by block.
+Lets callers that only need a coarse view avoid decoding the full band.
+"""
+import math
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import Affine
+from rasterio.windows import Window, from_bounds
+from typing import Iterator, Optional, Tuple
+
+# Resampling methods accepted for decimated reads
+RESAMPLING_METHODS = {
+    'nearest': Resampling.nearest,
+    'average': Resampling.average,
+}
+
+# Overview factors built by build_overviews (powers of two up to 1/32)
+DEFAULT_OVERVIEW_FACTORS = [2, 4, 8, 16, 32]
+
+
+def decimated_shape(height: int, width: int, factor: int) -> Tuple[int, int]:
+    """
+    Get the output shape of a band read at 1/factor resolution
+
+    Args:
+        height: Source height in pixels
+        width: Source width in pixels
+        factor: Decimation factor (1 = full resolution)
+
+    Returns:
+        (rows, cols) with the same count as a [::factor, ::factor] stride
+    """
+    return math.ceil(height / factor), math.ceil(width / factor)
+
+
+def read_decimated(src, factor: int = 1, resampling: str = 'nearest', band: int = 1,
+                   window=None) -> Tuple[np.ndarray, Affine]:
+    """
+    Read a band at 1/factor resolution using rasterio's out_shape
+
+    GDAL picks the closest internal overview on its own when one exists, so
+    files with overviews (see build_overviews) only decode the overview level.
+    With 'average', pixels equal to the file's nodata value are left out of
+    each cell mean.
+
+    Args:
+        src: Open rasterio dataset
+        factor: Decimation factor (1 = full resolution)
+        resampling: 'nearest' or 'average'
+        band: Band index to read (default: 1)
+        window: Optional rasterio Window to read instead of the full band
+
+    Returns:
+        Tuple of (float32 array, affine transform of the decimated grid)
+    """
+    if resampling not in RESAMPLING_METHODS:
+        raise ValueError(f"Unsupported resampling method: {resampling}")
+
+    factor = max(int(factor), 1)
+
+    if window is None:
+        height, width = src.height, src.width
+        transform = src.transform
+    else:
+        height, width = int(window.height), int(window.width)
+        transform = src.window_transform(window)
+
+    if factor == 1:
+        data = src.read(band, window=window)
+        return data.astype(np.float32, copy=False), transform
+
+    out_rows, out_cols = decimated_shape(height, width, factor)
+    data = src.read(
+        band,
+        window=window,
+        out_shape=(out_rows, out_cols),
+        resampling=RESAMPLING_METHODS[resampling]
+    )
+
+    # Each output pixel covers (width / out_cols) x (height / out_rows) source pixels
+    transform = transform * Affine.scale(width / out_cols, height / out_rows)
+
+    return data.astype(np.float32, copy=False), transform
+
+
+def iter_blocks(src, band: int = 1, window=None) -> Iterator[np.ndarray]:
+    """
+    Iterate over a band one internal block at a time
+
+    Args:
+        src: Open rasterio dataset
+        band: Band index to read (default: 1)
+        window: Optional rasterio Window; it is read in strips one block tall
+
+    Yields:
+        float32 arrays, one per block window (or strip)
+    """
+    if window is None:
+        for _, block_window in src.block_windows(band):
+            yield src.read(band, window=block_window).astype(np.float32, copy=False)
+        return
+
+    block_rows = src.block_shapes[band - 1][0]
+    row_off, col_off = int(window.row_off), int(window.col_off)
+    height, width = int(window.height), int(window.width)
+
+    for row in range(row_off, row_off + height, block_rows):
+        strip = Window(col_off, row, width, min(block_rows, row_off + height - row))
+        yield src.read(band, window=strip).astype(np.float32, copy=False)
+
+
+def window_from_bounds(src, west: float, south: float, east: float, north: float) -> Optional[Window]:
+    """
+    Get the pixel window covering a bounding box, clipped to the dataset
+
+    The window is rounded outwards to whole pixels so the full bounding box
+    is covered.
+
+    Args:
+        src: Open rasterio dataset
+        west, south, east, north: Bounds in the dataset's CRS
+
+    Returns:
+        Window, or None if the bounds do not overlap the dataset
+    """
+    window = from_bounds(west, south, east, north, transform=src.transform)
+
+    row_start = max(int(math.floor(window.row_off)), 0)
+    col_start = max(int(math.floor(window.col_off)), 0)
+    row_stop = min(int(math.ceil(window.row_off + window.height)), src.height)
+    col_stop = min(int(math.ceil(window.col_off + window.width)), src.width)
+
+    if row_stop <= row_start or col_stop <= col_start:
+        return None
+
+    return Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+
+
+def build_overviews(filepath: str, factors: Optional[list] = None, resampling: str = 'average') -> None:
+    """
+    Build internal overviews for a GeoTIFF so decimated reads stay cheap
+
+    Args:
+        filepath: Path to the TIF file (opened in update mode)
+        factors: Overview factors (default: DEFAULT_OVERVIEW_FACTORS)
+        resampling: 'nearest' or 'average'
+    """
+    if resampling not in RESAMPLING_METHODS:
+        raise ValueError(f"Unsupported resampling method: {resampling}")
+
+    factors = factors or DEFAULT_OVERVIEW_FACTORS
+
+    with rasterio.open(filepath, 'r+') as dst:
+        # Skip levels that would be smaller than a single pixel
+        factors = [f for f in factors if f < max(dst.width, dst.height)]
+        if factors:
+            dst.build_overviews(factors, RESAMPLING_METHODS[resampling])
+            dst.update_tags(ns='rio_overview', resampling=resampling)
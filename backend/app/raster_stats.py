@@ -0,0 +1,165 @@
+"""
+Raster Statistics Module
+Single-pass, chunked statistics kernel shared by the extractor, comparison
+and growth services. Every pixel is binned once against a bin table, and
+counts, sums and moments are accumulated from that in one sweep.
+"""
+import numpy as np
+from typing import Dict, Iterable, Optional
+
+# Sector bins for classification (NanoWatts): sector i covers the interval
+# (SECTOR_BINS[i], SECTOR_BINS[i + 1]]. Pixels above SECTOR_BINS[0] count as lit.
+SECTOR_BINS = [5, 15, 60, np.inf]
+SECTOR_NAMES = ['rural', 'urban', 'industrial']
+
+# Approximate ground area of one pixel
+PIXEL_AREA_SQKM = 0.25
+
+# Number of pixels processed per chunk
+STATS_CHUNK_PIXELS = 1 << 20
+
+# Largest float below 0, used to split negative values from exact zeros
+_BELOW_ZERO = np.nextafter(0.0, -1.0)
+
+
+def sector_edges() -> np.ndarray:
+    """
+    Bin edges used by compute_raster_stats
+
+    Bins: 0 = negative, 1 = exactly 0 (dark), 2 = (0, SECTOR_BINS[0]] (dim),
+    3.. = one per sector.
+    """
+    return np.array([_BELOW_ZERO, 0.0] + list(SECTOR_BINS[:-1]), dtype=np.float64)
+
+
+class RasterStatsAccumulator:
+    """
+    Accumulates binned counts, binned sums and moments over array chunks
+
+    Bin i holds values v with edges[i - 1] < v <= edges[i] (bin 0 is
+    everything at or below edges[0], the last bin everything above edges[-1]).
+    """
+
+    def __init__(self, edges: Optional[Iterable[float]] = None):
+        self.edges = sector_edges() if edges is None else np.asarray(list(edges), dtype=np.float64)
+        n_bins = len(self.edges) + 1
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.sums = np.zeros(n_bins, dtype=np.float64)
+        self.total = 0
+        self.sum_sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, chunk: np.ndarray) -> None:
+        """Add one chunk of values (any shape)"""
+        if chunk.size == 0:
+            return
+
+        values = chunk.ravel().astype(np.float64, copy=False)
+        bins = np.searchsorted(self.edges, values, side='left')
+
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        self.sums += np.bincount(bins, weights=values, minlength=len(self.sums))
+        self.total += values.size
+        self.sum_sq += float(np.dot(values, values))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    @property
+    def sum(self) -> float:
+        return float(self.sums.sum())
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    @property
+    def std(self) -> float:
+        if not self.total:
+            return 0.0
+        variance = self.sum_sq / self.total - self.mean ** 2
+        return float(np.sqrt(max(variance, 0.0)))
+
+    def count_above(self, bin_index: int) -> int:
+        """Number of values in bins >= bin_index"""
+        return int(self.counts[bin_index:].sum())
+
+    def sum_above(self, bin_index: int) -> float:
+        """Sum of values in bins >= bin_index"""
+        return float(self.sums[bin_index:].sum())
+
+
+def iter_chunks(img: np.ndarray, chunk_pixels: int = STATS_CHUNK_PIXELS) -> Iterable[np.ndarray]:
+    """
+    Split a 2D array into row chunks of roughly chunk_pixels pixels (views, no copies)
+    """
+    rows_per_chunk = max(1, chunk_pixels // max(img.shape[1], 1))
+    for start in range(0, img.shape[0], rows_per_chunk):
+        yield img[start:start + rows_per_chunk]
+
+
+def compute_raster_stats(chunks) -> Dict:
+    """
+    Compute sum-of-lights, lit/dark counts, sector bins and moments in one pass
+
+    Args:
+        chunks: A 2D array (split into row chunks internally) or an iterable
+                of array chunks, e.g. raster_io.iter_blocks(src)
+
+    Returns:
+        Dictionary with:
+            total_pixels, sum, min, max, mean_all, std_dev,
+            dark_pixels (== 0), positive_pixels (> 0), mean_lit (mean of > 0),
+            lit_pixels (> SECTOR_BINS[0]) and sectors ({name: count})
+    """
+    if isinstance(chunks, np.ndarray):
+        chunks = iter_chunks(chunks) if chunks.ndim == 2 else [chunks]
+
+    acc = RasterStatsAccumulator()
+    for chunk in chunks:
+        acc.update(chunk)
+
+    positive_pixels = acc.count_above(2)
+    first_sector = 3
+
+    return {
+        'total_pixels': int(acc.total),
+        'sum': acc.sum,
+        'min': acc.min if acc.total else 0.0,
+        'max': acc.max if acc.total else 0.0,
+        'mean_all': acc.mean,
+        'std_dev': acc.std,
+        'dark_pixels': int(acc.counts[1]),
+        'positive_pixels': positive_pixels,
+        'mean_lit': acc.sum_above(2) / positive_pixels if positive_pixels else 0.0,
+        'lit_pixels': acc.count_above(first_sector),
+        'sectors': {
+            name: int(acc.counts[first_sector + i])
+            for i, name in enumerate(SECTOR_NAMES)
+        }
+    }
+
+
+def year_metrics(year: int, stats: Dict) -> Dict:
+    """
+    Build the per-year metrics block used by the growth and comparison services
+
+    Args:
+        year: Year the statistics belong to
+        stats: Output of compute_raster_stats
+
+    Returns:
+        Dictionary with GDP proxy (sum of lights), urban area, intensities,
+        pixel counts and sector breakdown
+    """
+    return {
+        "year": int(year),
+        "gdp_proxy_sol": float(round(stats['sum'], 2)),
+        "urban_area_sqkm": float(round(stats['lit_pixels'] * PIXEL_AREA_SQKM, 2)),
+        "mean_intensity": float(round(stats['mean_lit'], 2)),
+        "max_intensity": float(round(stats['max'], 2)),
+        "total_pixels": int(stats['total_pixels']),
+        "lit_pixels": int(stats['lit_pixels']),
+        "dark_pixels": int(stats['dark_pixels']),
+        "sector_breakdown": dict(stats['sectors'])
+    }
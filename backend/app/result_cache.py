@@ -0,0 +1,180 @@
+"""
+Result Cache Module
+Two-tier (memory + SQLite) cache of analysis results. Entries are keyed by
+service, parameters and a fingerprint of the input files, so rewriting a
+cleaned TIF invalidates every result computed from it. The SQLite tier
+survives server restarts.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from typing import Callable, Dict, Optional
+
+from app.data_utils import NpEncoder
+
+# Configuration
+BASE_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'cache')
+RESULT_CACHE_DB = os.path.join(BASE_CACHE_DIR, 'results.sqlite')
+
+# Number of results kept in the in-memory tier
+RESULT_CACHE_MEMORY_ENTRIES = int(os.environ.get('RESULT_CACHE_MEMORY_ENTRIES', 256))
+
+# Bump when the shape or meaning of cached results changes
+RESULT_CACHE_VERSION = 4
+
+
+class ResultCache:
+    """
+    Memory LRU in front of a SQLite table of JSON-encoded results
+
+    Only one row per (service, parameters) is kept on disk: storing a result
+    for new input fingerprints replaces the stale one.
+    """
+
+    def __init__(self, db_path: str = RESULT_CACHE_DB, max_memory_entries: int = RESULT_CACHE_MEMORY_ENTRIES):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_ready = False
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection (one per call, so threads never share one)"""
+        if not self._db_ready:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._db_ready:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, service TEXT NOT NULL, params_hash TEXT NOT NULL, '
+                'created REAL NOT NULL, value TEXT NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS results_params ON results (params_hash)')
+            conn.commit()
+            self._db_ready = True
+        return conn
+
+    @staticmethod
+    def _params_hash(service: str, params: Dict) -> str:
+        payload = json.dumps([RESULT_CACHE_VERSION, service, params], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, value: str) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached result for a key, or None"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(value)
+
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+
+        self._remember(key, row[0])
+        return json.loads(row[0])
+
+    def put(self, key: str, service: str, params_hash: str, value: str, persist: bool = True) -> None:
+        """Store a JSON-encoded result in memory and, if persist is set, on disk"""
+        self._remember(key, value)
+        if not persist:
+            return
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute('DELETE FROM results WHERE params_hash = ? AND key != ?', (params_hash, key))
+                conn.execute(
+                    'INSERT OR REPLACE INTO results (key, service, params_hash, created, value) VALUES (?, ?, ?, ?, ?)',
+                    (key, service, params_hash, time.time(), value)
+                )
+        except sqlite3.Error:
+            # The memory tier still works if the disk is read-only or locked
+            pass
+
+    def cached(self, service: str, params: Dict, fingerprint: str, compute: Callable[[], Dict],
+               persist: bool = True) -> Dict:
+        """
+        Return the cached result of a service call or compute and store it
+
+        Args:
+            service: Service name, e.g. 'compare'
+            params: JSON-serializable parameters of the call
+            fingerprint: Fingerprint of the input files (see raster_catalog.file_fingerprint)
+            compute: Function producing the result dictionary
+            persist: False keeps the result in the memory tier only (results of
+                     client-supplied inputs that should not accumulate on disk)
+
+        Returns:
+            Result dictionary; only results with 'success' set are cached
+        """
+        params_hash = self._params_hash(service, params)
+        key = hashlib.sha1(f'{params_hash}:{fingerprint}'.encode('utf-8')).hexdigest()
+
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        result = compute()
+        if not result.get('success'):
+            return result
+
+        # Round-trip through JSON so cold and warm responses are identical
+        value = json.dumps(result, cls=NpEncoder)
+        self.put(key, service, params_hash, value, persist)
+        return json.loads(value)
+
+    def clear(self) -> None:
+        """Drop every cached result from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute('DELETE FROM results')
+        except sqlite3.Error:
+            pass
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and the size of both tiers"""
+        try:
+            with closing(self._connect()) as conn, conn:
+                disk_entries = conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        except sqlite3.Error:
+            disk_entries = None
+
+        with self._lock:
+            requests = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_entries': len(self._memory),
+                'disk_entries': disk_entries,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.disk_hits) / requests, 4) if requests else 0.0
+            }
+
+
+# Process-wide result cache shared by the analysis services
+result_cache = ResultCache()
@@ -1,14 +1,27 @@
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, redirect, request, jsonify, send_file, session
 from app.main import app
 from app.auth import generate_otp, send_otp_email, store_otp, verify_otp, cleanup_expired_otps
-from app.tif_extractor import extract_tif_to_json, get_available_years, get_tif_file_path
+from app.tif_extractor import (
+    extract_tif_to_json, extract_tif_columns, encode_columns_binary, encode_columns_arrow
+)
+from app.raster_io import RESAMPLING_METHODS
+from app.raster_catalog import catalog
+from app.raster_cache import raster_cache
+from app.result_cache import result_cache
+from app.metrics_store import metrics_store
 from app.insights_service import get_insights
-from app.anomaly_service import detect_anomalies
+from app.anomaly_service import detect_anomalies, detect_anomalies_batch, explore_thresholds
 from app.growth_analysis_service import analyze_growth
+from app.hotspots import DEFAULT_GRID_SIZE, DEFAULT_TOP_K, MAX_GRID_SIZE
+from app.integral_images import bbox_timeline
+from app.zonal_stats import zonal_compare, zonal_growth
+from app.district_stats import RANK_METRICS, district_table, rank_districts
 from app.comparison_service import compare_years
+from app.diff_image import diff_image_url, get_diff_image
+from app.pixel_series import PIXEL_BATCH_MAX_POINTS, pixel_series
+from app.tile_service import get_change_tile, get_tile, get_trend_tile
 import re
-import os
 from typing import Optional
 
 # Create blueprint for auth routes
@@ -23,8 +36,8 @@ insights_bp = Blueprint('insights', __name__)
 # Create blueprint for analysis routes
 analysis_bp = Blueprint('analysis', __name__)
 
-# Path to raw data directory base
-BASE_RAW_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'raw')
+# Create blueprint for map tile routes
+tiles_bp = Blueprint('tiles', __name__)
 
 
 def is_valid_email(email: str) -> bool:
@@ -161,43 +174,6 @@ def logout():
         }), 500
 
 
-def find_raw_data_dir(region: str) -> Optional[str]:
-    """
-    Find the raw data directory for a given region.
-    Looks for folders matching "NightLights_Bright_*Region*"
-    """
-    import os
-    if not os.path.exists(BASE_RAW_DIR):
-        return None
-    
-    # Normalize region name for matching
-    region_variations = [
-        region.replace(' ', '_').replace('-', '_').lower(),
-        region.replace(' ', ' ').lower(),
-        region.lower(),
-    ]
-    
-    region_words = [word.lower() for word in region.split() if len(word) > 2]
-    
-    # Look for matching directories
-    for folder_name in os.listdir(BASE_RAW_DIR):
-        folder_path = os.path.join(BASE_RAW_DIR, folder_name)
-        
-        if not os.path.isdir(folder_path):
-            continue
-        
-        folder_lower = folder_name.lower()
-        if 'nightlights_bright' in folder_lower or 'nightlights_raw' in folder_lower:
-            for region_var in region_variations:
-                if region_var in folder_lower:
-                    return folder_path
-            
-            if region_words and all(word in folder_lower for word in region_words):
-                return folder_path
-    
-    return None
-
-
 @data_bp.route('/api/data/nightlights/<int:year>', methods=['GET'])
 def get_nightlights_data(year):
     """Get nightlights data for a specific year"""
@@ -212,17 +188,48 @@ def get_nightlights_data(year):
         if sample_rate < 1 or sample_rate > 100:
             sample_rate = 10
         
-        # Find raw data directory for the region
-        raw_data_dir = find_raw_data_dir(region)
+        # Resampling used for the decimated read ('nearest' or 'average')
+        resampling = request.args.get('resampling', 'nearest').strip().lower()
+        if resampling not in RESAMPLING_METHODS:
+            resampling = 'nearest'
+        
+        # Response format: 'json' (default), 'binary' or 'arrow'
+        response_format = request.args.get('format', 'json').strip().lower()
+        if response_format not in ('json', 'binary', 'arrow'):
+            return jsonify({
+                'success': False,
+                'message': f'Unsupported format: {response_format}'
+            }), 400
+        
+        # Optional viewport (all four bounds or none)
+        bound_names = ('west', 'south', 'east', 'north')
+        bound_values = [request.args.get(name, type=float) for name in bound_names]
+        viewport = None
+        
+        if any(value is not None for value in bound_values):
+            if any(value is None for value in bound_values):
+                return jsonify({
+                    'success': False,
+                    'message': 'west, south, east and north must be given together'
+                }), 400
+            
+            west, south, east, north = bound_values
+            if west >= east or south >= north:
+                return jsonify({
+                    'success': False,
+                    'message': 'Viewport must satisfy west < east and south < north'
+                }), 400
+            
+            viewport = (west, south, east, north)
         
-        if not raw_data_dir:
+        # Look up the raw TIF for the region and year
+        if not catalog.years(region, 'raw_tif'):
             return jsonify({
                 'success': False,
                 'message': f'No data found for region: {region}'
             }), 404
         
-        # Get TIF file path for the year
-        tif_path = get_tif_file_path(year, raw_data_dir)
+        tif_path = catalog.get_file(region, year, 'raw_tif')
         
         if not tif_path:
             return jsonify({
@@ -230,8 +237,25 @@ def get_nightlights_data(year):
                 'message': f'No data found for year {year} in region {region}'
             }), 404
         
+        # Binary columnar formats skip the per-point JSON objects entirely
+        if response_format == 'binary':
+            result = extract_tif_columns(tif_path, sample_rate=sample_rate, resampling=resampling, viewport=viewport)
+            return Response(encode_columns_binary(result), mimetype='application/octet-stream'), 200
+        
+        if response_format == 'arrow':
+            result = extract_tif_columns(tif_path, sample_rate=sample_rate, resampling=resampling, viewport=viewport)
+            try:
+                payload = encode_columns_arrow(result)
+            except ImportError:
+                # pyarrow is an optional server dependency, not a client error
+                return jsonify({
+                    'success': False,
+                    'message': 'format=arrow is not available: pyarrow is not installed on this server. Use format=binary or format=json, or pip install pyarrow.'
+                }), 501
+            return Response(payload, mimetype='application/vnd.apache.arrow.stream'), 200
+        
         # Extract data to JSON
-        data = extract_tif_to_json(tif_path, sample_rate=sample_rate)
+        data = extract_tif_to_json(tif_path, sample_rate=sample_rate, resampling=resampling, viewport=viewport)
         
         return jsonify({
             'success': True,
@@ -243,6 +267,11 @@ def get_nightlights_data(year):
             'success': False,
             'message': str(e)
         }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -252,13 +281,35 @@ def get_nightlights_data(year):
 
 @data_bp.route('/api/data/available-years', methods=['GET'])
 def get_available_years_route():
-    """Get list of available years with nightlights data"""
+    """Get list of available years with nightlights data for a region"""
     try:
-        years = get_available_years(RAW_DATA_DIR)
+        region = request.args.get('region', 'Tamil Nadu').strip()
+        
+        # 'raw' (default) lists years served by /api/data/nightlights, 'cleaned' the analysis years
+        kind = 'clean_tif' if request.args.get('kind', 'raw').strip().lower() == 'cleaned' else 'raw_tif'
+        
+        return jsonify({
+            'success': True,
+            'region': region,
+            'years': catalog.years(region, kind)
+        }), 200
         
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
+@data_bp.route('/api/data/cache-stats', methods=['GET'])
+def get_cache_stats_route():
+    """Get hit/miss/eviction counters of the raster and result caches and the metrics table"""
+    try:
         return jsonify({
             'success': True,
-            'years': years
+            'raster_cache': raster_cache.stats(),
+            'result_cache': result_cache.stats(),
+            'metrics_store': metrics_store.stats()
         }), 200
         
     except Exception as e:
@@ -268,6 +319,53 @@ def get_available_years_route():
         }), 500
 
 
+@data_bp.route('/api/data/pixel-series', methods=['GET', 'POST'])
+def get_pixel_series_route():
+    """Value of every available year at one point (lat, lon) or a posted list of points"""
+    try:
+        params = zone_request_params()
+        region = str(params.get('region', '')).strip()
+        
+        # 'cleaned' (default) reads the analysis rasters, 'raw' the downloaded ones
+        kind = 'raw_tif' if str(params.get('kind', 'cleaned')).strip().lower() == 'raw' else 'clean_tif'
+        
+        if not region:
+            return jsonify({
+                'success': False,
+                'message': 'Region parameter is required'
+            }), 400
+        
+        try:
+            if 'points' in params:
+                points = [(float(p['lat']), float(p['lon'])) for p in params['points']]
+            else:
+                points = [(float(params['lat']), float(params['lon']))]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'lat and lon parameters (or a points list of {lat, lon}) are required'
+            }), 400
+        
+        if not 1 <= len(points) <= PIXEL_BATCH_MAX_POINTS:
+            return jsonify({
+                'success': False,
+                'message': f'Between 1 and {PIXEL_BATCH_MAX_POINTS} points are allowed'
+            }), 400
+        
+        result = pixel_series(region, points, kind)
+        
+        if result['success']:
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
 @insights_bp.route('/api/insights', methods=['GET'])
 def get_insights_route():
     """Get insights for a region and year"""
@@ -308,6 +406,45 @@ def get_insights_route():
         }), 500
 
 
+def parse_anomaly_params():
+    """
+    Parse the optional anomaly query parameters
+    
+    Returns:
+        Tuple of (keyword arguments for detect_anomalies, error message or None)
+    """
+    params = {}
+    
+    # Target year (default: last available year)
+    target_year = request.args.get('target_year', type=int)
+    if target_year is not None:
+        params['target_year'] = target_year
+    
+    # Comma-separated baseline years (default: every year before the target)
+    baseline_param = request.args.get('baseline_years', '').strip()
+    if baseline_param:
+        try:
+            params['baseline_years'] = [int(year) for year in baseline_param.split(',') if year.strip()]
+        except ValueError:
+            return None, 'baseline_years must be a comma-separated list of years'
+    
+    # Detection thresholds (default: the service constants)
+    for name in ('min_new_intensity', 'max_baseline_intensity'):
+        if request.args.get(name) is not None:
+            value = request.args.get(name, type=float)
+            if value is None or value < 0:
+                return None, f'{name} must be a non-negative number'
+            params[name] = value
+    
+    if request.args.get('min_cluster_size') is not None:
+        value = request.args.get('min_cluster_size', type=int)
+        if value is None or value < 1:
+            return None, 'min_cluster_size must be a positive integer'
+        params['min_cluster_size'] = value
+    
+    return params, None
+
+
 @analysis_bp.route('/api/analysis/anomalies', methods=['GET'])
 def get_anomalies_route():
     """Detect anomalies for a region using cleaned data"""
@@ -321,8 +458,77 @@ def get_anomalies_route():
                 'message': 'Region parameter is required'
             }), 400
         
-        # Detect anomalies (uses last available year automatically)
-        result = detect_anomalies(region)
+        params, error = parse_anomaly_params()
+        if error:
+            return jsonify({
+                'success': False,
+                'message': error
+            }), 400
+        
+        # Detect anomalies (clusters are labeled with the given thresholds)
+        result = detect_anomalies(region, **params)
+        
+        if result['success']:
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
+@analysis_bp.route('/api/analysis/anomalies/thresholds', methods=['GET'])
+def get_anomaly_thresholds_route():
+    """Count candidate anomaly pixels for a pair of thresholds (no cluster labeling)"""
+    try:
+        region = request.args.get('region', '').strip()
+        
+        if not region:
+            return jsonify({
+                'success': False,
+                'message': 'Region parameter is required'
+            }), 400
+        
+        params, error = parse_anomaly_params()
+        if error:
+            return jsonify({
+                'success': False,
+                'message': error
+            }), 400
+        
+        # Cluster size only matters once the thresholds are committed
+        params.pop('min_cluster_size', None)
+        result = explore_thresholds(region, **params)
+        
+        if result['success']:
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
+@analysis_bp.route('/api/analysis/anomalies/batch', methods=['POST'])
+def run_anomaly_batch_route():
+    """Detect anomalies for every year of a region and persist the reports"""
+    try:
+        data = request.get_json(silent=True) or {}
+        region = (data.get('region') or request.args.get('region', '')).strip()
+        
+        if not region:
+            return jsonify({
+                'success': False,
+                'message': 'Region parameter is required'
+            }), 400
+        
+        result = detect_anomalies_batch(region)
         
         if result['success']:
             return jsonify(result), 200
@@ -340,22 +546,7 @@ def get_anomalies_route():
 def get_available_regions_route():
     """Get list of available regions with cleaned data"""
     try:
-        from app.growth_analysis_service import BASE_CLEAN_DIR
-        import os
-        
-        regions = []
-        if os.path.exists(BASE_CLEAN_DIR):
-            for folder_name in os.listdir(BASE_CLEAN_DIR):
-                folder_path = os.path.join(BASE_CLEAN_DIR, folder_name)
-                if os.path.isdir(folder_path) and 'nightlights_bright' in folder_name.lower() and 'cleaned' in folder_name.lower():
-                    # Extract region name from folder name
-                    # Format: NightLights_Bright_RegionName_cleaned
-                    parts = folder_name.replace('NightLights_Bright_', '').replace('_cleaned', '').split('_')
-                    region_name = ' '.join(parts)
-                    regions.append({
-                        'name': region_name,
-                        'folder': folder_name
-                    })
+        regions = catalog.regions('clean_tif')
         
         return jsonify({
             'success': True,
@@ -369,6 +560,215 @@ def get_available_regions_route():
         }), 500
 
 
+@analysis_bp.route('/api/analysis/bbox-timeline', methods=['GET'])
+def get_bbox_timeline_route():
+    """Sum of lights and lit area inside a bounding box for a year range"""
+    try:
+        region = request.args.get('region', '').strip()
+        bbox_param = request.args.get('bbox', '').strip()
+        start_year = request.args.get('start_year', type=int)
+        end_year = request.args.get('end_year', type=int)
+        
+        if not region:
+            return jsonify({
+                'success': False,
+                'message': 'Region parameter is required'
+            }), 400
+        
+        try:
+            bbox = [float(v) for v in bbox_param.split(',')]
+        except ValueError:
+            bbox = []
+        if len(bbox) != 4 or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+            return jsonify({
+                'success': False,
+                'message': 'bbox must be min_lon,min_lat,max_lon,max_lat'
+            }), 400
+        
+        # Default to the full range of available years
+        if start_year is None:
+            start_year = 0
+        if end_year is None:
+            end_year = 9999
+        
+        if start_year > end_year:
+            return jsonify({
+                'success': False,
+                'message': 'start_year must be less than or equal to end_year'
+            }), 400
+        
+        result = bbox_timeline(region, bbox, start_year, end_year)
+        
+        if result['success']:
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
+def zone_request_params() -> dict:
+    """Query parameters merged with the JSON body (the body wins)"""
+    params = request.args.to_dict()
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        params.update(data)
+    return params
+
+
+def int_param(params: dict, name: str, default: Optional[int] = None) -> Optional[int]:
+    """Integer parameter from a merged parameter dictionary (default if missing or invalid)"""
+    try:
+        return int(params[name]) if params.get(name) not in (None, '') else default
+    except (TypeError, ValueError):
+        return default
+
+
+@analysis_bp.route('/api/analysis/zones/growth', methods=['GET', 'POST'])
+def get_zonal_growth_route():
+    """Growth analysis restricted to a stored zone (zone_id) or a posted GeoJSON polygon (geometry)"""
+    try:
+        params = zone_request_params()
+        region = str(params.get('region', '')).strip()
+        start_year = int_param(params, 'start_year')
+        end_year = int_param(params, 'end_year')
+        grid_size = int_param(params, 'grid_size', DEFAULT_GRID_SIZE)
+        hotspot_count = int_param(params, 'k', DEFAULT_TOP_K)
+        
+        if not region:
+            return jsonify({
+                'success': False,
+                'message': 'Region parameter is required'
+            }), 400
+        
+        if not start_year or not end_year:
+            return jsonify({
+                'success': False,
+                'message': 'start_year and end_year parameters are required'
+            }), 400
+        
+        if start_year > end_year:
+            return jsonify({
+                'success': False,
+                'message': 'start_year must be less than or equal to end_year'
+            }), 400
+        
+        if not 1 <= grid_size <= MAX_GRID_SIZE or hotspot_count < 1:
+            return jsonify({
+                'success': False,
+                'message': f'grid_size must be between 1 and {MAX_GRID_SIZE} and k must be positive'
+            }), 400
+        
+        result = zonal_growth(region, start_year, end_year, params.get('zone_id'), params.get('geometry'),
+                              grid_size, hotspot_count)
+        
+        if result.get('success'):
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
+@analysis_bp.route('/api/analysis/zones/compare', methods=['GET', 'POST'])
+def get_zonal_compare_route():
+    """Year comparison restricted to a stored zone (zone_id) or a posted GeoJSON polygon (geometry)"""
+    try:
+        params = zone_request_params()
+        region = str(params.get('region', '')).strip()
+        year1 = int_param(params, 'year1')
+        year2 = int_param(params, 'year2')
+        
+        if not region:
+            return jsonify({
+                'success': False,
+                'message': 'Region parameter is required'
+            }), 400
+        
+        if not year1 or not year2:
+            return jsonify({
+                'success': False,
+                'message': 'year1 and year2 parameters are required'
+            }), 400
+        
+        if year1 == year2:
+            return jsonify({
+                'success': False,
+                'message': 'year1 and year2 must be different'
+            }), 400
+        
+        result = zonal_compare(region, year1, year2, params.get('zone_id'), params.get('geometry'))
+        
+        if result.get('success'):
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
+@analysis_bp.route('/api/analysis/districts', methods=['GET'])
+def get_district_table_route():
+    """District x year metrics of a region, optionally ranked by one metric in one year"""
+    try:
+        region = request.args.get('region', '').strip()
+        start_year = request.args.get('start_year', 0, type=int)
+        end_year = request.args.get('end_year', 9999, type=int)
+        rank_by = request.args.get('rank_by', '').strip()
+        rank_year = request.args.get('year', type=int)
+        
+        if not region:
+            return jsonify({
+                'success': False,
+                'message': 'Region parameter is required'
+            }), 400
+        
+        if rank_by and rank_by not in RANK_METRICS:
+            return jsonify({
+                'success': False,
+                'message': f'rank_by must be one of: {", ".join(RANK_METRICS)}'
+            }), 400
+        
+        result = district_table(region, start_year, end_year)
+        
+        if not result.get('success'):
+            return jsonify(result), 400
+        
+        if rank_by:
+            # Rank in the requested year (default: last year of the table)
+            rank_year = rank_year or result['years'][-1]
+            if rank_year not in result['years']:
+                return jsonify({
+                    'success': False,
+                    'message': f'No data found for year {rank_year}'
+                }), 400
+            result = dict(result, ranking={
+                'metric': rank_by,
+                'year': rank_year,
+                'districts': rank_districts(result, rank_by, rank_year)
+            })
+        
+        return jsonify(result), 200
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
 @analysis_bp.route('/api/analysis/growth', methods=['GET'])
 def get_growth_analysis_route():
     """Analyze growth for a region within a year range"""
@@ -396,8 +796,24 @@ def get_growth_analysis_route():
                 'message': 'start_year must be less than or equal to end_year'
             }), 400
         
+        # Optional hotspot grid resolution and number of hotspots
+        grid_size = request.args.get('grid_size', DEFAULT_GRID_SIZE, type=int)
+        hotspot_count = request.args.get('k', DEFAULT_TOP_K, type=int)
+        
+        if not 1 <= grid_size <= MAX_GRID_SIZE:
+            return jsonify({
+                'success': False,
+                'message': f'grid_size must be between 1 and {MAX_GRID_SIZE}'
+            }), 400
+        
+        if hotspot_count < 1:
+            return jsonify({
+                'success': False,
+                'message': 'k must be a positive integer'
+            }), 400
+        
         # Analyze growth
-        result = analyze_growth(region, start_year, end_year)
+        result = analyze_growth(region, start_year, end_year, grid_size, hotspot_count)
         
         if result.get('success'):
             return jsonify(result), 200
@@ -464,8 +880,97 @@ def compare_years_route():
         }), 500
 
 
+def revalidated(response: Response, etag: str) -> Response:
+    """Tag an image response so clients revalidate it (304 when unchanged) instead of caching it blindly"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@analysis_bp.route('/api/compare/diff/<region>/<int:year1>/<int:year2>.<any(png, webp):image_format>', methods=['GET'])
+def get_diff_image_route(region, year1, year2, image_format):
+    """Get the difference heatmap of two years as PNG, or as WebP from the .webp URL"""
+    try:
+        result = get_diff_image(region.strip(), year1, year2, image_format)
+        
+        if not result['success']:
+            return jsonify(result), 404
+        
+        # No smaller WebP copy: send the client to the PNG rather than PNG bytes under .webp
+        if result['format'] != image_format:
+            return redirect(diff_image_url(region.strip(), year1, year2, result['format']))
+        
+        response = send_file(result['path'], mimetype=f"image/{result['format']}", etag=False)
+        return revalidated(response, result['etag'])
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
+@tiles_bp.route('/api/tiles/<region>/<int:year>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def get_tile_route(region, year, z, x, y):
+    """Get a Web-Mercator PNG tile of cleaned nightlights data"""
+    try:
+        result = get_tile(region.strip(), year, z, x, y)
+        
+        if not result['success']:
+            return jsonify(result), 404
+        
+        return revalidated(Response(result['content'], mimetype='image/png'), result['etag'])
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
+@tiles_bp.route('/api/tiles/<region>/trend/<layer>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def get_trend_tile_route(region, layer, z, x, y):
+    """Get a Web-Mercator PNG tile of a per-pixel trend layer (slope, r2 or change)"""
+    try:
+        # Default to the full range of available years
+        start_year = request.args.get('start_year', 0, type=int)
+        end_year = request.args.get('end_year', 9999, type=int)
+        
+        result = get_trend_tile(region.strip(), layer, start_year, end_year, z, x, y)
+        
+        if not result['success']:
+            return jsonify(result), 404
+        
+        return revalidated(Response(result['content'], mimetype='image/png'), result['etag'])
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
+@tiles_bp.route('/api/tiles/<region>/change/<int:year1>/<int:year2>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def get_change_tile_route(region, year1, year2, z, x, y):
+    """Get a Web-Mercator PNG tile of the change classes between two years"""
+    try:
+        result = get_change_tile(region.strip(), year1, year2, z, x, y)
+        
+        if not result['success']:
+            return jsonify(result), 404
+        
+        return revalidated(Response(result['content'], mimetype='image/png'), result['etag'])
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        }), 500
+
+
 # Register blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(data_bp)
 app.register_blueprint(insights_bp)
-app.register_blueprint(analysis_bp)
\ No newline at end of file
+app.register_blueprint(analysis_bp)
+app.register_blueprint(tiles_bp)
\ No newline at end of file
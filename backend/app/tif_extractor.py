@@ -6,55 +6,155 @@ import rasterio
 import numpy as np
 import os
 import json
-from typing import Dict, List, Optional, Tuple
+import math
+from rasterio.coords import BoundingBox
+from typing import Dict, Optional, Tuple
+from app.raster_io import iter_blocks, window_from_bounds
+from app.raster_cache import read_raster
+from app.raster_stats import compute_raster_stats
 
+# Column order of the binary/arrow point payloads
+BINARY_COLUMNS = ('lat', 'lon', 'value')
 
-def extract_tif_to_json(filepath: str, sample_rate: int = 10) -> Dict:
+
+def extract_points(data: np.ndarray, transform, sample_rate: int = 10) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    Extract TIF data and convert to JSON format suitable for map visualization
+    Extract lit pixels of a sampled grid as lat/lon/value columns
+    
+    Every Nth row and column is sampled, pixels with a value of 0 or less are
+    dropped, and the pixel centers of the remaining ones are converted to
+    coordinates in a single affine operation.
+    
+    Args:
+        data: 2D raster band
+        transform: Affine transform of the raster
+        sample_rate: Sample every Nth pixel (default: 10)
+    
+    Returns:
+        Tuple of (lats, lons, values) arrays, rounded to 6, 6 and 4 decimals,
+        in row-major order of the sampled grid
+    """
+    sampled = data[::sample_rate, ::sample_rate]
+    
+    # Only include non-zero values (lit areas)
+    sample_rows, sample_cols = np.nonzero(sampled > 0)
+    values = sampled[sample_rows, sample_cols].astype(np.float64)
+    
+    # Convert pixel coordinates to lat/lon for all lit pixels at once
+    lons, lats = rasterio.transform.xy(transform, sample_rows * sample_rate, sample_cols * sample_rate)
+    
+    return (
+        np.round(np.asarray(lats, dtype=np.float64), 6),
+        np.round(np.asarray(lons, dtype=np.float64), 6),
+        np.round(values, 4),
+    )
+
+
+def compute_band_statistics(src, band: int = 1, window=None) -> Dict:
+    """
+    Compute band statistics one internal block at a time
+    
+    Keeps peak memory at a single block instead of the full band.
+    
+    Args:
+        src: Open rasterio dataset
+        band: Band index to read (default: 1)
+        window: Optional rasterio Window to restrict the statistics to
+    
+    Returns:
+        Dictionary with min, max, mean_all, mean_lit, std_dev and pixel counts
+    """
+    stats = compute_raster_stats(iter_blocks(src, band, window))
+    
+    return {
+        'min': round(stats['min'], 4),
+        'max': round(stats['max'], 4),
+        'mean_all': round(stats['mean_all'], 4),
+        'mean_lit': round(stats['mean_lit'], 4) if stats['positive_pixels'] > 0 else 0,
+        'std_dev': round(stats['std_dev'], 4),
+        'total_pixels': int(stats['total_pixels']),
+        'lit_pixels': int(stats['positive_pixels']),
+        'dark_pixels': int(stats['dark_pixels'])
+    }
+
+
+def viewport_sample_rate(height: int, width: int, window, sample_rate: int) -> int:
+    """
+    Get the sample rate that spends the full-raster point budget on a window
+    
+    The budget is the number of cells the whole raster would yield at
+    sample_rate; the window is sampled just coarsely enough to stay within it.
+    
+    Args:
+        height: Raster height in pixels
+        width: Raster width in pixels
+        window: rasterio Window being read
+        sample_rate: Requested sample rate for the whole raster
+    
+    Returns:
+        Sample rate to use inside the window (at least 1)
+    """
+    budget = math.ceil(height / sample_rate) * math.ceil(width / sample_rate)
+    window_pixels = int(window.height) * int(window.width)
+    return max(1, math.ceil(math.sqrt(window_pixels / budget)))
+
+
+def extract_tif_columns(filepath: str, sample_rate: int = 10, resampling: str = 'nearest',
+                        viewport: Optional[Tuple[float, float, float, float]] = None) -> Dict:
+    """
+    Extract TIF data as metadata plus lat/lon/value NumPy columns
+    
+    Points come from a decimated read (1/sample_rate in each direction), so
+    only about 1/sample_rate² of the band is decoded for them. Statistics
+    still cover every pixel but are accumulated block by block.
+    
+    With a viewport, only the window covering it is read; the point budget of
+    the whole raster at sample_rate is spent on that window, and metadata
+    (size, bounds, transform, statistics) describes the window.
     
     Args:
         filepath: Path to the TIF file
         sample_rate: Sample every Nth pixel to reduce data size (default: 10)
                     Set to 1 for full resolution
+        resampling: 'nearest' picks one pixel per sampled cell, 'average'
+                    uses the mean of the cell (default: 'nearest')
+        viewport: Optional (west, south, east, north) in the raster's CRS
     
     Returns:
-        Dictionary containing metadata and data points
+        Dictionary with 'metadata', 'center' and 'columns' ({'lat', 'lon', 'value'} arrays)
+    
+    Raises:
+        ValueError: If the viewport does not overlap the raster
     """
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"TIF file not found: {filepath}")
     
     with rasterio.open(filepath) as src:
-        # Read the data
-        data = src.read(1).astype(np.float32)
+        window = None
+        if viewport is not None:
+            window = window_from_bounds(src, *viewport)
+            if window is None:
+                raise ValueError('Viewport does not overlap the raster')
+            sample_rate = viewport_sample_rate(src.height, src.width, window, sample_rate)
+        
+        # Read the data at the sampled resolution (shared raster cache)
+        data, sampled_transform = read_raster(filepath, window=window, factor=sample_rate, resampling=resampling)
         
         # Get metadata
-        bounds = src.bounds
-        transform = src.transform
-        width = src.width
-        height = src.height
+        if window is None:
+            bounds = src.bounds
+            transform = src.transform
+            width = src.width
+            height = src.height
+        else:
+            bounds = BoundingBox(*src.window_bounds(window))
+            transform = src.window_transform(window)
+            width = int(window.width)
+            height = int(window.height)
         crs = str(src.crs) if src.crs else None
         
-        # Extract data points (sampled to reduce size)
-        data_points = []
-        
-        # Sample pixels based on sample_rate
-        for row in range(0, height, sample_rate):
-            for col in range(0, width, sample_rate):
-                # Convert pixel coordinates to lat/lon
-                lon, lat = src.xy(row, col)
-                value = float(data[row, col])
-                
-                # Only include non-zero values (lit areas)
-                if value > 0:
-                    data_points.append({
-                        'lat': round(lat, 6),
-                        'lon': round(lon, 6),
-                        'value': round(value, 4)
-                    })
-        
-        # Calculate statistics
-        lit_data = data[data > 0]
+        # Extract data points (one per sampled cell)
+        lats, lons, values = extract_points(data, sampled_transform, 1)
         
         result = {
             'metadata': {
@@ -74,83 +174,126 @@ def extract_tif_to_json(filepath: str, sample_rate: int = 10) -> Dict:
                     'origin_x': round(transform[2], 6),
                     'origin_y': round(transform[5], 6)
                 },
-                'statistics': {
-                    'min': round(float(np.min(data)), 4),
-                    'max': round(float(np.max(data)), 4),
-                    'mean_all': round(float(np.mean(data)), 4),
-                    'mean_lit': round(float(np.mean(lit_data)), 4) if len(lit_data) > 0 else 0,
-                    'std_dev': round(float(np.std(data)), 4),
-                    'total_pixels': int(width * height),
-                    'lit_pixels': int(len(lit_data)),
-                    'dark_pixels': int(np.sum(data == 0))
-                }
+                'statistics': compute_band_statistics(src, window=window)
+            },
+            'columns': {
+                'lat': lats,
+                'lon': lons,
+                'value': values
             },
-            'data_points': data_points,
             'center': {
                 'lat': round((bounds.top + bounds.bottom) / 2, 6),
                 'lon': round((bounds.left + bounds.right) / 2, 6)
             }
         }
         
+        if window is not None:
+            result['metadata']['viewport'] = {
+                'row_offset': int(window.row_off),
+                'col_offset': int(window.col_off),
+                'sample_rate': int(sample_rate)
+            }
+        
         return result
 
 
-def get_available_years(data_dir: str) -> List[int]:
+def extract_tif_to_json(filepath: str, sample_rate: int = 10, resampling: str = 'nearest',
+                        viewport: Optional[Tuple[float, float, float, float]] = None) -> Dict:
     """
-    Get list of available years from TIF files in the data directory
+    Extract TIF data and convert to JSON format suitable for map visualization
     
     Args:
-        data_dir: Path to directory containing TIF files
+        filepath: Path to the TIF file
+        sample_rate: Sample every Nth pixel to reduce data size (default: 10)
+                    Set to 1 for full resolution
+        resampling: 'nearest' or 'average' (default: 'nearest')
+        viewport: Optional (west, south, east, north) to restrict the output to
     
     Returns:
-        List of years found in the directory
+        Dictionary containing metadata and data points
     """
-    import re
+    result = extract_tif_columns(filepath, sample_rate=sample_rate, resampling=resampling, viewport=viewport)
+    columns = result.pop('columns')
     
-    if not os.path.exists(data_dir):
-        return []
+    result['data_points'] = [
+        {'lat': lat, 'lon': lon, 'value': value}
+        for lat, lon, value in zip(columns['lat'].tolist(), columns['lon'].tolist(), columns['value'].tolist())
+    ]
     
-    years = []
-    year_pattern = re.compile(r'(\d{4})')
-    
-    for filename in os.listdir(data_dir):
-        if filename.endswith('.tif'):
-            match = year_pattern.search(filename)
-            if match:
-                year = int(match.group(1))
-                if year not in years:
-                    years.append(year)
-    
-    return sorted(years)
+    return result
 
 
-def get_tif_file_path(year: int, data_dir: str) -> Optional[str]:
+def encode_columns_binary(result: Dict) -> bytes:
     """
-    Get the TIF file path for a given year
+    Pack an extract_tif_columns() result into a binary columnar payload
+    
+    Layout (little-endian):
+        uint32      length N of the JSON header
+        N bytes     UTF-8 JSON header: metadata, center, count, columns, dtype
+        0-3 bytes   zero padding so the columns start on a 4-byte boundary
+        float32[count] x 3   lat, lon and value columns, back to back
+    
+    Each column can be wrapped directly in a browser Float32Array.
     
     Args:
-        year: Year to get data for
-        data_dir: Path to directory containing TIF files
+        result: Output of extract_tif_columns
     
     Returns:
-        Full path to TIF file or None if not found
+        Encoded payload
     """
-    if not os.path.exists(data_dir):
-        return None
+    columns = result['columns']
+    count = int(columns['lat'].size)
     
-    # Look for files matching the year pattern
-    import re
-    year_pattern = re.compile(rf'(\d{{4}}).*\.tif$')
+    header = json.dumps({
+        'metadata': result['metadata'],
+        'center': result['center'],
+        'count': count,
+        'columns': list(BINARY_COLUMNS),
+        'dtype': 'float32'
+    }).encode('utf-8')
     
-    for filename in os.listdir(data_dir):
-        match = year_pattern.search(filename)
-        if match and int(match.group(1)) == year:
-            return os.path.join(data_dir, filename)
+    offset = 4 + len(header)
+    padding = (-offset) % 4
     
-    return None
-
-
-
-
+    body = np.concatenate([columns[name].astype('<f4') for name in BINARY_COLUMNS])
+    
+    return b''.join([
+        np.uint32(len(header)).astype('<u4').tobytes(),
+        header,
+        b'\x00' * padding,
+        body.tobytes()
+    ])
 
 
+def encode_columns_arrow(result: Dict) -> bytes:
+    """
+    Pack an extract_tif_columns() result into an Apache Arrow IPC stream
+    
+    The table has float32 lat/lon/value columns; metadata and center are
+    stored as JSON in the schema metadata. Requires the optional pyarrow package.
+    
+    Args:
+        result: Output of extract_tif_columns
+    
+    Returns:
+        Encoded Arrow IPC stream
+    
+    Raises:
+        ImportError: If pyarrow is not installed
+    """
+    import pyarrow as pa
+    
+    columns = result['columns']
+    table = pa.table(
+        {name: pa.array(columns[name].astype(np.float32)) for name in BINARY_COLUMNS},
+        metadata={
+            'metadata': json.dumps(result['metadata']),
+            'center': json.dumps(result['center'])
+        }
+    )
+    
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,497 @@
+"""
+Tile Service Module
+Renders XYZ (Web-Mercator) PNG tiles from cleaned TIF data and keeps them
+in an on-disk tile pyramid with LRU eviction.
+
+Pre-seed zoom levels from the backend directory:
+    python -m app.tile_service --region "Tamil Nadu" --min-zoom 5 --max-zoom 9
+"""
+import os
+import io
+import math
+import argparse
+import threading
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_bounds
+from rasterio.warp import reproject, transform_bounds
+from PIL import Image
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.artifact_cache import temp_path
+from app.change_map import CHANGE_CLASSES, get_change_map
+from app.raster_cache import read_raster
+from app.raster_catalog import catalog, file_fingerprint
+from app.trend_map import TREND_LAYERS, get_trend_map
+
+# Configuration
+BASE_TILE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'tiles')
+
+TILE_SIZE = 256
+MIN_ZOOM = 0
+MAX_ZOOM = 14
+
+# Same fixed visual scale as cleaning.py: 0-60 nW maps to 0-255
+VISUAL_MAX_NW = 60.0
+
+# Slope (nW per year) drawn at full color on the trend slope layer
+TREND_VISUAL_MAX_SLOPE = 5.0
+
+# Diverging colormap: blue (negative) -> near white (zero) -> red (positive)
+DIVERGING_LOW = (33, 102, 172)
+DIVERGING_MID = (247, 247, 247)
+DIVERGING_HIGH = (178, 24, 43)
+
+# RGBA color of every change class (see change_map.CHANGE_CLASSES); stable pixels are transparent
+CHANGE_CLASS_COLORS = {
+    'stable': (0, 0, 0, 0),
+    'new_lit': (255, 221, 0, 255),
+    'intensified': (215, 48, 39, 255),
+    'dimmed': (116, 173, 209, 255),
+    'lost_light': (49, 54, 149, 255)
+}
+
+# Disk budget for the tile pyramid before least recently used tiles are evicted
+TILE_CACHE_MAX_BYTES = int(os.environ.get('TILE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Half the circumference of the Web-Mercator world in meters
+WEB_MERCATOR_HALF_WORLD = 20037508.342789244
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """
+    Get the Web-Mercator bounds of an XYZ tile
+
+    Args:
+        z: Zoom level
+        x: Tile column
+        y: Tile row (0 = north)
+
+    Returns:
+        (west, south, east, north) in EPSG:3857 meters
+    """
+    tile_span = 2 * WEB_MERCATOR_HALF_WORLD / (2 ** z)
+    west = -WEB_MERCATOR_HALF_WORLD + x * tile_span
+    north = WEB_MERCATOR_HALF_WORLD - y * tile_span
+    return west, north - tile_span, west + tile_span, north
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    """
+    Get the XYZ tile containing a longitude/latitude at a zoom level
+
+    Args:
+        lon: Longitude in degrees
+        lat: Latitude in degrees
+        z: Zoom level
+
+    Returns:
+        (x, y) tile indices, clamped to the valid range
+    """
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def colorize(data: np.ndarray) -> bytes:
+    """
+    Encode radiance values as a grayscale PNG with transparent dark pixels
+
+    Args:
+        data: 2D array of radiance values (nW)
+
+    Returns:
+        PNG bytes (LA mode)
+    """
+    gray = (np.clip(data / VISUAL_MAX_NW, 0, 1) * 255).astype(np.uint8)
+    alpha = np.where(data > 0, 255, 0).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(np.dstack([gray, alpha]), mode='LA').save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def diverging_rgba(data: np.ndarray, max_abs: float, visible: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Map signed values to a blue-white-red RGBA image
+
+    Values are scaled by max_abs and clipped to [-1, 1]; pixels outside
+    visible (default: exact zeros, i.e. no data or no change) are transparent.
+
+    Args:
+        data: 2D array of signed values
+        max_abs: Magnitude drawn at full color
+        visible: Optional boolean mask of opaque pixels
+
+    Returns:
+        uint8 array of shape (rows, cols, 4)
+    """
+    scaled = np.clip(np.nan_to_num(data / max_abs), -1, 1)[..., np.newaxis]
+    low = np.asarray(DIVERGING_LOW, dtype=np.float32)
+    mid = np.asarray(DIVERGING_MID, dtype=np.float32)
+    high = np.asarray(DIVERGING_HIGH, dtype=np.float32)
+    rgb = np.where(scaled < 0, mid + (mid - low) * scaled, mid + (high - mid) * scaled)
+    if visible is None:
+        visible = np.nan_to_num(data) != 0
+    alpha = np.where(visible, 255, 0).astype(np.uint8)
+    return np.dstack([rgb.astype(np.uint8), alpha])
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Encode an RGBA array as PNG bytes"""
+    buffer = io.BytesIO()
+    Image.fromarray(rgba, mode='RGBA').save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def trend_colorizer(layer: str, years: List[int]) -> Callable[[np.ndarray], bytes]:
+    """
+    PNG encoder of a trend layer
+
+    slope: diverging around zero (TREND_VISUAL_MAX_SLOPE at full color);
+    r2: grayscale 0-1; change: diverging from the first (blue) to the last
+    (red) year of the range.
+    """
+    if layer == 'slope':
+        return lambda data: encode_png(diverging_rgba(data, TREND_VISUAL_MAX_SLOPE))
+    if layer == 'r2':
+        return lambda data: colorize(data * VISUAL_MAX_NW)
+
+    middle = (years[0] + years[-1]) / 2.0
+    half_span = max((years[-1] - years[0]) / 2.0, 0.5)
+    return lambda data: encode_png(diverging_rgba(data - middle, half_span, visible=data > 0))
+
+
+def change_class_png(data: np.ndarray) -> bytes:
+    """Encode a change class raster (see change_map) as a paletted RGBA PNG"""
+    palette = np.array([CHANGE_CLASS_COLORS[name] for name in CHANGE_CLASSES], dtype=np.uint8)
+    codes = np.clip(data, 0, len(CHANGE_CLASSES) - 1).astype(np.uint8)
+    return encode_png(palette[codes])
+
+
+def _empty_tile() -> bytes:
+    """Fully transparent tile returned outside the raster footprint"""
+    buffer = io.BytesIO()
+    Image.new('LA', (TILE_SIZE, TILE_SIZE)).save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+EMPTY_TILE = _empty_tile()
+
+
+def render_tile(tif_path: str, z: int, x: int, y: int,
+                encode: Callable[[np.ndarray], bytes] = colorize, categorical: bool = False) -> Optional[bytes]:
+    """
+    Render one XYZ tile from a cleaned TIF (or a derived raster on the same grid)
+
+    Args:
+        tif_path: Path to the TIF file
+        z: Zoom level
+        x: Tile column
+        y: Tile row
+        encode: Turns the reprojected tile values into PNG bytes
+        categorical: Always use nearest resampling (class or year rasters)
+
+    Returns:
+        PNG bytes, or None if the tile does not overlap the raster
+    """
+    west, south, east, north = tile_bounds(z, x, y)
+
+    with rasterio.open(tif_path) as src:
+        src_west, src_south, src_east, src_north = transform_bounds(src.crs, 'EPSG:3857', *src.bounds)
+        if west >= src_east or east <= src_west or south >= src_north or north <= src_south:
+            return None
+
+        # Average when several source pixels fall into one tile pixel, nearest when zoomed in past native resolution
+        tile_pixel_m = (east - west) / TILE_SIZE
+        src_pixel_m = (src_east - src_west) / src.width
+        resampling = Resampling.average if tile_pixel_m > src_pixel_m and not categorical else Resampling.nearest
+
+        # Reproject from the shared decoded band instead of re-decoding the file per tile
+        data, src_transform = read_raster(tif_path)
+        tile = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.float32)
+        reproject(
+            source=data,
+            destination=tile,
+            src_transform=src_transform,
+            src_crs=src.crs,
+            src_nodata=src.nodata,
+            dst_transform=from_bounds(west, south, east, north, TILE_SIZE, TILE_SIZE),
+            dst_crs='EPSG:3857',
+            dst_nodata=0,
+            resampling=resampling
+        )
+
+    return encode(tile)
+
+
+class TilePyramid:
+    """
+    On-disk z/x/y tile store with least-recently-used eviction
+
+    Tiles live under <base_dir>/<layer>/<z>/<x>/<y>.png. Reading a tile
+    refreshes its mtime, and once the total size passes max_bytes the tiles
+    with the oldest mtime are removed until the store is back under 90% of
+    the budget.
+    """
+
+    def __init__(self, base_dir: str = BASE_TILE_DIR, max_bytes: int = TILE_CACHE_MAX_BYTES):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def tile_path(self, layer: str, z: int, x: int, y: int) -> str:
+        return os.path.join(self.base_dir, layer, str(z), str(x), f'{y}.png')
+
+    def get(self, layer: str, z: int, x: int, y: int) -> Optional[bytes]:
+        """Return a stored tile (and mark it as recently used) or None"""
+        path = self.tile_path(layer, z, x, y)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            os.utime(path)
+            return content
+        except FileNotFoundError:
+            return None
+
+    def put(self, layer: str, z: int, x: int, y: int, content: bytes) -> None:
+        """Store a tile, evicting old tiles if the pyramid is over budget"""
+        path = self.tile_path(layer, z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file first so concurrent readers never see a partial PNG
+        tmp_path = temp_path(path)
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(content)
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _list_tiles(self) -> List[Tuple[float, int, str]]:
+        tiles = []
+        for dirpath, _, filenames in os.walk(self.base_dir):
+            for filename in filenames:
+                if filename.endswith('.png'):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    tiles.append((stat.st_mtime, stat.st_size, path))
+        return tiles
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._list_tiles())
+
+    def _evict(self) -> None:
+        tiles = sorted(self._list_tiles())
+        total = sum(size for _, size, _ in tiles)
+        target = int(self.max_bytes * 0.9)
+
+        for _, size, path in tiles:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+        self._total_bytes = total
+
+
+# Process-wide pyramid used by the tile endpoint
+tile_pyramid = TilePyramid()
+
+
+def _layer_name(tif_path: str, name) -> str:
+    """Pyramid layer for a TIF (named by year or derived layer); changes whenever the file changes"""
+    stat = os.stat(tif_path)
+    region_folder = os.path.basename(os.path.dirname(tif_path))
+    return os.path.join(region_folder, f'{name}_{stat.st_size:x}_{stat.st_mtime_ns:x}')
+
+
+def _tile_range_error(z: int, x: int, y: int) -> Optional[Dict]:
+    if not MIN_ZOOM <= z <= MAX_ZOOM:
+        return {'success': False, 'message': f'Zoom must be between {MIN_ZOOM} and {MAX_ZOOM}'}
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return {'success': False, 'message': f'Tile {z}/{x}/{y} is out of range'}
+    return None
+
+
+def _cached_tile(tif_path: str, layer: str, z: int, x: int, y: int, **render_options) -> Dict:
+    # Tile URLs do not change when the TIF is rewritten, so clients revalidate against its fingerprint
+    etag = file_fingerprint([tif_path])
+    content = tile_pyramid.get(layer, z, x, y)
+
+    if content is None:
+        content = render_tile(tif_path, z, x, y, **render_options)
+        if content is None:
+            return {'success': True, 'content': EMPTY_TILE, 'etag': etag}
+        tile_pyramid.put(layer, z, x, y, content)
+
+    return {'success': True, 'content': content, 'etag': etag}
+
+
+def get_tile(region: str, year: int, z: int, x: int, y: int) -> Dict:
+    """
+    Get a PNG tile for a region and year, rendering it on a pyramid miss
+
+    Args:
+        region: Region name
+        year: Year of the cleaned TIF
+        z: Zoom level
+        x: Tile column
+        y: Tile row
+
+    Returns:
+        Dictionary with 'success' and either 'content' (PNG bytes) and 'etag', or 'message'
+    """
+    error = _tile_range_error(z, x, y)
+    if error:
+        return error
+
+    if not catalog.years(region):
+        return {'success': False, 'message': f'No cleaned data found for region: {region}'}
+
+    tif_path = catalog.get_file(region, year)
+    if not tif_path:
+        return {'success': False, 'message': f'No data found for year {year}'}
+
+    return _cached_tile(tif_path, _layer_name(tif_path, year), z, x, y)
+
+
+def get_change_tile(region: str, year1: int, year2: int, z: int, x: int, y: int) -> Dict:
+    """
+    Get a PNG tile of the change classes between two years (see change_map)
+
+    Args:
+        region: Region name
+        year1: Earlier year of the comparison
+        year2: Later year of the comparison
+        z: Zoom level
+        x: Tile column
+        y: Tile row
+
+    Returns:
+        Dictionary with 'success' and either 'content' (PNG bytes) and 'etag', or 'message'
+    """
+    error = _tile_range_error(z, x, y)
+    if error:
+        return error
+
+    change = get_change_map(region, year1, year2)
+    if not change['success']:
+        return change
+
+    tif_path = change['path']
+    name = os.path.splitext(os.path.basename(tif_path))[0]
+    return _cached_tile(tif_path, _layer_name(tif_path, name), z, x, y,
+                        encode=change_class_png, categorical=True)
+
+
+def get_trend_tile(region: str, layer: str, start_year: int, end_year: int, z: int, x: int, y: int) -> Dict:
+    """
+    Get a PNG tile of a per-pixel trend layer (see trend_map), rendering it on a pyramid miss
+
+    Args:
+        region: Region name
+        layer: 'slope', 'r2' or 'change'
+        start_year: First year of the trend range
+        end_year: Last year of the trend range
+        z: Zoom level
+        x: Tile column
+        y: Tile row
+
+    Returns:
+        Dictionary with 'success' and either 'content' (PNG bytes) and 'etag', or 'message'
+    """
+    if layer not in TREND_LAYERS:
+        return {'success': False, 'message': f"Unknown trend layer: {layer} (use {', '.join(TREND_LAYERS)})"}
+
+    error = _tile_range_error(z, x, y)
+    if error:
+        return error
+
+    trend = get_trend_map(region, start_year, end_year)
+    if not trend['success']:
+        return trend
+
+    tif_path = trend['paths'][layer]
+    name = os.path.splitext(os.path.basename(tif_path))[0]
+    return _cached_tile(tif_path, _layer_name(tif_path, name), z, x, y,
+                        encode=trend_colorizer(layer, trend['years']), categorical=layer == 'change')
+
+
+def seed_tiles(region: str, min_zoom: int, max_zoom: int, years: Optional[List[int]] = None) -> int:
+    """
+    Pre-render every tile covering a region for a range of zoom levels
+
+    Args:
+        region: Region name
+        min_zoom: First zoom level to seed
+        max_zoom: Last zoom level to seed (inclusive)
+        years: Years to seed (default: all cleaned years of the region)
+
+    Returns:
+        Number of tiles written to the pyramid
+    """
+    available_years = catalog.years(region)
+    if not available_years:
+        raise ValueError(f'No cleaned data found for region: {region}')
+
+    if years is None:
+        years = available_years
+
+    written = 0
+    for year in years:
+        tif_path = catalog.get_file(region, year)
+        if not tif_path:
+            print(f"  ⚠️ No data for {year}, skipping")
+            continue
+
+        layer = _layer_name(tif_path, year)
+        with rasterio.open(tif_path) as src:
+            west, south, east, north = transform_bounds(src.crs, 'EPSG:4326', *src.bounds)
+
+        for z in range(min_zoom, max_zoom + 1):
+            x_min, y_min = lonlat_to_tile(west, north, z)
+            x_max, y_max = lonlat_to_tile(east, south, z)
+
+            for x in range(x_min, x_max + 1):
+                for y in range(y_min, y_max + 1):
+                    if tile_pyramid.get(layer, z, x, y) is not None:
+                        continue
+                    content = render_tile(tif_path, z, x, y)
+                    if content is not None:
+                        tile_pyramid.put(layer, z, x, y, content)
+                        written += 1
+
+            print(f"  ✨ {region} {year} z{z}: tiles x {x_min}-{x_max}, y {y_min}-{y_max}")
+
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pre-seed the XYZ tile pyramid for a region')
+    parser.add_argument('--region', required=True, help='Region name, e.g. "Tamil Nadu"')
+    parser.add_argument('--min-zoom', type=int, default=5)
+    parser.add_argument('--max-zoom', type=int, default=9)
+    parser.add_argument('--year', type=int, action='append', dest='years',
+                        help='Year to seed (repeatable, default: all years)')
+    args = parser.parse_args()
+
+    print(f"\n🚀 Seeding tiles for {args.region} (z{args.min_zoom}-z{args.max_zoom})...\n")
+    count = seed_tiles(args.region, args.min_zoom, args.max_zoom, args.years)
+    print(f"\n✅ Done! {count} tiles written to {BASE_TILE_DIR}")
@@ -0,0 +1,307 @@
+"""
+Trend Map Module
+Per-pixel trend of a region over a range of years, cached as rasters under
+data/cache/trends/<region folder>/:
+    slope_<start>_<end>.tif    least-squares slope (nW per year, float32)
+    r2_<start>_<end>.tif       R² of the linear fit (float32)
+    change_<start>_<end>.tif   first year after the largest mean shift (int16, 0 = none)
+
+The year stack is processed strip by strip with closed-form sums, so one
+pass over the years yields all three rasters whatever the raster size.
+Regional summary stats are stored in the manifest next to the slope raster.
+
+Trend rasters are only built offline; growth analysis and the trend tiles
+read them when they are fresh. Build every year of every region with:
+    python -m app.trend_map
+or one region (and optionally a fixed range) with:
+    python -m app.trend_map --region "Tamil Nadu" [--start-year 2018 --end-year 2025]
+"""
+import os
+import time
+import argparse
+from typing import Dict, List, Optional
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from app.artifact_cache import (
+    artifact_path, build_lock, is_fresh, manifest_path, raster_profile, read_manifest, temp_path,
+    write_manifest
+)
+from app.raster_catalog import catalog, file_fingerprint
+from app.raster_stats import PIXEL_AREA_SQKM
+from app.year_cube import cube_view
+
+# Configuration
+# Memory budget for one strip of the trend build (bytes)
+TREND_MAX_BYTES = int(os.environ.get('TREND_MAX_BYTES', 256 * 1024 * 1024))
+
+# A pixel counts as brightening/dimming when |slope| >= this (nW per year) and R² >= TREND_MIN_R2
+TREND_MIN_SLOPE = 1.0
+TREND_MIN_R2 = 0.5
+
+# Smallest difference of the means before and after a change point (nW)
+CHANGE_MIN_SHIFT = 10.0
+
+# Fewest years a trend is fitted over
+TREND_MIN_YEARS = 3
+
+TREND_LAYERS = ['slope', 'r2', 'change']
+
+
+def trend_files(region: str, start_year: int, end_year: int) -> Optional[Dict[str, str]]:
+    """Paths of the slope, R² and change-point rasters of a year range, or None"""
+    record = catalog.get_region(region)
+    if not record or not record['clean_dir']:
+        return None
+    folder = os.path.basename(record['clean_dir'])
+    return {
+        layer: artifact_path('trends', folder, f'{layer}_{start_year}_{end_year}.tif')
+        for layer in TREND_LAYERS
+    }
+
+
+def trend_strip_rows(width: int, n_years: int, max_bytes: int = TREND_MAX_BYTES) -> int:
+    """Rows per strip: the float32 stack, its float64 cumulative sums and a few float64 planes"""
+    bytes_per_row = width * (4 * n_years + 8 * n_years + 8 * 8)
+    return int(max(1, max_bytes // bytes_per_row))
+
+
+def fit_trend(stack: np.ndarray, years: List[int]) -> Dict[str, np.ndarray]:
+    """
+    Per-pixel linear trend and largest mean shift of a (years, rows, cols) stack
+
+    With t = year - mean(year):
+        slope = sum(t * y) / sum(t²)
+        R²    = slope² * sum(t²) / sum((y - mean(y))²)
+    The change point is the split k maximizing k (n - k) / n * (mean_after - mean_before)²,
+    reported as years[k] when the shift is at least CHANGE_MIN_SHIFT.
+
+    Returns:
+        Dictionary with 'slope', 'r2' (float32) and 'change' (int16) arrays of shape (rows, cols)
+    """
+    n = len(years)
+    t = np.asarray(years, dtype=np.float64)
+    t -= t.mean()
+    stt = float(np.dot(t, t))
+
+    mean = stack.mean(axis=0, dtype=np.float64)
+    slope = np.tensordot(t, stack, axes=(0, 0)) / stt
+    sst = np.einsum('ijk,ijk->jk', stack, stack, dtype=np.float64) - n * mean * mean
+    ssr = slope * slope * stt
+    r2 = np.divide(ssr, sst, out=np.zeros_like(sst), where=sst > 1e-9)
+    np.clip(r2, 0.0, 1.0, out=r2)
+
+    total = mean * n
+    before = np.zeros_like(mean)
+    best_score = np.zeros_like(mean)
+    best_shift = np.zeros_like(mean)
+    best_k = np.zeros(mean.shape, dtype=np.intp)
+    for k in range(1, n):
+        before += stack[k - 1]
+        shift = (total - before) / (n - k) - before / k
+        score = k * (n - k) / n * shift * shift
+        better = score > best_score
+        best_score[better] = score[better]
+        best_shift[better] = shift[better]
+        best_k[better] = k
+
+    change = np.where(np.abs(best_shift) >= CHANGE_MIN_SHIFT, np.asarray(years)[best_k], 0).astype(np.int16)
+    return {'slope': slope.astype(np.float32), 'r2': r2.astype(np.float32), 'change': change}
+
+
+def build_trend_rasters(paths: List[str], years: List[int], outputs: Dict[str, str],
+                        max_bytes: int = TREND_MAX_BYTES) -> Dict:
+    """
+    Write the slope, R² and change-point rasters of a year stack strip by strip
+
+    Years whose grid differs from the first year are cropped to the common shape.
+
+    Args:
+        paths: Cleaned TIFs in year order
+        years: Year of every path
+        outputs: Layer name -> output GeoTIFF path
+        max_bytes: Memory budget for one strip
+
+    Returns:
+        Dictionary with 'shape', 'strip_rows' and the regional 'summary'
+    """
+    sources = [rasterio.open(path) for path in paths]
+    tmp_paths = {layer: temp_path(path) for layer, path in outputs.items()}
+    destinations = {}
+    try:
+        height = min(src.height for src in sources)
+        width = min(src.width for src in sources)
+        strip_rows = trend_strip_rows(width, len(sources), max_bytes)
+
+        template = dict(sources[0].profile, width=width, height=height)
+        for layer, tmp_path in tmp_paths.items():
+            os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+            if layer == 'change':
+                profile = raster_profile(template, dtype='int16', nodata=0)
+            else:
+                profile = raster_profile(template)
+            destinations[layer] = rasterio.open(tmp_path, 'w', **profile)
+
+        # Years with a current year cube are sliced from it instead of decoded
+        views = [cube_view(path) for path in paths]
+
+        brightening = dimming = 0
+        slope_sum = 0.0
+        change_counts = np.zeros(len(years), dtype=np.int64)
+        year_index = {year: i for i, year in enumerate(years)}
+
+        stack = np.empty((len(sources), min(strip_rows, height), width), dtype=np.float32)
+        for row in range(0, height, strip_rows):
+            rows = min(strip_rows, height - row)
+            window = Window(0, row, width, rows)
+            for i, src in enumerate(sources):
+                if views[i] is not None:
+                    stack[i, :rows] = views[i][0][row:row + rows, :width]
+                else:
+                    stack[i, :rows] = src.read(1, window=window)
+
+            trend = fit_trend(stack[:, :rows], years)
+            for layer, dst in destinations.items():
+                dst.write(trend[layer], 1, window=window)
+
+            strong = trend['r2'] >= TREND_MIN_R2
+            brightening += int(np.count_nonzero(strong & (trend['slope'] >= TREND_MIN_SLOPE)))
+            dimming += int(np.count_nonzero(strong & (trend['slope'] <= -TREND_MIN_SLOPE)))
+            slope_sum += float(trend['slope'].sum(dtype=np.float64))
+            change_years, counts = np.unique(trend['change'][trend['change'] > 0], return_counts=True)
+            for year, count in zip(change_years, counts):
+                change_counts[year_index[int(year)]] += count
+    finally:
+        for src in sources:
+            src.close()
+        for dst in destinations.values():
+            dst.close()
+
+    for layer, tmp_path in tmp_paths.items():
+        os.replace(tmp_path, outputs[layer])
+
+    pixels = height * width
+    summary = {
+        'years': [int(year) for year in years],
+        'pixels': int(pixels),
+        'mean_slope': float(round(slope_sum / pixels, 4)),
+        'brightening_pixels': brightening,
+        'dimming_pixels': dimming,
+        'brightening_area_sqkm': float(round(brightening * PIXEL_AREA_SQKM, 2)),
+        'dimming_area_sqkm': float(round(dimming * PIXEL_AREA_SQKM, 2)),
+        'change_points': [
+            {'year': int(year), 'pixels': int(count)}
+            for year, count in zip(years, change_counts) if count
+        ]
+    }
+    return {'shape': [height, width], 'strip_rows': strip_rows, 'summary': summary}
+
+
+def _trend_years(region: str, start_year: int, end_year: int) -> List[int]:
+    return [year for year in catalog.years(region) if start_year <= year <= end_year]
+
+
+def _insufficient_years(start_year: int, end_year: int, years: List[int]) -> Dict:
+    return {
+        'success': False,
+        'message': f'Insufficient data: Need at least {TREND_MIN_YEARS} years in range '
+                   f'{start_year}-{end_year}, found {len(years)}'
+    }
+
+
+def trend_fingerprint(region: str, start_year: int, end_year: int) -> str:
+    """Fingerprint of the trend manifest of a year range (changes when the trend is built)"""
+    years = _trend_years(region, start_year, end_year)
+    paths = trend_files(region, years[0], years[-1]) if years else None
+    return file_fingerprint([manifest_path(paths['slope'])] if paths else [])
+
+
+def get_trend_map(region: str, start_year: int, end_year: int) -> Dict:
+    """
+    Get the built trend rasters of a year range without building them
+
+    Trend rasters are built offline (see build_trend_map and the CLI), so
+    requests never pay for a pass over the whole year stack.
+
+    Args:
+        region: Region name
+        start_year: First year of the range
+        end_year: Last year of the range
+
+    Returns:
+        Dictionary with 'success' and either 'paths' (layer -> GeoTIFF), 'years'
+        and 'summary' or 'message' (also when the rasters are missing or stale)
+    """
+    years = _trend_years(region, start_year, end_year)
+    if len(years) < TREND_MIN_YEARS:
+        return _insufficient_years(start_year, end_year, years)
+
+    # Files are keyed by the years actually present so equivalent ranges share them
+    paths = trend_files(region, years[0], years[-1])
+    if not (is_fresh(paths['slope'], catalog.fingerprint(region, years)) and
+            all(os.path.exists(path) for path in paths.values())):
+        return {
+            'success': False,
+            'message': f'Trend rasters for {region} {years[0]}-{years[-1]} have not been built '
+                       f'(python -m app.trend_map --region "{region}")'
+        }
+
+    return {
+        'success': True,
+        'paths': paths,
+        'years': [int(year) for year in years],
+        'summary': read_manifest(paths['slope'])['summary']
+    }
+
+
+def build_trend_map(region: str, start_year: int = 0, end_year: int = 9999) -> Dict:
+    """
+    Build the trend rasters of a year range (default: every year) unless they are fresh
+
+    Returns:
+        get_trend_map-style result
+    """
+    years = _trend_years(region, start_year, end_year)
+    if len(years) < TREND_MIN_YEARS:
+        return _insufficient_years(start_year, end_year, years)
+
+    paths = trend_files(region, years[0], years[-1])
+    fingerprint = catalog.fingerprint(region, years)
+
+    # The manifest sits next to the slope raster and covers all three layers
+    with build_lock(paths['slope']):
+        if not (is_fresh(paths['slope'], fingerprint) and all(os.path.exists(path) for path in paths.values())):
+            start = time.perf_counter()
+            build = build_trend_rasters([catalog.get_file(region, year) for year in years], years, paths)
+            write_manifest(paths['slope'], {
+                'region': catalog.get_region(region)['name'],
+                'years': [int(year) for year in years],
+                'fingerprint': fingerprint,
+                'shape': build['shape'],
+                'strip_rows': build['strip_rows'],
+                'summary': build['summary'],
+                'build_seconds': round(time.perf_counter() - start, 3)
+            })
+
+    return get_trend_map(region, start_year, end_year)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the per-pixel trend rasters of a region')
+    parser.add_argument('--region', help='Region name, e.g. "Tamil Nadu" (default: all regions)')
+    parser.add_argument('--start-year', type=int, default=0, help='First year (default: first available)')
+    parser.add_argument('--end-year', type=int, default=9999, help='Last year (default: last available)')
+    args = parser.parse_args()
+
+    names = [args.region] if args.region else [r['name'] for r in catalog.regions()]
+    for name in names:
+        print(f"\n🚀 Building trend rasters for {name}...")
+        start = time.perf_counter()
+        result = build_trend_map(name, args.start_year, args.end_year)
+        if not result['success']:
+            print(f"❌ Error: {result['message']}")
+        else:
+            summary = result['summary']
+            print(f"✅ Done in {time.perf_counter() - start:.1f}s! {summary['years'][0]}-{summary['years'][-1]}: "
+                  f"{summary['brightening_pixels']} brightening, {summary['dimming_pixels']} dimming pixels")
@@ -0,0 +1,227 @@
+"""
+Year Cube Module
+Per-region store of every cleaned year as one aligned, memory-mapped float32
+cube of shape (years, H, W) under data/cubes/<cleaned folder>/:
+    cube.f32   raw C-ordered float32 values
+    cube.json  header: years, shape, transform, CRS and the size/mtime of
+               every source TIF
+
+Reads of a cleaned TIF at full resolution are answered by the raster cache
+as zero-copy views of the cube while the source file is unchanged, so a
+pixel drill or a strip of a year stack is a page-cache read shared by every
+worker process instead of a GeoTIFF decode.
+
+Build a region's cube at ingest time with:
+    python -m app.year_cube --region "Tamil Nadu"
+"""
+import os
+import json
+import time
+import argparse
+from functools import lru_cache
+from typing import Dict, Optional
+import numpy as np
+import rasterio
+from rasterio.transform import Affine
+from rasterio.windows import Window
+
+from app.artifact_cache import build_lock, temp_path
+from app.raster_catalog import BASE_DATA_DIR, catalog
+
+# Configuration
+BASE_CUBE_DIR = os.path.join(BASE_DATA_DIR, 'cubes')
+CUBE_DTYPE = np.float32
+CUBE_DATA_FILE = 'cube.f32'
+CUBE_HEADER_FILE = 'cube.json'
+
+
+class YearCube:
+    """
+    Read-only memory-mapped (years, H, W) cube of one region
+
+    Attributes:
+        years: Years in cube order
+        data: np.memmap of shape (len(years), height, width)
+        transform: Affine transform shared by every year
+        crs: CRS string of the grid
+        files: Source TIF basename -> {'year', 'size', 'mtime_ns', 'shape'}
+    """
+
+    def __init__(self, directory: str, header: Dict):
+        self.directory = directory
+        self.years = header['years']
+        self.transform = Affine(*header['transform'])
+        self.crs = header['crs']
+        self.files = header['files']
+        self.data = np.memmap(os.path.join(directory, CUBE_DATA_FILE), dtype=CUBE_DTYPE, mode='r',
+                              shape=tuple(header['shape']))
+        self._index = {year: i for i, year in enumerate(self.years)}
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def band(self, year: int) -> np.ndarray:
+        """Zero-copy (H, W) view of one year"""
+        return np.asarray(self.data[self._index[year]])
+
+    def series(self, row: int, col: int) -> np.ndarray:
+        """Values of one pixel for every year (one strided read)"""
+        return np.asarray(self.data[:, row, col])
+
+    def is_current(self, path: str) -> bool:
+        """True if a source TIF is in the cube and unchanged since the build"""
+        info = self.files.get(os.path.basename(path))
+        if info is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        return stat.st_size == info['size'] and stat.st_mtime_ns == info['mtime_ns']
+
+
+def cube_dir(region: str) -> Optional[str]:
+    """Cube directory of a region (data/cubes/<cleaned folder>), or None"""
+    record = catalog.get_region(region)
+    if not record or not record['clean_dir']:
+        return None
+    return os.path.join(BASE_CUBE_DIR, os.path.basename(record['clean_dir']))
+
+
+@lru_cache(maxsize=32)
+def _open_cube(directory: str, header_mtime_ns: int) -> YearCube:
+    with open(os.path.join(directory, CUBE_HEADER_FILE)) as f:
+        return YearCube(directory, json.load(f))
+
+
+def open_cube_dir(directory: str) -> Optional[YearCube]:
+    """Open the cube in a directory, or None if it has not been built"""
+    try:
+        header_mtime = os.stat(os.path.join(directory, CUBE_HEADER_FILE)).st_mtime_ns
+        return _open_cube(directory, header_mtime)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def get_cube(region: str) -> Optional[YearCube]:
+    """The region's cube if it exists and every cleaned year is in it, unchanged"""
+    directory = cube_dir(region)
+    cube = open_cube_dir(directory) if directory else None
+    if cube is None:
+        return None
+    years = catalog.years(region)
+    if cube.years != years or not all(cube.is_current(catalog.get_file(region, year)) for year in years):
+        return None
+    return cube
+
+
+def cube_view(path: str, window: Optional[Window] = None):
+    """
+    Zero-copy view of a cleaned TIF (or a window of it) from its region's cube
+
+    Returns:
+        Tuple of (read-only float32 array, affine transform), or None if the
+        file has no current cube
+    """
+    cube = open_cube_dir(os.path.join(BASE_CUBE_DIR, os.path.basename(os.path.dirname(path))))
+    if cube is None or not cube.is_current(path):
+        return None
+
+    # Years cropped to the common shape are still decoded from their TIF
+    info = cube.files[os.path.basename(path)]
+    if tuple(info['shape']) != cube.shape[1:]:
+        return None
+
+    band = cube.band(info['year'])
+    if window is None:
+        return band, cube.transform
+
+    row_off, col_off = int(window.row_off), int(window.col_off)
+    height, width = int(window.height), int(window.width)
+    if row_off < 0 or col_off < 0 or row_off + height > band.shape[0] or col_off + width > band.shape[1]:
+        return None
+    return band[row_off:row_off + height, col_off:col_off + width], cube.transform * Affine.translation(col_off, row_off)
+
+
+def build_cube(region: str) -> Dict:
+    """
+    Write the region's year cube, unless it is already current
+
+    Years whose grid differs from the first year are cropped to the common
+    shape; the transform of the first year is kept.
+
+    Returns:
+        Dictionary with 'success' and either 'path', 'years' and 'shape' or 'message'
+    """
+    directory = cube_dir(region)
+    years = catalog.years(region)
+    if not directory or not years:
+        return {'success': False, 'message': f'No cleaned data found for region: {region}'}
+
+    data_path = os.path.join(directory, CUBE_DATA_FILE)
+    with build_lock(data_path):
+        cube = get_cube(region)
+        if cube is not None:
+            return {'success': True, 'path': data_path, 'years': cube.years, 'shape': list(cube.shape)}
+
+        start = time.perf_counter()
+        paths = [catalog.get_file(region, year) for year in years]
+        stats = [os.stat(path) for path in paths]
+        shapes = [catalog.get_entry(region, year)['shape'] for year in years]
+        height = min(shape[0] for shape in shapes)
+        width = min(shape[1] for shape in shapes)
+        first = catalog.get_entry(region, years[0])
+
+        # Retire the old header first so nothing maps the new data with the old layout
+        header_path = os.path.join(directory, CUBE_HEADER_FILE)
+        if os.path.exists(header_path):
+            os.remove(header_path)
+
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = temp_path(data_path)
+        data = np.memmap(tmp_path, dtype=CUBE_DTYPE, mode='w+', shape=(len(years), height, width))
+        for i, path in enumerate(paths):
+            with rasterio.open(path) as src:
+                data[i] = src.read(1, window=Window(0, 0, width, height)).astype(CUBE_DTYPE, copy=False)
+        data.flush()
+        del data
+        os.replace(tmp_path, data_path)
+
+        # The header is written last: a cube is only used once its header lists the files
+        header = {
+            'region': catalog.get_region(region)['name'],
+            'years': years,
+            'shape': [len(years), height, width],
+            'dtype': np.dtype(CUBE_DTYPE).name,
+            'transform': list(first['transform'])[:6],
+            'crs': first['crs'],
+            'files': {
+                os.path.basename(path): {
+                    'year': year, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'shape': list(shape)
+                }
+                for year, path, stat, shape in zip(years, paths, stats, shapes)
+            },
+            'build_seconds': round(time.perf_counter() - start, 3)
+        }
+        tmp_header = temp_path(header_path)
+        with open(tmp_header, 'w') as f:
+            json.dump(header, f, indent=2)
+        os.replace(tmp_header, header_path)
+
+    return {'success': True, 'path': data_path, 'years': years, 'shape': [len(years), height, width]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the memory-mapped year cube of a region')
+    parser.add_argument('--region', help='Region name, e.g. "Tamil Nadu" (default: all regions)')
+    args = parser.parse_args()
+
+    names = [args.region] if args.region else [r['name'] for r in catalog.regions()]
+    for name in names:
+        start = time.perf_counter()
+        result = build_cube(name)
+        if result['success']:
+            print(f"✅ {name}: {result['shape']} in {time.perf_counter() - start:.1f}s -> {result['path']}")
+        else:
+            print(f"❌ {name}: {result['message']}")
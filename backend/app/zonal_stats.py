@@ -0,0 +1,432 @@
+"""
+Zonal Statistics Module
+Growth and comparison metrics restricted to a polygon zone (a district or a
+custom GeoJSON polygon). Each zone is rasterized once per raster grid and the
+mask of a stored zone is cached under data/cache/zone_masks together with the
+zone's pixel window, so later queries only read that window and reduce the
+masked pixels.
+
+Stored zones are GeoJSON files in data/zones/<zone_id>.geojson. Polygons
+posted to the API are only kept in memory (zone, masks and results, each in
+a bounded LRU) under a content hash, which is returned as their zone_id for
+reuse; nothing a client posts is written to disk.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from affine import Affine
+from rasterio.features import bounds as geometry_bounds, geometry_mask
+from rasterio.warp import transform_geom
+from rasterio.windows import Window, transform as window_transform
+
+from app.artifact_cache import artifact_path, build_lock, is_fresh, read_manifest, temp_path, write_manifest
+from app.change_map import CHANGE_EDGES, difference_stats
+from app.comparison_service import comparison_metrics
+from app.growth_analysis_service import growth_report
+from app.hotspots import DEFAULT_GRID_SIZE, DEFAULT_TOP_K, analyze_hotspots
+from app.integral_images import bbox_window
+from app.metrics_store import map_workers
+from app.raster_cache import read_raster
+from app.raster_catalog import BASE_DATA_DIR, catalog
+from app.raster_stats import RasterStatsAccumulator, compute_raster_stats, year_metrics
+from app.result_cache import result_cache
+
+# Configuration
+BASE_ZONE_DIR = os.path.join(BASE_DATA_DIR, 'zones')
+
+# Posted zones and their masks kept in memory (least recently used dropped first)
+POSTED_ZONE_LIMIT = 256
+POSTED_MASK_LIMIT = 64
+
+# CRS of GeoJSON input (RFC 7946)
+GEOJSON_CRS = 'EPSG:4326'
+
+ZONE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+_posted_zones = OrderedDict()
+_posted_zones_lock = threading.Lock()
+
+
+def zone_geometries(geojson: Dict) -> List[Dict]:
+    """
+    Polygon geometries of a GeoJSON geometry, Feature or FeatureCollection
+
+    Raises:
+        ValueError: If the input holds no Polygon or MultiPolygon
+    """
+    if not isinstance(geojson, dict):
+        raise ValueError('GeoJSON must be an object')
+
+    kind = geojson.get('type')
+    if kind == 'FeatureCollection':
+        geometries = [feature.get('geometry') for feature in geojson.get('features', [])]
+    elif kind == 'Feature':
+        geometries = [geojson.get('geometry')]
+    else:
+        geometries = [geojson]
+
+    polygons = [g for g in geometries if isinstance(g, dict) and g.get('type') in ('Polygon', 'MultiPolygon')]
+    if not polygons:
+        raise ValueError('GeoJSON must contain a Polygon or MultiPolygon')
+    return polygons
+
+
+def geometry_hash(geometries: List[Dict]) -> str:
+    """Content hash of a list of geometries"""
+    payload = json.dumps(geometries, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def register_zone(geojson: Dict) -> str:
+    """
+    Keep a posted zone in memory so it can be referenced by id later
+
+    Only the POSTED_ZONE_LIMIT most recently used zones are kept.
+
+    Returns:
+        zone_id (content hash of its polygons)
+
+    Raises:
+        ValueError: If the GeoJSON holds no polygon
+    """
+    geometries = zone_geometries(geojson)
+    zone_id = geometry_hash(geometries)[:16]
+    with _posted_zones_lock:
+        _posted_zones[zone_id] = geometries
+        _posted_zones.move_to_end(zone_id)
+        while len(_posted_zones) > POSTED_ZONE_LIMIT:
+            _posted_zones.popitem(last=False)
+    return zone_id
+
+
+def stored_zone_path(zone_id: str) -> Optional[str]:
+    """Path of a stored zone (data/zones/<zone_id>.geojson), or None if there is none"""
+    if not ZONE_ID_PATTERN.match(zone_id or ''):
+        return None
+    path = os.path.join(BASE_ZONE_DIR, f'{zone_id}.geojson')
+    return path if os.path.exists(path) else None
+
+
+def load_zone(zone_id: str) -> Optional[List[Dict]]:
+    """Polygons of a stored or recently posted zone, or None if unknown"""
+    path = stored_zone_path(zone_id)
+    if path:
+        with open(path) as f:
+            return zone_geometries(json.load(f))
+
+    with _posted_zones_lock:
+        geometries = _posted_zones.get(zone_id)
+        if geometries is not None:
+            _posted_zones.move_to_end(zone_id)
+    return geometries
+
+
+def resolve_zone(zone_id: Optional[str] = None, geojson: Optional[Dict] = None) -> Dict:
+    """
+    Zone from a stored id or an inline GeoJSON polygon
+
+    Returns:
+        Dictionary with 'success' and either 'zone_id', 'geometries' and
+        'stored' (False for posted zones, which are never persisted) or 'message'
+    """
+    if geojson is not None:
+        try:
+            geometries = zone_geometries(geojson)
+            zone_id = register_zone(geojson)
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
+        return {'success': True, 'zone_id': zone_id, 'geometries': geometries,
+                'stored': stored_zone_path(zone_id) is not None}
+
+    if zone_id:
+        try:
+            geometries = load_zone(zone_id)
+        except (OSError, ValueError) as e:
+            return {'success': False, 'message': f'Zone {zone_id} could not be read: {str(e)}'}
+        if geometries is None:
+            return {'success': False, 'message': f'Unknown zone: {zone_id} (posted zones are only kept in memory; post the geometry again)'}
+        return {'success': True, 'zone_id': zone_id, 'geometries': geometries,
+                'stored': stored_zone_path(zone_id) is not None}
+
+    return {'success': False, 'message': 'A zone_id or a GeoJSON geometry is required'}
+
+
+def grid_key(entry: Dict) -> str:
+    """Short hash identifying a raster grid (CRS, transform and shape)"""
+    payload = f"{entry['crs']}|{tuple(entry['transform'])[:6]}|{tuple(entry['shape'])}"
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+
+def rasterize_zone(geometries: List[Dict], transform, shape: Tuple[int, int],
+                   crs: Optional[str]) -> Optional[Tuple[Window, np.ndarray]]:
+    """
+    Window covering a zone and the mask of the pixels whose centers lie inside it
+
+    Returns:
+        Tuple of (window, boolean mask of the window's shape), or None if the
+        zone does not overlap the grid
+    """
+    if crs and crs != GEOJSON_CRS:
+        geometries = [transform_geom(GEOJSON_CRS, crs, g) for g in geometries]
+
+    boxes = np.array([geometry_bounds(g) for g in geometries])
+    rect = bbox_window(transform, shape, [boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max()])
+    if rect is None:
+        return None
+
+    r0, r1, c0, c1 = rect
+    window = Window(c0, r0, c1 - c0, r1 - r0)
+    mask = geometry_mask(geometries, out_shape=(r1 - r0, c1 - c0),
+                         transform=window_transform(window, transform), invert=True)
+    if not mask.any():
+        return None
+    return window, mask
+
+
+@lru_cache(maxsize=256)
+def _load_mask(path: str, mtime_ns: int) -> np.ndarray:
+    mask = np.load(path)
+    mask.setflags(write=False)
+    return mask
+
+
+@lru_cache(maxsize=POSTED_MASK_LIMIT)
+def _posted_zone_mask(geometry_json: str, transform: Tuple[float, ...], shape: Tuple[int, int],
+                      crs: Optional[str]) -> Optional[Tuple[Window, np.ndarray]]:
+    """rasterize_zone of a posted zone, kept in memory only"""
+    rasterized = rasterize_zone(json.loads(geometry_json), Affine(*transform), shape, crs)
+    if rasterized:
+        rasterized[1].setflags(write=False)
+    return rasterized
+
+
+def get_zone_mask(region: str, year: int, zone_id: str, geometries: List[Dict],
+                  stored: bool = True) -> Optional[Dict]:
+    """
+    Cached mask of a zone on the grid of one year's cleaned TIF
+
+    Masks of stored zones are cached on disk; masks of posted zones
+    (stored=False) only in a bounded in-memory LRU.
+
+    Returns:
+        Dictionary with 'window' and 'mask', or None if the zone does not
+        overlap the grid
+    """
+    entry = catalog.get_entry(region, year)
+    if not stored:
+        rasterized = _posted_zone_mask(
+            json.dumps(geometries, sort_keys=True), tuple(entry['transform'])[:6],
+            tuple(entry['shape']), entry['crs']
+        )
+        return {'window': rasterized[0], 'mask': rasterized[1]} if rasterized else None
+
+    path = artifact_path('zone_masks', zone_id, f'mask_{grid_key(entry)}.npy')
+    fingerprint = geometry_hash(geometries)
+
+    with build_lock(path):
+        if not is_fresh(path, fingerprint):
+            start = time.perf_counter()
+            rasterized = rasterize_zone(geometries, entry['transform'], entry['shape'], entry['crs'])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            mask = rasterized[1] if rasterized else np.zeros((0, 0), dtype=bool)
+            tmp_path = temp_path(path, '.tmp.npy')
+            np.save(tmp_path, mask)
+            os.replace(tmp_path, path)
+            window = rasterized[0] if rasterized else None
+            write_manifest(path, {
+                'zone_id': zone_id,
+                'fingerprint': fingerprint,
+                'window': [window.col_off, window.row_off, window.width, window.height] if window else None,
+                'pixels': int(mask.sum()),
+                'build_seconds': round(time.perf_counter() - start, 3)
+            })
+
+    window = read_manifest(path)['window']
+    if window is None:
+        return None
+    return {'window': Window(*window), 'mask': _load_mask(path, os.stat(path).st_mtime_ns)}
+
+
+def _zone_pixels(region: str, year: int, zone: Dict) -> Optional[Dict]:
+    """Window read of one year and the mask of a resolved zone on it"""
+    zone = get_zone_mask(region, year, zone['zone_id'], zone['geometries'], zone['stored'])
+    if zone is None:
+        return None
+    img, transform = read_raster(catalog.get_file(region, year), window=zone['window'])
+    return {'img': img, 'transform': transform, 'mask': zone['mask'], 'window': zone['window']}
+
+
+def _zone_fingerprint(region: str, years: List[int], geometries: List[Dict]) -> str:
+    return catalog.fingerprint(region, years) + geometry_hash(geometries)
+
+
+def zonal_growth(region: str, start_year: int, end_year: int, zone_id: Optional[str] = None,
+                 geojson: Optional[Dict] = None, grid_size: int = DEFAULT_GRID_SIZE,
+                 hotspot_count: int = DEFAULT_TOP_K) -> Dict:
+    """
+    analyze_growth restricted to a zone
+
+    Args:
+        region: Region name
+        start_year: Start year of analysis
+        end_year: End year of analysis
+        zone_id: Stored zone id (ignored when geojson is given)
+        geojson: Inline GeoJSON polygon, Feature or FeatureCollection
+        grid_size: Hotspot grid cells along each axis (over the zone's window)
+        hotspot_count: Number of hotspots to return
+
+    Returns:
+        Dictionary like analyze_growth plus 'zone'
+    """
+    zone = resolve_zone(zone_id, geojson)
+    if not zone['success']:
+        return zone
+
+    years = [year for year in catalog.years(region) if start_year <= year <= end_year]
+    return result_cache.cached(
+        'zonal_growth',
+        {'region': region, 'start_year': start_year, 'end_year': end_year, 'zone_id': zone['zone_id'],
+         'grid_size': grid_size, 'hotspot_count': hotspot_count},
+        _zone_fingerprint(region, years, zone['geometries']),
+        lambda: _zonal_growth(region, start_year, end_year, zone, grid_size, hotspot_count),
+        persist=zone['stored']
+    )
+
+
+def _zonal_growth(region: str, start_year: int, end_year: int, zone: Dict,
+                  grid_size: int, hotspot_count: int) -> Dict:
+    """Uncached zonal growth analysis (see zonal_growth)"""
+    years = [year for year in catalog.years(region) if start_year <= year <= end_year]
+    if len(years) < 2:
+        return {
+            'success': False,
+            'message': f'Insufficient data: Need at least 2 years in range {start_year}-{end_year}, found {len(years)}',
+            'data': None
+        }
+
+    try:
+        def year_data(year: int) -> Optional[Dict]:
+            pixels = _zone_pixels(region, year, zone)
+            if pixels is not None:
+                pixels['stats'] = compute_raster_stats(pixels['img'][pixels['mask']])
+            return pixels
+
+        # Masked reductions of every year, spread over the metrics worker pool
+        per_year = dict(zip(years, map_workers(year_data, years)))
+        if any(pixels is None for pixels in per_year.values()):
+            return {
+                'success': False,
+                'message': 'The zone does not overlap the region',
+                'data': None
+            }
+
+        timeline = [year_metrics(year, per_year[year]['stats']) for year in years]
+
+        # Hotspots over the zone's window, with pixels outside the zone dark
+        first, last = per_year[years[0]], per_year[years[-1]]
+        hotspots = analyze_hotspots(
+            np.where(first['mask'], first['img'], 0), np.where(last['mask'], last['img'], 0),
+            first['transform'], grid_size, hotspot_count
+        )
+
+        result = growth_report(region, start_year, end_year, years, timeline, hotspots)
+        result['zone'] = {'zone_id': zone['zone_id'], 'pixels': int(first['mask'].sum())}
+        return result
+
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Error during zonal growth analysis: {str(e)}',
+            'data': None
+        }
+
+
+def zonal_compare(region: str, year1: int, year2: int, zone_id: Optional[str] = None,
+                  geojson: Optional[Dict] = None) -> Dict:
+    """
+    compare_years restricted to a zone
+
+    Args:
+        region: Region name
+        year1: First year to compare
+        year2: Second year to compare
+        zone_id: Stored zone id (ignored when geojson is given)
+        geojson: Inline GeoJSON polygon, Feature or FeatureCollection
+
+    Returns:
+        Dictionary like compare_years (without images) plus 'zone'
+    """
+    zone = resolve_zone(zone_id, geojson)
+    if not zone['success']:
+        return zone
+
+    return result_cache.cached(
+        'zonal_compare',
+        {'region': region, 'year1': year1, 'year2': year2, 'zone_id': zone['zone_id']},
+        _zone_fingerprint(region, [year1, year2], zone['geometries']),
+        lambda: _zonal_compare(region, year1, year2, zone),
+        persist=zone['stored']
+    )
+
+
+def _zonal_compare(region: str, year1: int, year2: int, zone: Dict) -> Dict:
+    """Uncached zonal comparison (see zonal_compare)"""
+    for year in (year1, year2):
+        if not catalog.get_file(region, year):
+            return {
+                'success': False,
+                'message': f'No data found for year {year}',
+                'data': None
+            }
+
+    if grid_key(catalog.get_entry(region, year1)) != grid_key(catalog.get_entry(region, year2)):
+        return {
+            'success': False,
+            'message': f'Years {year1} and {year2} are on different grids',
+            'data': None
+        }
+
+    try:
+        pixels1 = _zone_pixels(region, year1, zone)
+        pixels2 = _zone_pixels(region, year2, zone)
+        if pixels1 is None or pixels2 is None:
+            return {
+                'success': False,
+                'message': 'The zone does not overlap the region',
+                'data': None
+            }
+
+        values1 = pixels1['img'][pixels1['mask']]
+        values2 = pixels2['img'][pixels2['mask']]
+        year1_data = year_metrics(year1, compute_raster_stats(values1))
+        year2_data = year_metrics(year2, compute_raster_stats(values2))
+
+        diff_acc = RasterStatsAccumulator(CHANGE_EDGES)
+        diff_acc.update(values2 - values1)
+
+        metrics = comparison_metrics(year1_data, year2_data, difference_stats(diff_acc))
+        return {
+            'success': True,
+            'region': region,
+            'zone': {'zone_id': zone['zone_id'], 'pixels': int(values1.size)},
+            'year1': year1_data,
+            'year2': year2_data,
+            'changes': metrics['changes'],
+            'absolute_changes': metrics['absolute_changes'],
+            'difference_stats': metrics['difference_stats'],
+            'insights': metrics['insights']
+        }
+
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Error during zonal comparison: {str(e)}',
+            'data': None
+        }
@@ -0,0 +1,10 @@
+"""
+Shared test setup: makes the backend's app package importable, so the suite
+runs with `python -m pytest` from the backend directory or with plain pytest.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
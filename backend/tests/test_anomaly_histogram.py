@@ -0,0 +1,64 @@
+"""
+Cumulative joint histogram lookups vs brute-force threshold counts.
+"""
+import numpy as np
+import pytest
+
+from app.anomaly_histogram import HIST_EDGES, build_joint_histogram, count_candidates, snap_threshold
+from app.raster_stats import iter_chunks
+
+
+def synthetic_pair(seed, shape=(150, 80)):
+    """Baseline and target radiance with values on the grid, between it, below 0 and above HIST_MAX"""
+    rng = np.random.default_rng(seed)
+    baseline = rng.gamma(0.5, 12.0, size=shape)
+    target = baseline + rng.normal(4.0, 10.0, size=shape)
+
+    # Exact grid edges exercise the strict < and > comparisons
+    on_grid = rng.random(shape) < 0.25
+    baseline[on_grid] = rng.choice(HIST_EDGES, size=on_grid.sum())
+    target[on_grid] = rng.choice(HIST_EDGES, size=on_grid.sum())
+    baseline.flat[:3] = [-1.0, 0.0, 150.0]
+    target.flat[:3] = [-2.0, 0.0, 250.0]
+    return baseline.astype(np.float32), target.astype(np.float32)
+
+
+THRESHOLDS = [0.0, 0.5, 5.0, 5.2, 15.0, 37.25, 99.5, 100.0, 140.0]
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_counts_match_brute_force(seed):
+    baseline, target = synthetic_pair(seed)
+    table = build_joint_histogram(baseline, target)
+
+    for min_new in THRESHOLDS:
+        for max_base in THRESHOLDS:
+            counts = count_candidates(table, min_new, max_base)
+            new, base = counts['min_new_intensity'], counts['max_baseline_intensity']
+            assert new == snap_threshold(min_new)
+            assert base == snap_threshold(max_base)
+
+            bright = target > new
+            dark = baseline < base
+            assert counts['candidate_pixels'] == int(np.sum(bright & dark)), (min_new, max_base)
+            assert counts['bright_pixels'] == int(np.sum(bright))
+            assert counts['dark_baseline_pixels'] == int(np.sum(dark))
+            assert counts['total_pixels'] == baseline.size
+
+
+def test_table_does_not_depend_on_chunking(monkeypatch):
+    baseline, target = synthetic_pair(2)
+    whole = build_joint_histogram(baseline, target)
+
+    # Force several row chunks per raster
+    monkeypatch.setattr('app.anomaly_histogram.iter_chunks', lambda img: iter_chunks(img, chunk_pixels=1000))
+    chunked = build_joint_histogram(baseline, target)
+
+    np.testing.assert_array_equal(chunked, whole)
+
+
+def test_snap_threshold_clamps_to_grid():
+    assert snap_threshold(5.2) == 5.0
+    assert snap_threshold(5.3) == 5.5
+    assert snap_threshold(-3.0) == 0.0
+    assert snap_threshold(1000.0) == HIST_EDGES[-1]
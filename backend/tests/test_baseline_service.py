@@ -0,0 +1,79 @@
+"""
+Strip-wise median baselines vs np.median over the full stack.
+"""
+import os
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from app.baseline_service import build_median_baseline, build_median_baselines, median_strip_rows
+
+HEIGHT, WIDTH = 70, 50
+
+
+def write_years(directory, n_years, seed=0):
+    """Synthetic yearly GeoTIFFs (default GDAL strips) plus the stacked arrays"""
+    rng = np.random.default_rng(seed)
+    stack = rng.gamma(0.7, 10.0, size=(n_years, HEIGHT, WIDTH)).astype(np.float32)
+    stack[:, rng.random((HEIGHT, WIDTH)) < 0.2] = 0.0
+    profile = {
+        'driver': 'GTiff', 'height': HEIGHT, 'width': WIDTH, 'count': 1, 'dtype': 'float32',
+        'crs': 'EPSG:4326', 'transform': from_origin(76.0, 13.5, 0.004, 0.004)
+    }
+
+    paths = []
+    for i, img in enumerate(stack):
+        path = os.path.join(directory, f'VIIRS_RAD_Test_{2016 + i}_01_clean.tif')
+        with rasterio.open(path, 'w', **profile) as dst:
+            dst.write(img, 1)
+        paths.append(path)
+    return paths, stack
+
+
+def read_band(path):
+    with rasterio.open(path) as src:
+        return src.read(1)
+
+
+def test_strip_build_matches_full_median(tmp_path):
+    paths, stack = write_years(str(tmp_path), 5)
+    outputs = {str(tmp_path / 'out' / f'median_{n}.tif'): n for n in (1, 2, 3, 4, 5)}
+
+    # A budget of a few rows forces many strips, the last one partial
+    max_bytes = WIDTH * 4 * (2 * len(paths) + 1) * 8
+    result = build_median_baselines(paths, outputs, max_bytes=max_bytes)
+    assert result['strip_rows'] < HEIGHT
+    assert HEIGHT % result['strip_rows'] != 0
+    assert list(result['shape']) == [HEIGHT, WIDTH]
+
+    for out_path, n_years in outputs.items():
+        np.testing.assert_array_equal(read_band(out_path), np.median(stack[:n_years], axis=0).astype(np.float32))
+    assert not [name for name in os.listdir(tmp_path / 'out') if '.tmp' in name]
+
+
+def test_single_baseline_with_one_row_strips(tmp_path):
+    paths, stack = write_years(str(tmp_path), 4, seed=1)
+    out_path = str(tmp_path / 'median.tif')
+
+    result = build_median_baseline(paths, out_path, max_bytes=1)
+    assert result['strip_rows'] == 1
+    np.testing.assert_array_equal(read_band(out_path), np.median(stack, axis=0).astype(np.float32))
+
+
+def test_mismatched_shapes_are_rejected(tmp_path):
+    paths, _ = write_years(str(tmp_path), 2)
+    with rasterio.open(paths[0]) as src:
+        profile = dict(src.profile, height=HEIGHT - 1)
+    with rasterio.open(paths[1], 'w', **profile) as dst:
+        dst.write(np.zeros((HEIGHT - 1, WIDTH), dtype=np.float32), 1)
+
+    with pytest.raises(ValueError):
+        build_median_baselines(paths, {str(tmp_path / 'median.tif'): 2})
+
+
+def test_strip_rows_round_to_blocks():
+    bytes_per_row = 1000 * 4 * (2 * 10 + 1)
+    assert median_strip_rows(1000, 10, 256, max_bytes=bytes_per_row * 600) == 512
+    assert median_strip_rows(1000, 10, 256, max_bytes=bytes_per_row * 100) == 100
+    assert median_strip_rows(1000, 10, 256, max_bytes=1) == 1
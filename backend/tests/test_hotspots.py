@@ -0,0 +1,50 @@
+"""
+Hotspot grids from summed-area tables vs the reduceat path, and both
+against explicit per-cell loops.
+"""
+import numpy as np
+import pytest
+from rasterio.transform import from_origin
+
+from app.hotspots import analyze_hotspots, analyze_hotspots_integral, block_sums, hotspot_grid
+from app.integral_images import build_integral_images, grid_sums, rect_sums
+
+TRANSFORM = from_origin(76.0, 13.5, 0.004, 0.004)
+
+
+def synthetic_years(seed, shape=(97, 131)):
+    """Start/end radiance on a 0.25 nW grid, so every cell sum is exact in float64"""
+    rng = np.random.default_rng(seed)
+    start = np.round(rng.gamma(0.8, 15.0, size=shape) * 4) / 4
+    growth = rng.uniform(0.5, 2.5, size=(1, shape[1]))
+    end = np.round(start * growth * 4) / 4
+    return start.astype(np.float32), end.astype(np.float32)
+
+
+@pytest.mark.parametrize('grid_size', [1, 7, 20, 64, 500])
+@pytest.mark.parametrize('k', [1, 10, 10000])
+def test_integral_hotspots_match_reduceat(grid_size, k):
+    start, end = synthetic_years(grid_size)
+    start_table, _ = build_integral_images(start)
+    end_table, _ = build_integral_images(end)
+
+    expected = analyze_hotspots(start, end, TRANSFORM, grid_size, k)
+    assert analyze_hotspots_integral(start_table, end_table, TRANSFORM, grid_size, k) == expected
+    assert 0 < len(expected) <= k
+
+
+def test_cell_sums_match_loops():
+    start, _ = synthetic_years(3)
+    table, lit_table = build_integral_images(start)
+    row_edges, col_edges = hotspot_grid(*start.shape, 9)
+
+    expected = np.array([
+        [start[r0:r1, c0:c1].sum(dtype=np.float64) for c0, c1 in zip(col_edges[:-1], col_edges[1:])]
+        for r0, r1 in zip(row_edges[:-1], row_edges[1:])
+    ])
+    np.testing.assert_array_equal(block_sums(start, row_edges, col_edges), expected)
+    np.testing.assert_array_equal(grid_sums(table, row_edges, col_edges), expected)
+
+    # Covers the whole raster, edge rows and columns included
+    assert row_edges[-1] == start.shape[0] and col_edges[-1] == start.shape[1]
+    assert rect_sums(lit_table, 0, start.shape[0], 0, start.shape[1]) == int(np.sum(start > 5))
@@ -0,0 +1,88 @@
+"""
+raster_stats kernel vs the per-service numpy loops it replaced
+(the extractor, comparison and growth services each recomputed these masks).
+"""
+import numpy as np
+import pytest
+
+from app.change_map import CHANGE_EDGES, difference_stats
+from app.raster_stats import RasterStatsAccumulator, compute_raster_stats, iter_chunks, year_metrics
+
+
+def synthetic_raster(seed, shape=(120, 90)):
+    """Radiance on a 0.25 nW grid (exact float32 sums), with zeros and the exact sector edges"""
+    rng = np.random.default_rng(seed)
+    img = np.round(rng.gamma(0.6, 20.0, size=shape) * 4) / 4
+    img[rng.random(shape) < 0.3] = 0.0
+    img.flat[:4] = [5.0, 15.0, 60.0, 0.25]
+    return np.minimum(img, 100.0).astype(np.float32)
+
+
+def legacy_year_metrics(year, img):
+    """
+    Per-year block as the comparison service computed it before raster_stats
+    (rounded as Python floats: the old code rounded float32 scalars, which
+    only differs in the last bits of the representation)
+    """
+    return {
+        'year': year,
+        'gdp_proxy_sol': round(float(np.sum(img)), 2),
+        'urban_area_sqkm': round(float(np.sum(img > 5) * 0.25), 2),
+        'mean_intensity': round(float(np.mean(img[img > 0])) if np.any(img > 0) else 0.0, 2),
+        'max_intensity': round(float(np.max(img)), 2),
+        'lit_pixels': int(np.sum(img > 5)),
+        'dark_pixels': int(np.sum(img == 0)),
+        'sector_breakdown': {
+            'rural': int(np.sum((img > 5) & (img <= 15))),
+            'urban': int(np.sum((img > 15) & (img <= 60))),
+            'industrial': int(np.sum(img > 60))
+        }
+    }
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_year_metrics_match_legacy_loops(seed):
+    img = synthetic_raster(seed)
+    metrics = year_metrics(2020, compute_raster_stats(img))
+
+    for key, value in legacy_year_metrics(2020, img).items():
+        assert metrics[key] == value, key
+    assert metrics['total_pixels'] == img.size
+
+
+def test_chunked_stats_match_single_pass():
+    img = synthetic_raster(3)
+    whole = compute_raster_stats(img)
+    chunked = compute_raster_stats(iter_chunks(img, chunk_pixels=500))
+
+    assert chunked['sectors'] == whole['sectors']
+    for key in ('total_pixels', 'dark_pixels', 'positive_pixels', 'lit_pixels', 'sum', 'min', 'max'):
+        assert chunked[key] == whole[key], key
+    assert chunked['std_dev'] == pytest.approx(np.std(img.astype(np.float64)))
+    assert chunked['mean_lit'] == pytest.approx(np.mean(img[img > 0].astype(np.float64)))
+
+
+def test_empty_raster():
+    stats = compute_raster_stats(np.zeros((0, 5), dtype=np.float32))
+
+    assert stats['total_pixels'] == 0
+    assert stats['min'] == stats['max'] == stats['mean_lit'] == 0.0
+
+
+def test_difference_stats_match_legacy_masks():
+    diff = synthetic_raster(4) - synthetic_raster(5)
+    diff.flat[:2] = [10.0, -10.0]
+
+    acc = RasterStatsAccumulator(CHANGE_EDGES)
+    acc.update(diff)
+    stats = difference_stats(acc)
+
+    brightened = int(np.sum(diff > 10))
+    darkened = int(np.sum(diff < -10))
+    assert stats['brightened_pixels'] == brightened
+    assert stats['darkened_pixels'] == darkened
+    assert stats['unchanged_pixels'] == diff.size - brightened - darkened
+    assert stats['mean_change'] == round(float(np.mean(diff)), 2)
+    assert stats['max_increase'] == round(float(np.max(diff)), 2)
+    assert stats['max_decrease'] == round(float(np.min(diff)), 2)
+    assert stats['std_dev'] == pytest.approx(float(np.std(diff.astype(np.float64))), abs=0.01)